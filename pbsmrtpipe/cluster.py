@@ -29,14 +29,26 @@ class Constants(object):
     # Each template must be implemented.
     START = "start"
     STOP = "stop"
+    # Optional. Submit NTASKS commands as a single array job. The array
+    # element index is exported by the scheduler (e.g., SGE_TASK_ID)
+    START_ARRAY = "start_array"
+    # Optional. Non-blocking submission, must write the job id to stdout.
+    SUBMIT = "submit"
+    # Optional. Must write the ids of all the active (e.g., queued, running)
+    # jobs of the user to stdout, one job per line.
+    STATUS = "status"
 
     @classmethod
     def all(cls):
         return cls.START, cls.STOP
 
+    @classmethod
+    def optional(cls):
+        return cls.START_ARRAY, cls.SUBMIT, cls.STATUS
+
     @classmethod
     def is_valid(cls, name):
-        if name in cls.all():
+        if name in cls.all() + cls.optional():
             return True
 
         return False
@@ -60,7 +72,14 @@ def _get_cluster_files(template_dir, suffix='.tmpl'):
             log.exception(msg)
             raise IOError(msg)
 
-    return dict(zip(Constants.all(), paths))
+    d = dict(zip(Constants.all(), paths))
+
+    for name in Constants.optional():
+        p = os.path.join(template_dir, name + suffix)
+        if os.path.isfile(p):
+            d[name] = p
+
+    return d
 
 
 def _template_file_to_str(template_file):
@@ -74,6 +93,7 @@ def load_cluster_templates_from_dir(cluster_model_dir):
     Load tmpl files from dir and return list of ClusterTemplate instances.
 
     The directory should contain 'start.tmpl' and 'stop.tmpl' Cluster templates
+    and optionally 'start_array.tmpl', 'submit.tmpl' and 'status.tmpl'
 
     For example, /path/to/cluster_templates/my_sge
 
@@ -180,7 +200,18 @@ class ClusterTemplateRender(object):
     def from_dir(cluster_manager_dir):
         return load_cluster_templates_from_dir(cluster_manager_dir)
 
-    def render(self, template_name, shell_script, job_id, stdout=None, stderr=None, nproc=1, extras=None):
+    @property
+    def supports_array(self):
+        """Can multiple commands be submitted as a single array job"""
+        return Constants.START_ARRAY in self._templates
+
+    @property
+    def supports_async(self):
+        """Can jobs be submitted without blocking and tracked by a status
+        command"""
+        return Constants.SUBMIT in self._templates and Constants.STATUS in self._templates
+
+    def render(self, template_name, shell_script, job_id, stdout=None, stderr=None, nproc=1, extras=None, ntasks=1):
         """
         :param template_name: (str) name of template type (e.g., start, stop)
         :param shell_script: (str) path to shell script
@@ -189,6 +220,7 @@ class ClusterTemplateRender(object):
         :param stderr: (str) path to stderr
         :param nproc: (int) number of processors to use
         :param extras: (None, str) extra options (e.g., '-l h_rt=24:0:0')
+        :param ntasks: (int) number of array job elements (start_array)
         :return: (str) qsub command
         """
         extras_types = (types.NoneType, basestring)
@@ -214,13 +246,33 @@ class ClusterTemplateRender(object):
                  STDOUT_FILE=stdout,
                  STDERR_FILE=stderr,
                  EXTRAS=extras_str,
-                 NPROC=str(nproc))
+                 NPROC=str(nproc),
+                 NTASKS=str(ntasks))
 
         # log.info(d)
         s = t.substitute(**d)
 
         return s
 
+    def render_array(self, shell_script, job_id, ntasks, stdout=None, stderr=None, nproc=1, extras=None):
+        """
+        Render the array job submission command of ntasks elements. The
+        shell script is run for each element (1 to ntasks).
+
+        :return: (str) qsub command
+        """
+        if not self.supports_array:
+            raise ValueError("Unable to find template name '{t}'".format(t=Constants.START_ARRAY))
+        return self.render(Constants.START_ARRAY, shell_script, job_id, stdout=stdout, stderr=stderr, nproc=nproc, extras=extras, ntasks=ntasks)
+
+    def render_status(self):
+        """
+        Render the command to list the ids of the active jobs
+
+        :return: (str) qstat command
+        """
+        return self.render(Constants.STATUS, "", "")
+
 
 def validate_cluster_manager(cluster_manager):
     """
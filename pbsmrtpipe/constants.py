@@ -20,6 +20,13 @@ ENV_CHK_OPT_DIR = "PB_CHUNK_OPERATOR_DIR"
 ENV_BUNDLE_DIR = "SMRT_PIPELINE_BUNDLE_DIR"
 ENV_IGNORE_BUNDLE = "SMRT_IGNORE_PIPELINE_BUNDLE" # for testing
 
+# Max size (MB) of the task stdout/stderr before the file is rotated. Set by
+# the workflow driver for the task runners (see MAX_TASK_LOG_SIZE)
+ENV_MAX_TASK_LOG_SIZE = "PB_SMRTPIPE_MAX_TASK_LOG_SIZE"
+# Write the env of each task to .env.json (disabled with "0"). Set by the
+# workflow driver for the task runners (only in debug mode)
+ENV_WRITE_TASK_ENV_JSON = "PB_SMRTPIPE_WRITE_TASK_ENV_JSON"
+
 
 PBSMRTPIPE_PID_KILL_FILE_SCRIPT = ".pbsmrtpipe-terminate.sh"
 
@@ -33,6 +40,9 @@ EXIT_TERMINATED = 7
 DEFAULT_EXIT_CODE = EXIT_FAILURE
 
 DEEP_DEBUG = False
+# Validate the integrity of the entire Binding Graph after every graph
+# rewrite, instead of only the nodes touched by the rewrite.
+FULL_GRAPH_INTEGRITY_CHECK = False
 
 # Global Env vars that are necessary to do *anything*. This is stupid.
 SEYMOUR_HOME = 'SEYMOUR_HOME'
@@ -87,6 +97,14 @@ TASK_MANIFEST_VERSION = '0.3.0'
 RESOLVED_TOOL_CONTRACT_JSON = "resolved-tool-contract.json"
 RESOLVED_TOOL_CONTRACT_AVRO = 'resolved-tool-contract.avro'
 TOOL_CONTRACT_JSON = "tool-contract.json"
+TASK_REPORT_JSON = "task-report.json"
+# Final state of the task written by the runner for the TaskSupervisor
+TASK_RESULT_JSON = "task-result.json"
+# stdout/stderr of the pbtools-runner process
+TASK_RUNNER_LOG = "pbtools-runner.log"
+# Append-only journal (one JSON record per line) of the task and file state
+# transitions of the workflow. Written in the job workflow dir
+WORKFLOW_JOURNAL_JSONL = "workflow-journal.jsonl"
 
 SOURCE_ID_MASTER_LOG = "pbsmrtpipe::pbsmrtpipe.log"
 SOURCE_ID_INFO_LOG = "pbsmrtpipe::pbsmrtpipe-info.log"
@@ -97,6 +115,56 @@ MAX_NCHUNKS = 128
 MAX_NPROC = 16
 MAX_TOTAL_NPROC = None
 MAX_NWORKERS = 100
+# Order that the runnable tasks are submitted in
+SCHEDULER_FIFO = "fifo"
+# Prioritize tasks with the longest estimated remaining critical path
+SCHEDULER_CRITICAL_PATH = "critical_path"
+SCHEDULERS = (SCHEDULER_FIFO, SCHEDULER_CRITICAL_PATH)
+SCHEDULER = SCHEDULER_FIFO
+# Job dir of a previous run used to load the task run times (from the
+# task-report.json files) for estimating the critical path
+SCHEDULER_RUN_TIMES_JOB_DIR = None
+# Static weight (sec) of a task when no run time is available
+DEFAULT_TASK_WEIGHT = 1.0
+# Max number of long-lived pilot workers that run the distributed tasks
+# back-to-back (0 disables the pilot mode)
+MAX_NPILOTS = 0
+# Submit the pilots through the cluster templates
+PILOT_MODE_CLUSTER = "cluster"
+# Run the pilots as local processes (simulation mode for testing)
+PILOT_MODE_LOCAL = "local"
+PILOT_MODES = (PILOT_MODE_CLUSTER, PILOT_MODE_LOCAL)
+PILOT_MODE = PILOT_MODE_CLUSTER
+# A pilot exits if no task was claimed in this time (sec)
+PILOT_IDLE_TIMEOUT = 120
+# Max time (sec) smaller tasks are backfilled while a task is waiting for
+# enough free procs. After this, no new tasks are started until the waiting
+# task can run.
+BACKFILL_MAX_WAIT = 300
+# Max number of tasks of a linear chain of distributed tasks that are run
+# as a single job (1 disables the task fusion)
+MAX_NFUSED_TASKS = 1
+# Max number of pre-warmed local workers that run the Python tool contract
+# tasks in-process (0 disables the in-process mode)
+MAX_NINPROCESS_WORKERS = 0
+# Comma separated list of the tool contract ids that are run in-process
+INPROCESS_TASK_IDS = ""
+# Max number of driver threads that run the lightweight scatter and gather
+# tasks inline (0 disables the inline mode)
+MAX_NINLINE_WORKERS = 0
+# The chunked tasks of each chunk group are collapsed into a single node in
+# the workflow images of binding graphs with more nodes than this
+BINDING_GRAPH_COLLAPSE_NNODES = 250
+# Only the JSON of the binding graph is written (no workflow.dot or images)
+# if the (collapsed) graph has more nodes than this
+BINDING_GRAPH_MAX_IMAGE_NNODES = 2500
+# Max size (MB) of a task stdout/stderr file. Larger files are rotated and
+# gzip'ed (0 disables the rotation)
+MAX_TASK_LOG_SIZE = 0
+# Number of rotated task stdout/stderr files that are kept
+TASK_LOG_NBACKUPS = 2
+# Number of lines of the task stderr kept in memory (for error messages)
+TASK_LOG_NLINES = 25
 CHUNKED_MODE = False
 # Only if the CLUSTER_MANAGER_DIR is defined
 DISTRIBUTED_MODE = True
@@ -1,4 +1,4 @@
-from collections import deque
+from collections import deque, OrderedDict
 import logging
 import os
 import copy
@@ -41,15 +41,15 @@ from pbsmrtpipe import opts_graph as GX
 from pbsmrtpipe.graph.models import (TaskStates,
                                      TaskBindingNode,
                                      TaskChunkedBindingNode,
-                                     EntryOutBindingFileNode,
                                      TaskScatterBindingNode)
 from pbsmrtpipe.models import (Pipeline, ToolContractMetaTask, MetaTask,
                                GlobalRegistry, TaskResult, validate_operator,
                                AnalysisLink, RunnableTask,
                                ScatterToolContractMetaTask,
                                GatherToolContractMetaTask)
-from pbsmrtpipe.engine import TaskManifestWorker
+from pbsmrtpipe.engine import TaskSupervisor, PilotPool
 from pbsmrtpipe.pb_io import WorkflowLevelOptions
+from pbsmrtpipe.utils import is_log_level_emitted
 
 log = logging.getLogger(__name__)
 slog = logging.getLogger('status.' + __name__)
@@ -59,6 +59,20 @@ slog = logging.getLogger('status.' + __name__)
 
 class Constants(object):
     SHUTDOWN = "SHUTDOWN"
+    # Max time (sec) the driver will block on the worker result queue before
+    # re-checking the other wake-up sources (e.g., the terminate file)
+    WAKEUP_INTERVAL = 1.0
+    # Min time (sec) between the rewrites of the workflow and task summary
+    # reports. The reports are only rewritten if the graph has changed.
+    REPORT_WRITE_INTERVAL = 10
+    # Max time (sec) to wait for the rendering of the workflow graph images
+    # before writing the initial workflow report, and at the end of the job
+    GRAPH_IMAGES_SETUP_WAIT = 5
+    GRAPH_IMAGES_MAX_WAIT = 60
+    # Min time (sec) between the graph summaries in the debug log. The
+    # summary is only generated if the graph has changed and a handler
+    # emits DEBUG messages.
+    GRAPH_SUMMARY_LOG_INTERVAL = 10
 
 def _init_bg(bg, ep_d):
     """Resolving/Initializing BindingGraph with supplied EntryPoints"""
@@ -210,7 +224,7 @@ def _terminate_all_workers(workers, shutdown_event):
 
 def _terminate_worker(worker):
     """
-    :type worker: TaskManifestWorker
+    :type worker: SupervisedTask
     """
     tid = worker.task_id
     name = worker.name
@@ -221,6 +235,64 @@ def _terminate_worker(worker):
         log.error("Failed to terminate worker {n} task-id:{i} Pid {p}. {c} {e}".format(n=name, i=tid, p=pid_, e=e.message, c=e.__class__))
 
 
+def _get_task_results(q_out, timeout, term_file, wakeup_interval=Constants.WAKEUP_INTERVAL):
+    """
+    Block on the worker result queue until a result is available, the
+    terminate file is written, or the timeout (sec) has elapsed.
+
+    Every result already in the queue is returned, so a burst of task
+    completions is processed in a single pass of the driver loop.
+
+    :raises: PipelineRuntimeKeyboardInterrupt if the terminate file is found
+    :rtype: list
+    """
+    results = []
+    deadline = time.time() + timeout
+
+    while True:
+        if os.path.exists(term_file):
+            raise PipelineRuntimeKeyboardInterrupt("Found terminate file {f}".format(f=term_file))
+
+        remaining = deadline - time.time()
+        try:
+            if remaining > 0:
+                results.append(q_out.get(timeout=min(remaining, wakeup_interval)))
+            else:
+                results.append(q_out.get_nowait())
+            break
+        except Queue.Empty:
+            if remaining <= 0:
+                break
+
+    while True:
+        try:
+            results.append(q_out.get_nowait())
+        except Queue.Empty:
+            break
+
+    return results
+
+
+def _to_get_runnable_tasks_func(workflow_opts):
+    """
+    Returns the func(bg) -> [TaskBindingNode] that orders the runnable tasks
+    based on the scheduler workflow option
+
+    :type workflow_opts: WorkflowLevelOptions
+    """
+    if workflow_opts.scheduler == GlobalConstants.SCHEDULER_CRITICAL_PATH:
+        run_times = {}
+        if workflow_opts.scheduler_run_times_job_dir is not None:
+            run_times = DU.load_task_run_times(workflow_opts.scheduler_run_times_job_dir)
+        # Tasks types without a run time are weighted by the mean of the known run times
+        default_weight = sum(run_times.values()) / len(run_times) if run_times else GlobalConstants.DEFAULT_TASK_WEIGHT
+        prioritizer = B.CriticalPathPrioritizer(run_times, default_weight=default_weight)
+        slog.info("Using critical path scheduler {p}".format(p=prioritizer))
+        return prioritizer.get_runnable_tasks
+
+    return B.get_runnable_tasks
+
+
 def _are_workers_alive(workers):
     return all(w.is_alive() for w in workers.values())
 
@@ -230,6 +302,290 @@ def _is_chunked_task_node_type(tnode):
     return isinstance(tnode, (TaskChunkedBindingNode, TaskScatterBindingNode))
 
 
+def _to_cluster_array_groups(tnodes_tasks_paths, excluded_task_ids=()):
+    """
+    Group the distributed chunked tasks by chunk group to be submitted as
+    cluster array jobs. Groups of a single task are not grouped.
+
+    :param tnodes_tasks_paths: [(tnode, task, runnable_task_path)]
+    :param excluded_task_ids: Task ids that are never grouped (e.g., run in-process)
+    :return: (array groups, remaining [(tnode, task, runnable_task_path)])
+    """
+    groups = OrderedDict()
+    others = []
+    for item in tnodes_tasks_paths:
+        tnode = item[0]
+        if (isinstance(tnode, TaskChunkedBindingNode) and tnode.meta_task.is_distributed and
+                tnode.meta_task.task_id not in excluded_task_ids):
+            groups.setdefault(tnode.chunk_group_id, []).append(item)
+        else:
+            others.append(item)
+
+    array_groups = []
+    for group in groups.values():
+        if len(group) > 1:
+            array_groups.append(group)
+        else:
+            others.extend(group)
+
+    return array_groups, others
+
+
+class _ResourceSlots(object):
+
+    """Accounting of the procs and worker slots reserved by the submitted
+    tasks (keyed by the task id)
+
+    A fused chain of tasks is run in sequence in a single job with the procs
+    of the head task. The chain only reserves the procs and the worker slot
+    of the head task, they are released when the last task of the chain has
+    completed, or when a task of the chain has failed.
+    """
+
+    def __init__(self, max_nworkers, max_total_nproc=None):
+        self.max_nworkers = max_nworkers
+        self.max_total_nproc = max_total_nproc
+        self.total_nproc = 0
+        self.nworkers = 0
+        # {task id (or chain id): nproc}
+        self._reserved = {}
+        # {chain id: task ids of the chain that have not completed}
+        self._chains = {}
+        # {task id: chain id}
+        self._task_chain_ids = {}
+
+    def __repr__(self):
+        _d = dict(k=self.__class__.__name__, n=self.nworkers, p=self.total_nproc, c=len(self._chains))
+        return "<{k} workers:{n} nproc:{p} chains:{c} >".format(**_d)
+
+    def has_available_worker(self):
+        return self.nworkers < self.max_nworkers
+
+    def has_available_nproc(self, nproc):
+        if self.max_total_nproc is None:
+            return True
+        return self.total_nproc + nproc <= self.max_total_nproc
+
+    def reserve(self, task_id, nproc):
+        self._reserved[task_id] = nproc
+        self.total_nproc += nproc
+        self.nworkers += 1
+
+    def add_chain(self, head_task_id, task_ids):
+        """Run the tasks with the reserved resources of the head task"""
+        self._chains[head_task_id] = set([head_task_id] + list(task_ids))
+        for task_id in task_ids:
+            self._task_chain_ids[task_id] = head_task_id
+
+    def release(self, task_id, was_successful=True):
+        chain_id = self._task_chain_ids.pop(task_id, task_id)
+        remaining = self._chains.get(chain_id)
+        if remaining is not None:
+            remaining.discard(task_id)
+            if remaining and was_successful:
+                return
+            del self._chains[chain_id]
+        # the resources of a failed chain are already released
+        nproc = self._reserved.pop(chain_id, None)
+        if nproc is not None:
+            self.total_nproc -= nproc
+            self.nworkers -= 1
+
+
+class _BackfillWait(object):
+
+    """The (first) runnable task that is waiting for enough free procs
+
+    Smaller tasks are backfilled for at most max_wait (sec), after that no
+    new tasks are started until the waiting task can run.
+    """
+
+    def __init__(self, max_wait):
+        self.max_wait = max_wait
+        self.tnode = None
+        self.started_at = None
+
+    def __repr__(self):
+        _d = dict(k=self.__class__.__name__, t=self.tnode, w=self.max_wait)
+        return "<{k} task:{t} max wait:{w} >".format(**_d)
+
+    def start(self, tnode, now):
+        self.tnode = tnode
+        self.started_at = now
+
+    def reset(self):
+        self.tnode = None
+        self.started_at = None
+
+    def is_expired(self, now):
+        return self.tnode is not None and now - self.started_at > self.max_wait
+
+
+def _to_task_id(tnode):
+    # base task_id-instance_id
+    return '-'.join([tnode.meta_task.task_id, str(tnode.instance_id)])
+
+
+def _to_submittable_tasks(runnable_tnodes, resource_slots, to_task_func, backfill_wait, now=None):
+    """
+    Select the runnable tasks (in scheduler order) that fit in the available
+    worker slots and procs, and reserve their resources.
+
+    Tasks that require more procs than are available are skipped and the
+    smaller tasks are backfilled, until the first skipped task has waited
+    longer than the backfill max wait. Then only this task can be selected.
+
+    :type resource_slots: _ResourceSlots
+    :type backfill_wait: _BackfillWait
+    :returns: [(tnode, task)]
+    """
+    now = time.time() if now is None else now
+    runnable_tnodes = list(runnable_tnodes)
+
+    if backfill_wait.tnode is not None and backfill_wait.tnode not in runnable_tnodes:
+        # e.g., the task was submitted in a fused chain
+        backfill_wait.reset()
+
+    if backfill_wait.is_expired(now):
+        # don't start any smaller tasks, so the waiting task can start
+        # once enough tasks have completed
+        runnable_tnodes = [backfill_wait.tnode]
+
+    tnodes_tasks = []
+    for tnode in runnable_tnodes:
+        if not resource_slots.has_available_worker():
+            break
+
+        task = to_task_func(tnode)
+
+        if not resource_slots.has_available_nproc(task.nproc):
+            # not enough slots to run in
+            if backfill_wait.tnode is None:
+                backfill_wait.start(tnode, now)
+                slog.info("Task {t} is waiting for {n} procs ({m} total proc in use)".format(t=_to_task_id(tnode), n=task.nproc, m=resource_slots.total_nproc))
+            continue
+
+        if tnode == backfill_wait.tnode:
+            backfill_wait.reset()
+
+        resource_slots.reserve(_to_task_id(tnode), task.nproc)
+        tnodes_tasks.append((tnode, task))
+
+    return tnodes_tasks
+
+
+def _to_fused_task_chains(bg, tnodes_tasks, to_task_func, to_nproc_func, max_nfused_tasks, excluded_task_ids=()):
+    """
+    Returns the linear chains [[(tnode, task)]] of the submitted tasks that
+    are run in a single job, and the remaining [(tnode, task)].
+
+    The downstream tasks of a chain are created before the upstream tasks
+    are run (the input files are the output files of the upstream task) and
+    are marked as SUBMITTED. The tasks are run in sequence with the procs of
+    the head task, the chain stops at the first task with a different nproc.
+    The Task of a downstream task is only created if the task is added to
+    the chain.
+
+    :param to_task_func: func(tnode, input_files=None) -> Task
+    :param to_nproc_func: func(tnode) -> resolved nproc of the Task
+    :param excluded_task_ids: Task ids that are never fused (e.g., run in-process)
+    """
+    fused_chains = []
+    others = []
+    for tnode, task in tnodes_tasks:
+        chain = [(tnode, task)]
+        max_nchain_tasks = 1 if tnode.meta_task.task_id in excluded_task_ids else max_nfused_tasks
+        for next_tnode in B.get_fusible_task_chain(bg, tnode, max_nchain_tasks)[1:]:
+            if next_tnode.meta_task.task_id in excluded_task_ids:
+                break
+            if to_nproc_func(next_tnode) != task.nproc:
+                break
+            input_files = B.get_fused_task_input_files(bg, next_tnode, chain[-1][1].output_files)
+            next_task = to_task_func(next_tnode, input_files=input_files)
+            B.update_task_state(bg, next_tnode, TaskStates.SUBMITTED)
+            chain.append((next_tnode, next_task))
+
+        if len(chain) > 1:
+            fused_chains.append(chain)
+        else:
+            others.append((tnode, task))
+
+    return fused_chains, others
+
+
+def _to_pilot_pool(workflow_opts, cluster_renderer, workflow_dir):
+    """
+    Returns the PilotPool that runs the distributed tasks, or None if the
+    pilot mode is disabled
+
+    :type workflow_opts: WorkflowLevelOptions
+    """
+    if workflow_opts.max_npilots <= 0:
+        return None
+
+    queue_dir = os.path.join(workflow_dir, "pilot-queue")
+    if workflow_opts.pilot_mode == GlobalConstants.PILOT_MODE_LOCAL:
+        return PilotPool(queue_dir, workflow_opts.max_npilots, nproc=workflow_opts.max_nproc)
+
+    if cluster_renderer is None:
+        slog.warn("No cluster manager. Disabling the cluster pilot workers.")
+        return None
+    return PilotPool(queue_dir, workflow_opts.max_npilots, nproc=workflow_opts.max_nproc, cluster_renderer=cluster_renderer)
+
+
+def _to_inprocess_task_ids_and_modules(workflow_opts, registered_tasks):
+    """
+    Returns the opted-in task ids (see inprocess_task_ids) that are Python
+    tool contract tasks and the set of their modules
+
+    :type workflow_opts: WorkflowLevelOptions
+    :rtype: (set, set)
+    """
+    task_ids, module_names = set(), set()
+    if workflow_opts.max_ninprocess_workers <= 0:
+        return task_ids, module_names
+
+    for task_id in (x.strip() for x in workflow_opts.inprocess_task_ids.split(",")):
+        if not task_id:
+            continue
+        meta_task = registered_tasks.get(task_id)
+        if not isinstance(meta_task, (ToolContractMetaTask, ScatterToolContractMetaTask, GatherToolContractMetaTask)):
+            slog.warn("Unable to run task {i} in-process. Not a registered tool contract".format(i=task_id))
+            continue
+        # same cmd as the MetaTask to_cmd
+        rtc_cmd = T.to_python_rtc_cmd("{d} {m}".format(d=meta_task.driver.driver_exe, m=GlobalConstants.RESOLVED_TOOL_CONTRACT_JSON))
+        if rtc_cmd is None:
+            slog.warn("Unable to run task {i} in-process. Not a Python tool contract (driver '{d}')".format(i=task_id, d=meta_task.driver.driver_exe))
+            continue
+        task_ids.add(task_id)
+        module_names.add(rtc_cmd[0])
+
+    return task_ids, module_names
+
+
+def _is_inline_task(tnode, task):
+    """Lightweight scatter and gather tasks (not distributed, single proc)
+    that can be run inline by the driver threads"""
+    return (isinstance(tnode.meta_task, (ScatterToolContractMetaTask, GatherToolContractMetaTask)) and
+            not tnode.meta_task.is_distributed and task.nproc == 1)
+
+
+def _to_inprocess_pool(workflow_opts, module_names, workflow_dir):
+    """
+    Returns the PilotPool of the local pre-warmed workers that run the Python
+    tool contract tasks in-process, or None if the in-process mode is
+    disabled
+
+    :type workflow_opts: WorkflowLevelOptions
+    """
+    if workflow_opts.max_ninprocess_workers <= 0 or not module_names:
+        return None
+
+    queue_dir = os.path.join(workflow_dir, "inprocess-queue")
+    pilot_args = ["--in-process", "--preload", ",".join(sorted(module_names))]
+    return PilotPool(queue_dir, workflow_opts.max_ninprocess_workers, pilot_args=pilot_args)
+
+
 def _write_terminate_script(output_dir):
 
     def __writer(fx, sx):
@@ -302,6 +658,10 @@ def __exe_workflow(global_registry, ep_d, bg, task_opts, workflow_opts, output_d
     job_resources, ds, master_log_ds_file = DU.job_resource_create_and_setup_logs(output_dir, bg, task_opts, workflow_opts, ep_d)
     slog.info("successfully created job resources.")
 
+    # The task and file state transitions are appended to the journal
+    journal = DU.WorkflowJournal(os.path.join(job_resources.workflow, GlobalConstants.WORKFLOW_JOURNAL_JSONL))
+    bg.add_state_listener(journal.to_listener(bg))
+
     slog.info("starting to execute {m} workflow with assigned job_id {i}".format(i=job_id, m=m_))
     slog.info("system {m} {x} nproc:{n}".format(m=platform.system(), n=multiprocessing.cpu_count(), x=platform.node()))
     slog.info("exe'ing workflow Cluster renderer {c}".format(c=global_registry.cluster_renderer))
@@ -313,8 +673,19 @@ def __exe_workflow(global_registry, ep_d, bg, task_opts, workflow_opts, output_d
     slog.info("Max number of Chunks  {n} ".format(n=workflow_opts.max_nchunks))
     slog.info("Max number of nproc   {n}".format(n=workflow_opts.max_nproc))
     slog.info("Max number of workers {n}".format(n=workflow_opts.max_nworkers))
+    slog.info("Task scheduler        {n}".format(n=workflow_opts.scheduler))
+    slog.info("Max number of pilots  {n} ({m})".format(n=workflow_opts.max_npilots, m=workflow_opts.pilot_mode))
+    slog.info("Max number of fused tasks {n}".format(n=workflow_opts.max_nfused_tasks))
+    slog.info("Max backfill wait     {n} sec".format(n=workflow_opts.backfill_max_wait))
+    slog.info("Max task log size     {n} MB".format(n=workflow_opts.max_task_log_size))
+    slog.info("Max number of in-process workers {n}".format(n=workflow_opts.max_ninprocess_workers))
+    slog.info("Max number of inline workers {n}".format(n=workflow_opts.max_ninline_workers))
     slog.info("tmp dir               {n}".format(n=workflow_opts.tmp_dir))
 
+    # In debug mode, validate the entire graph after every graph rewrite
+    if workflow_opts.debug_mode:
+        bg.full_integrity_check = True
+
     # Some Pre-flight checks
     # Help initialize graph/epoints
     B.resolve_entry_points(bg, ep_d)
@@ -331,14 +702,15 @@ def __exe_workflow(global_registry, ep_d, bg, task_opts, workflow_opts, output_d
 
     slog.info("validating binding graph")
     # Check the degree of the nodes
-    B.validate_binding_graph_integrity(bg)
+    B.validate_binding_graph_integrity(bg, full=True)
     slog.info("successfully validated binding graph.")
 
     # Add scattered
     # This will add new nodes to the graph if necessary
     B.apply_chunk_operator(bg, global_registry.chunk_operators, global_registry.tasks, workflow_opts.max_nchunks)
 
-    log.debug(BU.to_binding_graph_summary(bg))
+    if is_log_level_emitted(log, logging.DEBUG):
+        log.debug(BU.to_binding_graph_summary(bg))
 
     slog.info("pbsmrtpipe main process pid={i} pgroupid={g} ppid={p}".format(i=os.getpid(), g=os.getpgrp(), p=os.getppid()))
     _write_terminate_script(output_dir)
@@ -354,13 +726,33 @@ def __exe_workflow(global_registry, ep_d, bg, task_opts, workflow_opts, output_d
     # Local vars
     max_total_nproc = workflow_opts.total_max_nproc
     max_nworkers = workflow_opts.max_nworkers
+    get_runnable_tasks = _to_get_runnable_tasks_func(workflow_opts)
     max_nproc = workflow_opts.max_nproc
     max_nchunks = workflow_opts.max_nchunks
+    max_nfused_tasks = workflow_opts.max_nfused_tasks
     tmp_dir = workflow_opts.tmp_dir
 
+    # The task runners are child processes (or cluster jobs) of the driver
+    os.environ[GlobalConstants.ENV_MAX_TASK_LOG_SIZE] = str(workflow_opts.max_task_log_size)
+    # The job env is already written to the workflow dir
+    os.environ[GlobalConstants.ENV_WRITE_TASK_ENV_JSON] = "1" if workflow_opts.debug_mode else "0"
+
     q_out = multiprocessing.Queue()
+    pilot_pool = _to_pilot_pool(workflow_opts, global_registry.cluster_renderer, job_resources.workflow)
+    # Python tool contract tasks that are run by the in-process workers
+    inprocess_task_ids, inprocess_module_names = _to_inprocess_task_ids_and_modules(workflow_opts, global_registry.tasks)
+    inprocess_pool = _to_inprocess_pool(workflow_opts, inprocess_module_names, job_resources.workflow)
+    if inprocess_pool is None:
+        inprocess_task_ids = set()
+    else:
+        slog.info("Running tasks {x} in-process".format(x=sorted(inprocess_task_ids)))
+    # Launches the task subprocesses and posts the TaskResult(s) to q_out
+    supervisor = TaskSupervisor(q_out, cluster_renderer=global_registry.cluster_renderer, pilot_pool=pilot_pool,
+                                inprocess_pool=inprocess_pool, max_ninline_workers=workflow_opts.max_ninline_workers)
+
+    # datastore.json (and datastore.html) are rewritten in batches
+    ds_writer = DU.DataStoreWriter(ds, job_resources.datastore_json, os.path.join(job_resources.html, 'datastore.html'))
 
-    worker_sleep_time = 1
     # To store all the reports that are displayed in the analysis.html
     # {id:task-id, report_path:path/to/report.json}
     analysis_file_links = []
@@ -370,8 +762,8 @@ def __exe_workflow(global_registry, ep_d, bg, task_opts, workflow_opts, output_d
     # Time to sleep between each step the execution loop
     # after the first 1 minute of exe, update the sleep time to 2 sec
     sleep_time = 1
-    # Running total of current number of slots/cpu's used
-    total_nproc = 0
+    # Running total of current number of slots/cpu's (and workers) used
+    resource_slots = _ResourceSlots(max_nworkers, max_total_nproc)
 
     # Assign the workflow "task report" UUID, so this can be used in the datastore
     task_report_dsf_uuid = str(uuid.uuid4())
@@ -400,17 +792,14 @@ def __exe_workflow(global_registry, ep_d, bg, task_opts, workflow_opts, output_d
         analysis_file_links.append(analysis_link)
         write_analysis_report(analysis_file_links)
 
-    # factories for getting a Worker instance
-    # utils for getting the running func and worker type
-    def _to_worker(w_is_distributed, wid, task_uuid, task_id, manifest_path_):
+    # Start the task subprocess and return the Worker handle
+    def _to_worker(w_is_distributed, wid, task_uuid, task_id, manifest_path_, nproc_):
+        if pilot_pool is not None and w_is_distributed:
+            return supervisor.submit_to_pilot(task_uuid, task_id, manifest_path_, name=wid)
         # the IO loading will forceful set this to None
         # if the cluster manager not defined or cluster_mode is False
-        if global_registry.cluster_renderer is None or not w_is_distributed:
-            r_func = T.run_task_manifest
-        else:
-            r_func = T.run_task_manifest_on_cluster
-        return TaskManifestWorker(q_out, shutdown_event, worker_sleep_time,
-                                  r_func, task_uuid, task_id, manifest_path_, name=wid)
+        is_cluster_ = global_registry.cluster_renderer is not None and w_is_distributed
+        return supervisor.submit(task_uuid, task_id, manifest_path_, is_distributed=is_cluster_, name=wid, nproc=nproc_)
 
     # Define a bunch of util funcs to try to make the main driver while loop
     # more understandable. Not the greatest model.
@@ -423,6 +812,19 @@ def __exe_workflow(global_registry, ep_d, bg, task_opts, workflow_opts, output_d
         p = os.path.join(job_resources.html, 'task_summary.html')
         R.write_report_to_html(task_summary_report, p)
 
+    # The reports are rewritten when the graph state changes (rate-limited),
+    # and always for the terminal states (force=True)
+    workflow_report_writer = DU.RateLimitedReportWriter(write_workflow_report_, Constants.REPORT_WRITE_INTERVAL)
+    task_summary_writer = DU.RateLimitedReportWriter(write_task_summary_report, Constants.REPORT_WRITE_INTERVAL)
+
+    def log_graph_summary(bg_):
+        log.debug("\n" + BU.to_binding_graph_summary(bg_))
+
+    # The summary is expensive for large graphs. Only generated if DEBUG
+    # messages are emitted (e.g., debug mode) and the graph has changed
+    is_debug_log_emitted = is_log_level_emitted(log, logging.DEBUG)
+    graph_summary_logger = DU.RateLimitedReportWriter(log_graph_summary, Constants.GRAPH_SUMMARY_LOG_INTERVAL)
+
     def services_log_update_progress(source_id_, level_, message_):
         if service_job_client is not None:
             service_job_client.log_workflow_progress(message_, level_, source_id_)
@@ -469,15 +871,12 @@ def __exe_workflow(global_registry, ep_d, bg, task_opts, workflow_opts, output_d
                                      is_chunked=is_chunked_,
                                      name=name,
                                      description=description)
-            ds.add(ds_file_)
-            ds.write_update_json(job_resources.datastore_json)
+            ds_writer.add(ds_file_)
 
             # Update Services
             if not is_chunked_:
                 services_add_datastore_file(ds_file_)
 
-            dsr = DU.datastore_to_report(ds)
-            R.write_report_to_html(dsr, os.path.join(job_resources.html, 'datastore.html'))
             if file_type_ == FileTypes.REPORT:
                 T.write_task_report(job_resources, task_.task_id, path_, DU._get_images_in_dir(task_.output_dir))
                 update_analysis_file_links(tnode_.idx, path_)
@@ -496,20 +895,164 @@ def __exe_workflow(global_registry, ep_d, bg, task_opts, workflow_opts, output_d
         services_update_job_task(task_result.task_uuid, TaskStates.FAILED, terse_msg, error_message=task_result.error_message)
         return mx
 
-    def has_available_slots(n):
-        if max_total_nproc is None:
-            return True
-        return total_nproc + n <= max_total_nproc
+    _to_tid = _to_task_id
+
+    def _to_task(tnode_, input_files=None):
+        """Create the task dir and convert the MetaTask -> Task
+
+        The input files are from the (resolved) input file nodes, unless
+        provided.
+        """
+        task_dir_ = os.path.join(job_resources.tasks, _to_tid(tnode_))
+        if not os.path.exists(task_dir_):
+            os.mkdir(task_dir_)
+
+        to_resources_func = B.to_resolve_di_resources(task_dir_, root_tmp_dir=workflow_opts.tmp_dir)
+        if input_files is None:
+            input_files = B.get_task_input_files(bg, tnode_)
+
+        # convert metatask -> task
+        try:
+            return GX.meta_task_to_task(tnode_.meta_task, input_files, task_opts, task_dir_, max_nproc, max_nchunks,
+                                        to_resources_func, to_resolve_files_func)
+        except Exception as e:
+            slog.error("Failed to convert metatask {i} to task. {m}".format(i=tnode_.meta_task.task_id, m=e.message))
+            raise
+
+    def _to_nproc(tnode_):
+        return GX.resolve_nproc(tnode_.meta_task, max_nproc)
+
+    def _get_or_to_task(tnode_, input_files=None):
+        """Returns the cached Task, or converts the MetaTask -> Task.
+
+        The Task is only created once, hence the nproc (and output files)
+        are only resolved once, even if the task has to wait for procs
+        to be available.
+        """
+        if tnode_ not in tnode_to_task:
+            task_ = _to_task(tnode_, input_files=input_files)
+            bg.node[tnode_]['nproc'] = task_.nproc
+            tnode_to_task[tnode_] = task_
+        return tnode_to_task[tnode_]
+
+    def _write_runnable_task(tnode_, task_):
+        """Write the TC, RTC and RunnableTask JSON files to the task dir
+
+        Returns the path to the RunnableTask JSON file
+        """
+        task_dir_ = os.path.join(job_resources.tasks, _to_tid(tnode_))
+        task_tmp = copy.deepcopy(task_)
+        if isinstance(tnode_.meta_task, (ToolContractMetaTask, ScatterToolContractMetaTask, GatherToolContractMetaTask)):
+            # the task.options have actually already been resolved here, but using this other
+            # code path for clarity
+            if isinstance(tnode_.meta_task, ToolContractMetaTask):
+                rtc = IO.static_meta_task_to_rtc(tnode_.meta_task, task_, task_opts, task_dir_, tmp_dir, max_nproc, is_distributed=is_workflow_distributable)
+            elif isinstance(tnode_.meta_task, ScatterToolContractMetaTask):
+                rtc = IO.static_scatter_meta_task_to_rtc(tnode_.meta_task, task_, task_opts, task_dir_, tmp_dir, max_nproc, max_nchunks, tnode_.meta_task.chunk_keys, is_distributed=is_workflow_distributable)
+            elif isinstance(tnode_.meta_task, GatherToolContractMetaTask):
+                # this should always be a TaskGatherBindingNode which will have a .chunk_key
+                rtc = IO.static_gather_meta_task_to_rtc(tnode_.meta_task, task_, task_opts, task_dir_, tmp_dir, max_nproc, tnode_.chunk_key, is_distributed=is_workflow_distributable)
+            else:
+                raise TypeError("Unsupported task type {t}".format(t=tnode_.meta_task))
+
+            # write driver manifest, which calls the resolved-tool-contract.json
+            # there's too many layers of indirection here. Partly due to the pre-tool-contract era
+            # python defined tasks.
+            # Always write the RTC json for debugging purposes
+            tc_path = os.path.join(task_dir_, GlobalConstants.TOOL_CONTRACT_JSON)
+            write_tool_contract(tnode_.meta_task.tool_contract, tc_path)
+
+            rtc_json_path = os.path.join(task_dir_, GlobalConstants.RESOLVED_TOOL_CONTRACT_JSON)
+            rtc_avro_path = os.path.join(task_dir_, GlobalConstants.RESOLVED_TOOL_CONTRACT_AVRO)
+            if rtc.driver.serialization == 'avro':
+                # hack to fix command
+                task_.cmds[0] = task_.cmds[0].replace('.json', '.avro')
+                write_resolved_tool_contract_avro(rtc, rtc_avro_path)
+            # for debugging
+            write_resolved_tool_contract(rtc, rtc_json_path)
+            # workaround for SE-587
+            task_tmp.resolved_options = rtc.task.options
+
+        runnable_task_path = os.path.join(task_dir_, GlobalConstants.RUNNABLE_TASK_JSON)
+        runnable_task = RunnableTask(task_tmp, global_registry.cluster_renderer)
+        runnable_task.write_json(runnable_task_path)
+        return runnable_task_path
+
+    def _register_worker(tnode_, task_, w_):
+        tid_ = _to_tid(tnode_)
+        workers[tid_] = w_
+        slog.info("Starting worker {i} ({n} workers running)".format(i=tid_, n=len(workers)))
+
+        msg_ = "Updating task {t} to SUBMITTED".format(t=tid_)
+        log.debug(msg_)
+        tid_to_tnode[tid_] = tnode_
+        services_log_update_progress("pbsmrtpipe::{i}".format(i=tnode_.idx), WS.LogLevels.INFO, msg_)
+
+        services_create_job_task(task_.uuid, task_.task_id, task_.task_type_id, task_.display_name)
+        # BU.write_binding_graph_images(bg, job_resources.workflow)
+
+    def _submit_task(tnode_, task_, runnable_task_path_):
+        """Start the Worker for the task. The task must already be in the
+        SUBMITTED state"""
+        tid_ = _to_tid(tnode_)
+        bg.node[tnode_]['task'] = task_
+
+        # Start the task subprocess
+        wid_ = "worker-task-{i}".format(i=tid_)
+        if workflow_opts.max_ninline_workers > 0 and _is_inline_task(tnode_, task_):
+            w = supervisor.submit_inline(task_.uuid, tid_, runnable_task_path_, T.run_task_manifest_inline, name=wid_)
+        elif tnode_.meta_task.task_id in inprocess_task_ids:
+            w = supervisor.submit_in_process(task_.uuid, tid_, runnable_task_path_, name=wid_)
+        else:
+            w = _to_worker(tnode_.meta_task.is_distributed, wid_, task_.uuid, tid_, runnable_task_path_, task_.nproc)
+        _register_worker(tnode_, task_, w)
+
+    def _submit_array_tasks(tnodes_tasks_paths_):
+        """Start the Workers for the (chunked) tasks as a single cluster
+        array job. The tasks must already be in the SUBMITTED state"""
+        task_items_ = []
+        for tnode_, task_, runnable_task_path_ in tnodes_tasks_paths_:
+            tid_ = _to_tid(tnode_)
+            bg.node[tnode_]['task'] = task_
+            task_items_.append((task_.uuid, tid_, runnable_task_path_, "worker-task-{i}".format(i=tid_)))
+
+        array_dir_ = os.path.join(job_resources.workflow, "cluster-arrays", "{i}-array".format(i=task_items_[0][1]))
+        slog.info("Submitting {n} tasks as a cluster array job in {d}".format(n=len(task_items_), d=array_dir_))
+        ws_ = supervisor.submit_array(task_items_, array_dir_)
+
+        for (tnode_, task_, _), w_ in zip(tnodes_tasks_paths_, ws_):
+            _register_worker(tnode_, task_, w_)
+
+    def _submit_fused_tasks(tnodes_tasks_paths_):
+        """Start the Workers for a chain of fused tasks as a single job
+        that runs the tasks in sequence. The tasks must already be in the
+        SUBMITTED state"""
+        task_items_ = []
+        for tnode_, task_, runnable_task_path_ in tnodes_tasks_paths_:
+            tid_ = _to_tid(tnode_)
+            bg.node[tnode_]['task'] = task_
+            task_items_.append((task_.uuid, tid_, runnable_task_path_, "worker-task-{i}".format(i=tid_)))
+
+        fused_dir_ = os.path.join(job_resources.workflow, "fused-tasks", "{i}-fused".format(i=task_items_[0][1]))
+        slog.info("Submitting {n} fused tasks {x} as a single job in {d}".format(n=len(task_items_), x=[x[1] for x in task_items_], d=fused_dir_))
+        ws_ = supervisor.submit_chain(task_items_, fused_dir_, is_distributed=is_workflow_distributable)
+
+        for (tnode_, task_, _), w_ in zip(tnodes_tasks_paths_, ws_):
+            _register_worker(tnode_, task_, w_)
 
     # Misc setup
-    write_workflow_report_(bg, TaskStates.CREATED, False)
+    workflow_report_writer.write(bg, TaskStates.CREATED, False, force=True)
     # write empty analysis reports
     write_analysis_report(analysis_file_links)
 
     # Add Master log to the datastore file
     services_add_datastore_file(master_log_ds_file)
 
-    BU.write_binding_graph_images(bg, job_resources.workflow)
+    # The images are rendered in the background, a new write cancels the
+    # rendering of the previous graph
+    graph_image_writer = BU.BindingGraphImageWriter(job_resources.workflow)
+    graph_image_writer.write(bg)
+    graph_image_writer.wait(Constants.GRAPH_IMAGES_SETUP_WAIT)
 
     # write initial report.
     DU.write_main_workflow_report(job_id, job_resources, workflow_opts, task_opts, bg, TaskStates.RUNNING, False, 0.0)
@@ -519,8 +1062,7 @@ def __exe_workflow(global_registry, ep_d, bg, task_opts, workflow_opts, output_d
                                     job_resources.tasks_report,
                                     name="Workflow Task Reports",
                                     description="Workflow Task Report details")
-    ds.add(task_report_dsf)
-    ds.write_update_json(job_resources.datastore_json)
+    ds_writer.add(task_report_dsf)
 
     exit_code = None
     error_message = None
@@ -533,23 +1075,39 @@ def __exe_workflow(global_registry, ep_d, bg, task_opts, workflow_opts, output_d
     tnode_to_task = {}
 
     is_workflow_distributable = global_registry.cluster_renderer is not None
-    # local loop for adjusting sleep time, this will get reset after each new
-    # task is created
+    # Submit the chunked tasks of a chunk group as an array job (the pilots
+    # already amortize the cluster queue latency)
+    is_workflow_array_distributable = is_workflow_distributable and global_registry.cluster_renderer.supports_array and pilot_pool is None
+    # Submit the linear chains of distributed tasks as a single job
+    is_workflow_fusible = is_workflow_distributable and pilot_pool is None and max_nfused_tasks > 1
+    # local loop for adjusting the max time to block on the worker result
+    # queue, this will get reset after each new task is created or a task
+    # result is processed
     niterations = 0
     dt_ramp = 0.25
-    # number of iterations before switching to steady state sleep
+    # number of iterations before switching to steady state timeout
     stead_state_n = 50
-    # sleep for 5 sec
+    # block for at most 4 sec
     dt_stead_state = 4
+    # Runnable task that is waiting for enough procs to be available
+    backfill_wait = _BackfillWait(workflow_opts.backfill_max_wait)
     term_file = os.path.join(output_dir, GlobalConstants.TERM_FILE)
+
+    supervisor.start()
     try:
         log.debug("Starting execution loop... in process {p}".format(p=os.getpid()))
 
         while True:
             # After the initial startup, bump up the time to reduce resource usage
-            # (since multiple instances will be launched from the services)
+            # (since multiple instances will be launched from the services).
+            # The driver blocks on the result queue, so a task result will
+            # wake the loop immediately regardless of the timeout.
             niterations += 1
-            if niterations < stead_state_n:
+            if niterations == 1:
+                # something happened in the previous pass (e.g., task was
+                # submitted), look for more work without blocking.
+                sleep_time = 0
+            elif niterations < stead_state_n:
                 sleep_time = dt_ramp
             else:
                 sleep_time = dt_stead_state
@@ -574,28 +1132,28 @@ def __exe_workflow(global_registry, ep_d, bg, task_opts, workflow_opts, output_d
 
             # Check if Any tasks are running or that there still runnable tasks
             is_completed = bg.is_workflow_complete()
-            has_task_running = B.has_running_task(bg)
 
-            if not has_task_running:
-                if not is_completed:
-                    if not B.has_task_in_states(bg, TaskStates.RUNNABLE_STATES()):
-                        if not B.has_next_runnable_task(bg):
-                            msg = "Unable to find runnable task or any tasks running and workflow is NOT completed."
-                            log.error(msg)
-                            log.error(BU.to_binding_graph_summary(bg))
-                            services_log_update_progress("pbsmrtpipe", WS.LogLevels.ERROR, msg)
-                            raise PipelineRuntimeError(msg)
+            if B.is_workflow_stalled(bg):
+                msg = "Unable to find runnable task or any tasks running and workflow is NOT completed."
+                log.error(msg)
+                log.error(BU.to_binding_graph_summary(bg))
+                services_log_update_progress("pbsmrtpipe", WS.LogLevels.ERROR, msg)
+                raise PipelineRuntimeError(msg)
 
-            time.sleep(sleep_time)
+            # Block until a task result (or the terminate file) arrives
+            timeout = 0 if is_completed else sleep_time
+            results = _get_task_results(q_out, timeout, term_file)
 
-            # log.debug("Sleeping for {s}".format(s=sleep_time))
-            log.debug("\n" + BU.to_binding_graph_summary(bg))
-            # BU.to_binding_graph_task_summary(bg)
+            if is_debug_log_emitted:
+                graph_summary_logger.write(bg)
 
-            # This should only be triggered after events. The main reason
-            # to keep updating it was the html report is up to date with the
-            # runtime
-            write_workflow_report_(bg, TaskStates.RUNNING, is_completed)
+            # Only rewritten if the graph has changed. Called on every
+            # iteration, so a rate limited write is retried.
+            workflow_report_writer.write(bg, TaskStates.RUNNING, is_completed)
+            task_summary_writer.write(bg)
+            # write the pending datastore updates and journal records
+            ds_writer.flush()
+            journal.flush()
 
             if is_completed:
                 msg_ = "Workflow is completed. breaking out."
@@ -603,200 +1161,125 @@ def __exe_workflow(global_registry, ep_d, bg, task_opts, workflow_opts, output_d
                 services_log_update_progress("pbsmrtpipe", WS.LogLevels.INFO, msg_)
                 break
 
-            try:
-                result = q_out.get_nowait()
-            except Queue.Empty:
-                result = None
-
-            # log.info("Results {r}".format(r=result))
-            if isinstance(result, TaskResult):
-                niterations = 0
-                log.debug("Task result {r}".format(r=result))
+            for result in results:
+                # log.info("Results {r}".format(r=result))
+                if isinstance(result, TaskResult):
+                    niterations = 0
+                    log.debug("Task result {r}".format(r=result))
 
-                tnode_ = tid_to_tnode[result.task_id]
-                task_ = tnode_to_task[tnode_]
+                    tnode_ = tid_to_tnode[result.task_id]
+                    task_ = tnode_to_task[tnode_]
 
-                # Process Successful Task Result
-                if result.state == TaskStates.SUCCESSFUL:
-                    msg_ = "Task was successful {r}".format(r=result)
-                    slog.info(msg_)
+                    # Process Successful Task Result
+                    if result.state == TaskStates.SUCCESSFUL:
+                        msg_ = "Task was successful {r}".format(r=result)
+                        slog.info(msg_)
 
-                    # this will raise if a task output is failed to be resolved
-                    B.validate_outputs_and_update_task_to_success(bg, tnode_, result.run_time_sec, bg.node[tnode_]['task'].output_files)
-                    slog.info("Successfully validated outputs of {t}".format(t=str(tnode_)))
+                        # this will raise if a task output is failed to be resolved
+                        B.validate_outputs_and_update_task_to_success(bg, tnode_, result.run_time_sec, bg.node[tnode_]['task'].output_files)
+                        slog.info("Successfully validated outputs of {t}".format(t=str(tnode_)))
 
-                    services_log_update_progress("pbsmrtpipe::{i}".format(i=result.task_id), WS.LogLevels.INFO, msg_)
-                    B.update_task_output_file_nodes(bg, tnode_, tnode_to_task[tnode_])
-                    B.resolve_successor_binding_file_path(bg)
+                        services_log_update_progress("pbsmrtpipe::{i}".format(i=result.task_id), WS.LogLevels.INFO, msg_)
+                        B.update_task_output_file_nodes(bg, tnode_, tnode_to_task[tnode_])
+                        B.resolve_successor_binding_file_path(bg)
 
-                    total_nproc -= task_.nproc
-                    w_ = workers.pop(result.task_id)
-                    _terminate_worker(w_)
+                        resource_slots.release(result.task_id)
+                        w_ = workers.pop(result.task_id)
+                        _terminate_worker(w_)
 
-                    # Update Analysis Reports and Register output files to Datastore
-                    _update_analysis_reports_and_datastore(tnode_, task_)
+                        # Update Analysis Reports and Register output files to Datastore
+                        _update_analysis_reports_and_datastore(tnode_, task_)
 
-                    update_msg_ = _status_task_msg(bg, tnode_, result)
+                        update_msg_ = _status_task_msg(bg, tnode_, result)
 
-                    slog.info(update_msg_)
-                    services_update_job_task(task_.uuid, TaskStates.SUCCESSFUL, update_msg_)
+                        slog.info(update_msg_)
+                        services_update_job_task(task_.uuid, TaskStates.SUCCESSFUL, update_msg_)
 
-                    # BU.write_binding_graph_images(bg, job_resources.workflow)
-                else:
-                    # Process Non-Successful Task Result
-                    B.update_task_state(bg, tnode_, result.state)
-                    error_message = _log_task_failure_and_call_services(result, result.task_id)
+                        # BU.write_binding_graph_images(bg, job_resources.workflow)
+                    else:
+                        # Process Non-Successful Task Result
+                        B.update_task_state(bg, tnode_, result.state)
+                        error_message = _log_task_failure_and_call_services(result, result.task_id)
 
-                    # let the remaining running jobs continue
-                    w_ = workers.pop(result.task_id)
-                    _terminate_worker(w_)
+                        # let the remaining running jobs continue
+                        w_ = workers.pop(result.task_id)
+                        _terminate_worker(w_)
 
-                    total_nproc -= task_.nproc
-                    has_failed = True
+                        resource_slots.release(result.task_id, was_successful=False)
+                        has_failed = True
 
-                    # BU.write_binding_graph_images(bg, job_resources.workflow)
+                        # BU.write_binding_graph_images(bg, job_resources.workflow)
 
-                _update_msg = _status(bg)
-                log.info(_update_msg)
-                slog.info(_update_msg)
+                    _update_msg = _status(bg)
+                    log.info(_update_msg)
+                    slog.info(_update_msg)
 
-                s_ = TaskStates.FAILED if has_failed else TaskStates.RUNNING
+                    s_ = TaskStates.FAILED if has_failed else TaskStates.RUNNING
 
-                write_workflow_report_(bg, s_, False)
-                write_task_summary_report(bg)
+                    workflow_report_writer.write(bg, s_, False)
 
-            elif not isinstance(result, types.NoneType):
-                log.error("Unexpected queue result type {t} {r}".format(t=type(result), r=result))
+                else:
+                    log.error("Unexpected queue result type {t} {r}".format(t=type(result), r=result))
 
             if has_failed:
                 log.error("job has failed. breaking out.")
                 # Just kill everything
                 break
 
-            # Computational resources are tapped
-            if len(workers) >= max_nworkers:
-                # don't do anything
+            # Fill all the available worker slots (and the total nproc
+            # budget) in a single pass, and remove the tasks from the
+            # runnable tasks
+            tnodes_tasks = _to_submittable_tasks(get_runnable_tasks(bg), resource_slots, _get_or_to_task, backfill_wait)
+            for tnode, _ in tnodes_tasks:
+                B.update_task_state(bg, tnode, TaskStates.SUBMITTED)
+
+            if not tnodes_tasks:
                 continue
 
-            tnode = B.get_next_runnable_task(bg)
+            niterations = 0
+            nsubmitted = len(tnodes_tasks)
 
-            if tnode is None:
-                continue
-            elif isinstance(tnode, TaskBindingNode):
-                niterations = 0
-                # Found a Runnable Task
-
-                # base task_id-instance_id
-                tid = '-'.join([tnode.meta_task.task_id, str(tnode.instance_id)])
-
-                task_dir = os.path.join(job_resources.tasks, tid)
-                if not os.path.exists(task_dir):
-                    os.mkdir(task_dir)
-
-                to_resources_func = B.to_resolve_di_resources(task_dir, root_tmp_dir=workflow_opts.tmp_dir)
-                input_files = B.get_task_input_files(bg, tnode)
-
-                # convert metatask -> task
-                try:
-                    task = GX.meta_task_to_task(tnode.meta_task, input_files, task_opts, task_dir, max_nproc, max_nchunks,
-                                                to_resources_func, to_resolve_files_func)
-                except Exception as e:
-                    slog.error("Failed to convert metatask {i} to task. {m}".format(i=tnode.meta_task.task_id, m=e.message))
-                    raise
-
-                # log.debug(task)
-
-                bg.node[tnode]['nproc'] = task.nproc
-
-                if not has_available_slots(task.nproc):
-                    # not enough slots to run in
-                    continue
-
-                bg.node[tnode]['task'] = task
-                tnode_to_task[tnode] = task
-
-                task_tmp = copy.deepcopy(task)
-                if isinstance(tnode.meta_task, (ToolContractMetaTask, ScatterToolContractMetaTask, GatherToolContractMetaTask)):
-                    # the task.options have actually already been resolved here, but using this other
-                    # code path for clarity
-                    if isinstance(tnode.meta_task, ToolContractMetaTask):
-                        rtc = IO.static_meta_task_to_rtc(tnode.meta_task, task, task_opts, task_dir, tmp_dir, max_nproc, is_distributed=is_workflow_distributable)
-                    elif isinstance(tnode.meta_task, ScatterToolContractMetaTask):
-                        rtc = IO.static_scatter_meta_task_to_rtc(tnode.meta_task, task, task_opts, task_dir, tmp_dir, max_nproc, max_nchunks, tnode.meta_task.chunk_keys, is_distributed=is_workflow_distributable)
-                    elif isinstance(tnode.meta_task, GatherToolContractMetaTask):
-                        # this should always be a TaskGatherBindingNode which will have a .chunk_key
-                        rtc = IO.static_gather_meta_task_to_rtc(tnode.meta_task, task, task_opts, task_dir, tmp_dir, max_nproc, tnode.chunk_key, is_distributed=is_workflow_distributable)
-                    else:
-                        raise TypeError("Unsupported task type {t}".format(t=tnode.meta_task))
-
-                    # write driver manifest, which calls the resolved-tool-contract.json
-                    # there's too many layers of indirection here. Partly due to the pre-tool-contract era
-                    # python defined tasks.
-                    # Always write the RTC json for debugging purposes
-                    tc_path = os.path.join(task_dir, GlobalConstants.TOOL_CONTRACT_JSON)
-                    write_tool_contract(tnode.meta_task.tool_contract, tc_path)
-
-                    rtc_json_path = os.path.join(task_dir, GlobalConstants.RESOLVED_TOOL_CONTRACT_JSON)
-                    rtc_avro_path = os.path.join(task_dir, GlobalConstants.RESOLVED_TOOL_CONTRACT_AVRO)
-                    if rtc.driver.serialization == 'avro':
-                        # hack to fix command
-                        task.cmds[0] = task.cmds[0].replace('.json', '.avro')
-                        write_resolved_tool_contract_avro(rtc, rtc_avro_path)
-                    # for debugging
-                    write_resolved_tool_contract(rtc, rtc_json_path)
-                    # workaround for SE-587
-                    task_tmp.resolved_options = rtc.task.options
-
-                runnable_task_path = os.path.join(task_dir, GlobalConstants.RUNNABLE_TASK_JSON)
-                runnable_task = RunnableTask(task_tmp, global_registry.cluster_renderer)
-                runnable_task.write_json(runnable_task_path)
-
-                # Create an instance of Worker
-                w = _to_worker(tnode.meta_task.is_distributed, "worker-task-{i}".format(i=tid), task.uuid, tid, runnable_task_path)
-
-                workers[tid] = w
-                w.start()
-                total_nproc += task.nproc
-                slog.info("Starting worker {i} ({n} workers running, {m} total proc in use)".format(i=tid, n=len(workers), m=total_nproc))
-
-                # Submit job to be run.
-                B.update_task_state(bg, tnode, TaskStates.SUBMITTED)
-                msg_ = "Updating task {t} to SUBMITTED".format(t=tid)
-                log.debug(msg_)
-                tid_to_tnode[tid] = tnode
-                services_log_update_progress("pbsmrtpipe::{i}".format(i=tnode.idx), WS.LogLevels.INFO, msg_)
-
-                services_create_job_task(task.uuid, task.task_id, task.task_type_id, task.display_name)
-                # BU.write_binding_graph_images(bg, job_resources.workflow)
-
-            elif isinstance(tnode, EntryOutBindingFileNode):
-                # Handle EntryPoint types. This is not a particularly elegant design :(
-                bg.node[tnode]['nproc'] = 1
-                log.info("Marking task as completed {t}".format(t=tnode))
-                B.update_task_state_to_success(bg, tnode, 0.0)
-                # Update output paths
-                mock_file_index = 0
-                for fnode in bg.successors(tnode):
-                    file_path = "/path/to/mock-file-{i}.txt".format(i=mock_file_index)
-                    B.update_file_state_to_resolved(bg, fnode, file_path)
-                    mock_file_index += 1
-            else:
-                raise TypeError("Unsupported node type {t} of '{x}'".format(t=type(tnode), x=tnode))
+            # The linear chains are run in the same job, with the resources
+            # reserved by the head task of the chain
+            fused_chains = []
+            if is_workflow_fusible:
+                fused_chains, tnodes_tasks = _to_fused_task_chains(bg, tnodes_tasks, _get_or_to_task, _to_nproc, max_nfused_tasks, inprocess_task_ids)
+                for chain in fused_chains:
+                    resource_slots.add_chain(_to_tid(chain[0][0]), [_to_tid(tnode) for tnode, _ in chain[1:]])
+                    nsubmitted += len(chain) - 1
+
+            # Write all the RTC and runnable-task JSON files, then start the
+            # workers for the entire batch
+            runnable_task_paths = [_write_runnable_task(tnode, task) for tnode, task in tnodes_tasks]
+
+            tnodes_tasks_paths = [(tnode, task, p) for (tnode, task), p in zip(tnodes_tasks, runnable_task_paths)]
+            array_groups = []
+            if is_workflow_array_distributable:
+                array_groups, tnodes_tasks_paths = _to_cluster_array_groups(tnodes_tasks_paths, inprocess_task_ids)
+
+            for tnode, task, runnable_task_path in tnodes_tasks_paths:
+                _submit_task(tnode, task, runnable_task_path)
+
+            for array_group in array_groups:
+                _submit_array_tasks(array_group)
+
+            for chain in fused_chains:
+                _submit_fused_tasks([(tnode, task, _write_runnable_task(tnode, task)) for tnode, task in chain])
+
+            slog.info("Submitted {x} tasks ({n} workers running, {m} total proc in use)".format(x=nsubmitted, n=len(workers), m=resource_slots.total_nproc))
 
             # Update state of any files
             B.resolve_successor_binding_file_path(bg)
-            # Final call to write empty analysis reports
-            write_analysis_report(analysis_file_links)
 
         # end of while loop
         _terminate_all_workers(workers.values(), shutdown_event)
 
-        if has_failed:
-            log.debug("\n" + BU.to_binding_graph_summary(bg))
+        if has_failed and is_debug_log_emitted:
+            graph_summary_logger.write(bg, force=True)
 
         was_successful = B.was_workflow_successful(bg)
         s_ = TaskStates.SUCCESSFUL if was_successful else TaskStates.FAILED
-        write_workflow_report_(bg, s_, was_successful, error_message)
+        workflow_report_writer.write(bg, s_, was_successful, error_message, force=True)
         # FIXME(nechols)(2016-11-30) very hacky workaround
         if was_successful:
             exit_code = GlobalConstants.EXIT_SUCCESS
@@ -806,23 +1289,21 @@ def __exe_workflow(global_registry, ep_d, bg, task_opts, workflow_opts, output_d
             exit_code = GlobalConstants.EXIT_FAILURE
 
     except PipelineRuntimeKeyboardInterrupt:
-        write_workflow_report_(bg, TaskStates.KILLED, False)
-        write_task_summary_report(bg)
-        BU.write_binding_graph_images(bg, job_resources.workflow)
+        _terminate_all_workers(workers.values(), shutdown_event)
+        workflow_report_writer.write(bg, TaskStates.KILLED, False, force=True)
         exit_code = GlobalConstants.EXIT_TERMINATED
 
     except Exception as e:
         slog.error("Unexpected error {e}. Writing reports and shutting down".format(e=str(e)))
         # update workflow reports to failed
-        write_workflow_report_(bg, TaskStates.FAILED, False, error_message)
-        write_task_summary_report(bg)
+        workflow_report_writer.write(bg, TaskStates.FAILED, False, error_message, force=True)
         services_log_update_progress("pbsmrtpipe", WS.LogLevels.ERROR, "Error {e}".format(e=e))
-        BU.write_binding_graph_images(bg, job_resources.workflow)
         raise
 
     finally:
-        write_task_summary_report(bg)
-        BU.write_binding_graph_images(bg, job_resources.workflow)
+        supervisor.shutdown()
+        task_summary_writer.write(bg, force=True)
+        graph_image_writer.write(bg)
 
         source_ids_to_update = (GlobalConstants.SOURCE_ID_INFO_LOG, GlobalConstants.SOURCE_ID_MASTER_LOG)
         # file_id and source_id are the same
@@ -833,8 +1314,11 @@ def __exe_workflow(global_registry, ep_d, bg, task_opts, workflow_opts, output_d
             if ds_file is not None:
                 ds_file.file_size = os.path.getsize(ds_file.path)
                 services_update_datastore_file(ds_file)
+                ds_writer.mark_updated()
 
-        ds.write_update_json(job_resources.datastore_json)
+        ds_writer.flush(force=True)
+        journal.flush(force=True)
+        graph_image_writer.close(Constants.GRAPH_IMAGES_MAX_WAIT)
 
     return exit_code
 
@@ -1,9 +1,13 @@
+import datetime
+import glob
 import json
 import os
 import logging
 import pprint
 import shutil
+import time
 import uuid
+from collections import defaultdict, OrderedDict
 
 from pbcommand.utils import setup_log
 from pbcommand.models import DataStore, DataStoreFile, FileTypes
@@ -12,9 +16,8 @@ from pbcommand.models.report import Attribute, Report, Table, Column, Plot, Plot
 import pbsmrtpipe
 
 import pbsmrtpipe.report_renderer as R
-import pbsmrtpipe.graph.bgraph_utils as BU
 import pbsmrtpipe.pb_io as IO
-from pbsmrtpipe.graph.models import VALID_ALL_TASK_NODE_CLASSES
+from pbsmrtpipe.graph.models import VALID_ALL_TASK_NODE_CLASSES, ConstantsNodes
 from pbsmrtpipe.models import TaskStates, JobResources, RunnableTask
 from pbsmrtpipe.utils import setup_internal_logs
 import pbsmrtpipe.constants as GlobalConstants
@@ -236,6 +239,193 @@ def datastore_to_report(ds, report_uuid=None):
     return Report("datastore_report", tables=[t], attributes=attrs, uuid=report_uuid)
 
 
+class DataStoreWriter(object):
+
+    """Batches the writes of the job DataStore
+
+    The files are added to the DataStore immediately, but the datastore.json
+    is only (atomically) rewritten after max_nfiles added files, or if the
+    pending files were added more than write_interval sec ago. The
+    datastore.html report is rendered at most every html_interval sec.
+
+    flush() should be called periodically. flush(force=True) writes the
+    pending changes (e.g., at the end of the job).
+    """
+
+    def __init__(self, ds, json_path, html_path, write_interval=5, max_nfiles=100, html_interval=60):
+        """
+        :type ds: DataStore
+        """
+        self.ds = ds
+        self.json_path = json_path
+        self.html_path = html_path
+        self.write_interval = write_interval
+        self.max_nfiles = max_nfiles
+        self.html_interval = html_interval
+        # number of updates since the last write
+        self._nupdates = 0
+        self._updated_at = None
+        self._is_html_stale = False
+        self._html_written_at = 0
+
+    def __repr__(self):
+        _d = dict(k=self.__class__.__name__, n=len(self.ds.files), u=self._nupdates)
+        return "<{k} nfiles:{n} pending:{u} >".format(**_d)
+
+    def mark_updated(self):
+        """The DataStore (e.g., a DataStoreFile) was modified in place"""
+        if self._nupdates == 0:
+            self._updated_at = time.time()
+        self._nupdates += 1
+        self._is_html_stale = True
+
+    def add(self, ds_file):
+        self.ds.add(ds_file)
+        self.mark_updated()
+        self.flush()
+
+    def _write_json(self):
+        # the datastore.json is read by other processes while the job is running
+        tmp_path = self.json_path + ".tmp"
+        self.ds.write_update_json(tmp_path)
+        os.rename(tmp_path, self.json_path)
+        log.debug("wrote {n} updates of {x} to {p}".format(n=self._nupdates, x=self, p=self.json_path))
+        self._nupdates = 0
+        self._updated_at = None
+
+    def _write_html(self):
+        R.write_report_to_html(datastore_to_report(self.ds), self.html_path)
+        self._is_html_stale = False
+        self._html_written_at = time.time()
+
+    def flush(self, force=False):
+        now = time.time()
+        if self._nupdates > 0:
+            if force or self._nupdates >= self.max_nfiles or now - self._updated_at >= self.write_interval:
+                self._write_json()
+        if self._is_html_stale:
+            if force or now - self._html_written_at >= self.html_interval:
+                self._write_html()
+
+
+class RateLimitedReportWriter(object):
+
+    """Writes a report of the graph, write_func(bg, *args), only if the graph
+    (see the structure and state versions of the BindingsGraph) or the args
+    have changed since the last write, and at most every min_interval sec.
+
+    The report should be written with force=True for terminal states.
+    """
+
+    def __init__(self, write_func, min_interval=10):
+        self.write_func = write_func
+        self.min_interval = min_interval
+        self._written_key = None
+        self._written_at = 0
+        self.nwrites = 0
+
+    def __repr__(self):
+        _d = dict(k=self.__class__.__name__, n=self.nwrites, i=self.min_interval)
+        return "<{k} writes:{n} interval:{i} >".format(**_d)
+
+    def write(self, bg, *args, **kwargs):
+        """Returns True if the report was written"""
+        force = kwargs.pop("force", False)
+        key = (bg.structure_version, bg.state_version, args, sorted(kwargs.items()))
+        if not force:
+            if key == self._written_key or time.time() - self._written_at < self.min_interval:
+                return False
+        self.write_func(bg, *args, **kwargs)
+        self._written_key = key
+        self._written_at = time.time()
+        self.nwrites += 1
+        return True
+
+
+class WorkflowJournal(object):
+
+    """Append-only journal of the task and file state transitions of the
+    workflow. Each transition is a JSON record on a single line (JSONL),
+    hence the journal can be read incrementally while the job is running.
+
+    Registered as a state listener of the BindingsGraph. The records are
+    buffered and appended to the file after max_nrecords records, or if the
+    pending records were added more than write_interval sec ago.
+
+    flush() should be called periodically. flush(force=True) writes the
+    pending records (e.g., at the end of the job).
+    """
+
+    def __init__(self, path, write_interval=5, max_nrecords=1000):
+        self.path = path
+        self.write_interval = write_interval
+        self.max_nrecords = max_nrecords
+        # {(node id, key): value} to only record the transitions
+        self._states = {}
+        self._records = []
+        self._added_at = None
+        self.nrecords = 0
+
+    def __repr__(self):
+        _d = dict(k=self.__class__.__name__, n=self.nrecords, p=len(self._records))
+        return "<{k} records:{n} pending:{p} >".format(**_d)
+
+    @staticmethod
+    def _to_record(bg, node, key, value):
+        r = OrderedDict([("updated_at", datetime.datetime.now().isoformat()),
+                         ("node_id", node.ix),
+                         ("klass", node.__class__.__name__)])
+        if key == ConstantsNodes.TASK_ATTR_STATE:
+            r['event'] = "task_state"
+            r['task_id'] = node.meta_task.task_id if hasattr(node, 'meta_task') else None
+            r['state'] = value
+        else:
+            r['event'] = "file_state"
+            r['is_resolved'] = value
+            r['path'] = bg.node[node][ConstantsNodes.FILE_ATTR_PATH]
+        return r
+
+    def to_listener(self, bg):
+        """Returns the listener func(node, key, value) of the graph
+
+        :type bg: BindingsGraph
+        """
+        def _f(node, key, value):
+            self.add(bg, node, key, value)
+        return _f
+
+    def add(self, bg, node, key, value):
+        state_key = (node.ix, key)
+        if self._states.get(state_key) == value:
+            return
+        self._states[state_key] = value
+        if not self._records:
+            self._added_at = time.time()
+        self._records.append(json.dumps(self._to_record(bg, node, key, value)))
+        if len(self._records) >= self.max_nrecords:
+            self.flush(force=True)
+
+    def flush(self, force=False):
+        if not self._records:
+            return
+        if force or time.time() - self._added_at >= self.write_interval:
+            with open(self.path, 'a') as f:
+                f.write("\n".join(self._records) + "\n")
+            self.nrecords += len(self._records)
+            self._records = []
+            self._added_at = None
+
+
+def load_workflow_journal(path):
+    """Load the records of the workflow journal
+
+    :rtype: list
+    """
+    with open(path, 'r') as f:
+        # the last line can be partially written if the job is running
+        return [json.loads(line) for line in f if line.endswith("\n")]
+
+
 def _get_images_in_dir(dir_name, formats=(".png", ".svg")):
     # report plots only support
     return [os.path.join(dir_name, i_) for i_ in os.listdir(dir_name) if any(i_.endswith(x) for x in formats)]
@@ -291,6 +481,32 @@ def write_update_main_workflow_report(job_id, job_resources, bg_, state_, was_su
     return True
 
 
+def load_task_run_times(job_dir):
+    """
+    Load the task run times of the successful tasks from the
+    task-report.json files of a previous job.
+
+    :param job_dir: Root job output dir
+    :returns: {task type id: mean run time (sec)}
+    """
+    run_times = defaultdict(list)
+    for path in glob.glob(os.path.join(job_dir, 'tasks', '*', GlobalConstants.TASK_REPORT_JSON)):
+        try:
+            with open(path, 'r') as f:
+                d = json.load(f)
+            # attribute ids are namespaced by the report id
+            attrs = {a['id'].split('.')[-1]: a['value'] for a in d.get('attributes', [])}
+        except (IOError, ValueError, KeyError) as e:
+            log.warn("Unable to load task run time from {p}. {e}".format(p=path, e=e))
+            continue
+
+        if attrs.get('exit_code') == 0 and attrs.get('run_time') is not None:
+            run_times[attrs['task_id']].append(float(attrs['run_time']))
+
+    log.info("Loaded run times for {n} task types from {d}".format(n=len(run_times), d=job_dir))
+    return {task_id: sum(xs) / len(xs) for task_id, xs in run_times.iteritems()}
+
+
 def write_task_manifest(manifest_path, tid, task, resource_types, task_version, python_mode_str, cluster_renderer):
     """
 
@@ -360,8 +576,6 @@ def job_resource_create_and_setup_logs(job_root_dir, bg, task_opts, workflow_lev
     log.info("Starting pbsmrtpipe {v}".format(v=pbsmrtpipe.get_version()))
     log.info("\n" + _log_pbsmrptipe_header())
 
-    BU.write_binding_graph_images(bg, job_resources.workflow)
-
     write_entry_points_json(job_resources.entry_points_json, ep_d)
 
     # Need to map entry points to a FileType and store in the DataStore? or
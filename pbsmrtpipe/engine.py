@@ -12,22 +12,36 @@ import platform
 import tempfile
 import shlex
 import signal
-import Queue
+import select
+import errno
+import json
+import fcntl
+import pipes
+import shutil
+import gzip
+import itertools
+import uuid
+from collections import deque
+from multiprocessing.pool import ThreadPool
 
 from pbsmrtpipe.cluster import ClusterTemplateRender
 from pbsmrtpipe.cluster import Constants as ClusterConstants
-from pbsmrtpipe.models import TaskResult
+from pbsmrtpipe.models import TaskResult, TaskStates
+import pbsmrtpipe.constants as GlobalConstants
 
 log = logging.getLogger(__name__)
 slog = logging.getLogger('status.' + __name__)
 
 
-def backticks(cmd, merge_stderr=True):
+def backticks(cmd, merge_stderr=True, max_nlines=None):
     """
 
     :param cmd: Single string of command to execute
     :type cmd: str
 
+    :param max_nlines: Only keep the last max_nlines of stdout (None keeps
+    all the lines)
+
     This interface has some legacy related issues.
     The output type of stdout and stderr are different
 
@@ -55,7 +69,7 @@ def backticks(cmd, merge_stderr=True):
 
     log.debug("Running on {s} with cmd '{c}'".format(s=node_id, c=cmd))
 
-    out = [l[:-1] for l in p.stdout.readlines()]
+    out = [l[:-1] for l in deque(p.stdout, max_nlines)]
 
     p.stdout.close()
 
@@ -82,228 +96,352 @@ def backticks(cmd, merge_stderr=True):
     return errCode, output, errorMessage, run_time
 
 
-class AsynchronousFileReader(threading.Thread):
+class TailBuffer(object):
 
-    """
-    Helper class to implement asynchronous reading of a file
-    in a separate thread. Pushes read lines on a queue to
-    be consumed in another thread.
+    """Bounded ring buffer of the last nlines lines of a stream
+
+    The data is fed in arbitrary chunks. Lines are split on '\\n' and '\\r'
+    (progress bars), only the last max_line_length chars of a line are kept.
+
+    line_func (if provided) is called with each completed line.
     """
 
-    def __init__(self, fd, queue):
-        assert isinstance(queue, Queue.Queue)
-        assert callable(fd.readline)
-        threading.Thread.__init__(self)
-        self._fd = fd
-        self._queue = queue
+    def __init__(self, nlines=GlobalConstants.TASK_LOG_NLINES, max_line_length=4096, line_func=None):
+        self._lines = deque(maxlen=nlines)
+        self._partial = ""
+        self.max_line_length = max_line_length
+        self.line_func = line_func
 
-    def run(self):
-        """The body of the tread: read lines and put them on the queue."""
-        for line in iter(self._fd.readline, ''):
-            self._queue.put(line)
+    def feed(self, data):
+        lines = (self._partial + data).replace("\r\n", "\n").replace("\r", "\n").split("\n")
+        self._partial = lines.pop()[-self.max_line_length:]
+        if self.line_func is not None:
+            for line in lines:
+                self.line_func(line)
+        self._lines.extend(line[-self.max_line_length:] for line in lines[-self._lines.maxlen:])
+
+    def get_lines(self):
+        lines = list(self._lines)
+        if self._partial:
+            lines.append(self._partial)
+        return lines[-self._lines.maxlen:]
+
+    def to_str(self):
+        return "\n".join(self.get_lines())
+
+
+class OutputCapture(object):
 
-    def eof(self):
-        """Check whether there is no more content to expect."""
-        return not self.is_alive() and self._queue.empty()
+    """Streaming capture of the output (stdout or stderr) of a subprocess
 
+    The output is written to the file as it's read (see pump) and only the
+    last nlines are kept in memory (see TailBuffer), e.g., for the error
+    message of a failed task.
 
-class FileTail(object):
-    """Like 'tail -f'.
+    If max_bytes > 0, the file is rotated when it exceeds max_bytes
+    ({path} -> {path}.1.gz, the last nbackups rotated files are kept).
+    Rotation is only supported when a path is provided. With a file handle,
+    the output is written to the file handle. With None, only the tail is
+    kept.
+
+    The capture can be used as a (write only) file handle.
     """
-    @staticmethod
-    def __read(ifh, pos, nbytes):
-        ifh.seek(pos, 0)
-        b = ifh.read(nbytes)
-        pos = ifh.tell()
-        return b, pos
-
-    def skip(self):
-        """Skip to end.
-        Return number of bytes skipped.
-        
-        I recommend using this after read(n) to avoid
-        reading and logging excessively large output.
+
+    CHUNK_SIZE = 65536
+
+    def __init__(self, path_or_fh=None, nlines=GlobalConstants.TASK_LOG_NLINES,
+                 max_bytes=0, nbackups=GlobalConstants.TASK_LOG_NBACKUPS,
+                 compress=True, line_func=None, mode='w'):
+        if hasattr(path_or_fh, 'write'):
+            self.path, self._fh, self._is_owner = None, path_or_fh, False
+        elif path_or_fh is None:
+            self.path, self._fh, self._is_owner = None, None, False
+        else:
+            self.path, self._fh, self._is_owner = path_or_fh, open(path_or_fh, mode), True
+
+        self.max_bytes = max_bytes if self._is_owner else 0
+        self.nbackups = max(nbackups, 1)
+        self.compress = compress
+        self.nrotations = 0
+        self._nbytes = 0 if self._fh is None or mode == 'w' else self._fh.tell()
+        self._tail = TailBuffer(nlines, line_func=line_func)
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        _d = dict(k=self.__class__.__name__, p=self.path, n=self.nrotations)
+        return "<{k} path:{p} nrotations:{n} >".format(**_d)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _to_backup_path(self, i):
+        return "{p}.{i}{x}".format(p=self.path, i=i, x=".gz" if self.compress else "")
+
+    def _rotate(self):
+        self._fh.close()
+        for i in xrange(self.nbackups - 1, 0, -1):
+            if os.path.exists(self._to_backup_path(i)):
+                os.rename(self._to_backup_path(i), self._to_backup_path(i + 1))
+        if self.compress:
+            with open(self.path, 'rb') as r:
+                with gzip.open(self._to_backup_path(1), 'wb') as w:
+                    shutil.copyfileobj(r, w)
+        else:
+            os.rename(self.path, self._to_backup_path(1))
+        self._fh = open(self.path, 'w')
+        self._nbytes = 0
+        self.nrotations += 1
+        log.debug("Rotated {p} ({n} rotations)".format(p=self.path, n=self.nrotations))
+
+    def write(self, data):
+        with self._lock:
+            self._tail.feed(data)
+            if self._fh is not None:
+                self._fh.write(data)
+                self._nbytes += len(data)
+                if self.max_bytes > 0 and self._nbytes > self.max_bytes:
+                    self._rotate()
+
+    def flush(self):
+        with self._lock:
+            if self._fh is not None:
+                self._fh.flush()
+
+    def close(self):
+        with self._lock:
+            if self._is_owner and not self._fh.closed:
+                self._fh.close()
+
+    def get_tail(self):
+        """Last nlines of the output as a str"""
+        with self._lock:
+            return self._tail.to_str()
+
+    def pump(self, pipe):
+        """Copy the pipe (e.g., Popen.stdout) to the capture until EOF in a
+        daemon thread. The pipe is closed at EOF.
+
+        If the file can't be written to (e.g., disk full), the pipe is still
+        drained to avoid blocking the subprocess.
+
+        :rtype: threading.Thread
         """
-        pos = self.ifh.tell()
-        self.ifh.seek(0, 2)
-        self.pos = self.ifh.tell()
-        return self.pos - pos
+        def _pump():
+            fd = pipe.fileno()
+            was_written = True
+            try:
+                while True:
+                    try:
+                        data = os.read(fd, self.CHUNK_SIZE)
+                    except OSError as e:
+                        if e.errno == errno.EINTR:
+                            continue
+                        raise
+                    if not data:
+                        break
+                    if was_written:
+                        try:
+                            self.write(data)
+                        except EnvironmentError as e:
+                            log.error("Unable to write output to {p}. {e}".format(p=self.path, e=e))
+                            was_written = False
+            finally:
+                pipe.close()
+
+        t = threading.Thread(target=_pump, name="output-capture-{f}".format(f=pipe.fileno()))
+        t.daemon = True
+        t.start()
+        return t
+
+
+class ProcessWaiter(object):
+
+    """Wait for a subprocess to exit without polling
+
+    A daemon thread blocks in waitpid (Popen.wait) and closes the write end of
+    a pipe when the process exits. wait() blocks (select) on the read end, so
+    the exit is detected immediately.
+
+    The waiter thread reaps the process, Popen.wait and Popen.poll should not
+    be called on the process.
+    """
 
-    def read(self, nbytes):
-        """Read contents appended since last read().
+    def __init__(self, process):
+        self.process = process
+        self._has_exited = False
+        self._exit_r, exit_w = os.pipe()
+        self._thread = threading.Thread(target=self._wait_for_exit, args=(exit_w, ),
+                                        name="process-waiter-{p}".format(p=process.pid))
+        self._thread.daemon = True
+        self._thread.start()
 
-        Re-open 'fn' on each call and seek to last end.
-        If the file does not exist (yet?), return ''.
-        This eliminates all sorts of async i/o problems.
+    def __repr__(self):
+        _d = dict(k=self.__class__.__name__, p=self.process.pid, r=self.process.returncode)
+        return "<{k} pid:{p} returncode:{r} >".format(**_d)
+
+    def _wait_for_exit(self, exit_w):
+        try:
+            self.process.wait()
+        finally:
+            os.close(exit_w)
 
-        Read up to 'nbytes', or all available if negative.
+    def wait(self, timeout=None, shutdown_event=None, check_interval=1.0):
+        """
+        Block until the process has exited, the timeout (sec) has elapsed or
+        the shutdown event is set (checked every check_interval sec)
 
-        Side-effects:
-        * self.pos can be incremented.
-        * self.ifh has read-only operations.
+        :return: exit code or None if the process is still running
         """
-        b, self.pos = self.__read(self.ifh, self.pos, nbytes)
-        return b
+        deadline = None if timeout is None else time.time() + timeout
 
-    def __init__(self, ifh):
-        self.ifh = ifh
-        self.pos = 0
+        while not self._has_exited:
+            if shutdown_event is not None and shutdown_event.is_set():
+                break
+
+            wait_time = None if shutdown_event is None else check_interval
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                wait_time = remaining if wait_time is None else min(wait_time, remaining)
 
-class FileTailWhenReady(object):
-    """Proxy for FileTail.
-    Waits until fn is available.
-    """
-    def skip(self):
-        return self.tail.skip()
-    def read(self, nbytes):
-        if self.fn:
             try:
-                self.tail = FileTail(open(self.fn, 'rb'))
-                self.fn = None
-            except IOError:
-                pass
-        return self.tail.read(nbytes)
+                rs, _, _ = select.select([self._exit_r], [], [], wait_time)
+            except select.error as e:
+                if e.args[0] != errno.EINTR:
+                    raise
+                continue
 
-    def __init__(self, fn, inittail):
-        self.fn = fn
-        self.tail = inittail
+            if rs:
+                self._thread.join()
+                os.close(self._exit_r)
+                self._has_exited = True
 
-class EmptyTail(object):
-    def skip(self):
-        return 0
-    def read(self, nbytes):
-        return ''
+        return self.process.returncode
 
-def create_file_tail_reader(fn):
-    return FileTailWhenReady(fn, EmptyTail())
 
-import itertools
-_counter = itertools.count()
-# _counter.next() is thread-safe.
+def _start_output_pumps(process, stdout_capture, stderr_capture):
+    pumps = []
+    for pipe, capture in ((process.stdout, stdout_capture), (process.stderr, stderr_capture)):
+        if pipe is not None:
+            pumps.append(capture.pump(pipe))
+    return pumps
+
 
 def run_command_async(command, file_stdout=None, file_stderr=None):
     """
-    Async pulling of the stdout, stderr from the subprocess without deadlocking.
+    Run the command and stream the stdout, stderr of the subprocess to
+    file_stdout, file_stderr (path or file handle) and the status log.
 
-    Modified from: http://stefaanlippens.net/python-asynchronous-subprocess-pipe-reading
-    """
-    # Choose output filenames.
-    c = _counter.next()
-    fno = '%d.stdout' %c
-    fne = '%d.stderr' %c
-
-    # Delete old files.
-    def rm(fn):
-        print "RM: %r" %fn
-        if os.path.exists(fn):
-            os.unlink(fn)
-    rm(fno)
-    rm(fne)
-
-    # Create filehandles.
-    ofho = open(fno, 'w')
-    ofhe = open(fne, 'w')
-
-    # Launch the command as subprocess.
-    slog.info("subcommand: `%s` in %s"%(command, os.getcwd()))
-    process = subprocess.Popen(shlex.split(command), stdout=ofho,
-                               stderr=ofhe)
-
-    process.poll()
-    pid = process.pid
-    slog.debug("pid={i} pgroupid={g}".format(i=pid, g=os.getpgid(pid)))
+    Only the last lines of the stdout and stderr are kept in memory.
 
-    # Launch the asynchronous readers of the process' stdout and stderr.
-    stdout_queue = create_file_tail_reader(fno)
-    stderr_queue = create_file_tail_reader(fne)
+    :return: (exit code, stdout tail, stderr tail, run_time_sec)
     """
-    stdout_queue = Queue.Queue()
-    stdout_reader = AsynchronousFileReader(process.stdout, stdout_queue)
-    stdout_reader.start()
-    stderr_queue = Queue.Queue()
-    stderr_reader = AsynchronousFileReader(process.stderr, stderr_queue)
-    stderr_reader.start()
-    """
-
-    # store the stdout and stderr
-    stdouts = []
-    stderrs = []
+    slog.info("subcommand: `%s` in %s" % (command, os.getcwd()))
 
     started_at = time.time()
 
-    def readlines(q, write):
-        for line in q.read(-1).splitlines():
-                write(line.rstrip())
-    def stdout_write(line):
-        slog.info(line)
-        stdouts.append(line)
-    def stderr_write(line):
-        slog.error(line)
-        stderrs.append(line)
-
-    # Check the queues if we received some output (until there is nothing
-    # more to get).
+    stdout_capture = OutputCapture(file_stdout, line_func=slog.info)
+    stderr_capture = OutputCapture(file_stderr, line_func=slog.error)
+
     try:
-      while process.returncode is None:
-        # Show what we received from standard output.
-        readlines(stdout_queue, stdout_write)
-
-        # Show what we received from standard error.
-        readlines(stderr_queue, stderr_write)
-
-        # Sleep a bit before asking the readers again.
-        time.sleep(1)
-        process.poll()
-    except KeyboardInterrupt as e:
-        log.critical("Received %r. Please wait...\n" %e)
-        # Try to capture a stack-trace from the process, if Python.
-        # Worst case: User can Ctrl-C again.
-        #process.send_signal(signal.SIGINT) # Does not seem to be needed anymore.
-        process.wait()
-        #slog.exception(e)  # TODO: Delete this line, when confident this is logged elsewhere.
-        raise
+        process = subprocess.Popen(shlex.split(command), stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE)
+        pid = process.pid
+        pumps = _start_output_pumps(process, stdout_capture, stderr_capture)
+        waiter = ProcessWaiter(process)
+        try:
+            slog.debug("pid={i} pgroupid={g}".format(i=pid, g=os.getpgid(pid)))
+        except OSError:
+            # the process has already exited
+            pass
+
+        try:
+            waiter.wait()
+        except KeyboardInterrupt as e:
+            log.critical("Received %r. Please wait...\n" % e)
+            # Worst case: User can Ctrl-C again.
+            waiter.wait()
+            raise
+        finally:
+            for pump in pumps:
+                pump.join()
     finally:
-        # Let's be tidy and join the threads we've started.
-        ##stdout_reader.join()
-        ##stderr_reader.join()
-
-        # This will cause NFS to update the files,
-        # according to a friend at AMD. They had this problem in spades there.
-        os.listdir('.')
-        # But note that for us, missing output from the subproc is really no
-        # big deal. It's merely informative, and it's always available to
-        # the curious in the stdout/err files.
-
-        readlines(stdout_queue, stdout_write)
-        readlines(stderr_queue, stderr_write)
-
-        # Close subprocess' file descriptors.
-        ofho.close()
-        ofhe.close()
-        #process.stdout.close()
-        #process.stderr.close()
-
-    def _write_to_fh_or_file(fh_or_file, contents):
-        if hasattr(fh_or_file, 'write'):
-            fh_or_file.write(contents)
-        else:
-            with open(fh_or_file, 'w') as w:
-                w.write(contents)
+        stdout_capture.flush()
+        stderr_capture.flush()
+        stdout_capture.close()
+        stderr_capture.close()
+
+    run_time = time.time() - started_at
+    return process.returncode, stdout_capture.get_tail(), stderr_capture.get_tail(), run_time
+
+
+def _to_output_stream(fh):
+    return subprocess.PIPE if isinstance(fh, OutputCapture) else fh
 
-    _write_to_fh_or_file(file_stderr, "\n".join(stderrs))
-    _write_to_fh_or_file(file_stdout, "\n".join(stdouts))
+
+def _wait_for_command(process, cmd, stdout_fh, stderr_fh, time_out, started_at):
+    """Wait for the process (killed after time_out sec) while the output is
+    streamed to the OutputCapture(s)
+
+    :return: (exit code, stdout tail, stderr tail, run_time_sec)
+    """
+    pid = process.pid
+    pumps = _start_output_pumps(process, stdout_fh, stderr_fh)
+    waiter = ProcessWaiter(process)
+    try:
+        slog.debug("pid={i} pgroupid={g}".format(i=pid, g=os.getpgid(pid)))
+    except OSError:
+        # the process has already exited
+        pass
+
+    # After a timeout, don't block on the output of (orphaned) child processes
+    pump_time_out = None
+    if waiter.wait(timeout=time_out) is None:
+        log.info("Exceeded TIMEOUT of {t}. Killing cmd '{c}'".format(t=time_out, c=cmd))
+        try:
+            process.send_signal(signal.SIGINT) # Maybe get a stack-trace?
+            if waiter.wait(timeout=1) is None:
+                process.terminate()
+                process.kill()
+        except OSError:
+            log.exception('Problem while terminating sub-process.')
+        waiter.wait()
+        pump_time_out = 1
+
+    for pump in pumps:
+        pump.join(pump_time_out)
+
+    stdout_fh.flush()
+    stderr_fh.flush()
 
     run_time = time.time() - started_at
-    return process.returncode, "\n".join(stdouts), "\n".join(stderrs), run_time
 
+    returncode = process.returncode
+    log.info("returncode is {r} in {s:.2f} sec.".format(r=process.returncode,
+                                                        s=run_time))
+
+    def _to_tail(fh):
+        return fh.get_tail() if isinstance(fh, OutputCapture) else ""
+
+    return returncode, _to_tail(stdout_fh), _to_tail(stderr_fh), run_time
 
-def run_command(cmd, stdout_fh, stderr_fh, shell=True, time_out=None):
+
+def run_command(cmd, stdout_fh, stderr_fh, shell=True, time_out=None, cwd=None):
     """Run command
 
+    stdout_fh and stderr_fh are file handles or OutputCapture instances. The
+    output of the subprocess is streamed to the OutputCapture(s) and the
+    last lines of the output are returned.
 
     :param time_out: (None, Int) Timeout in seconds.
 
-    :return: (exit code, stdout, stderr, run_time_sec)
+    :param cwd: Working dir of the command (defaults to the current dir)
+
+    :return: (exit code, stdout tail, stderr tail, run_time_sec)
 
     """
 
@@ -314,46 +452,125 @@ def run_command(cmd, stdout_fh, stderr_fh, shell=True, time_out=None):
 
     hostname = platform.node()
     slog.debug("calling cmd '{c}' on {h}".format(c=cmd, h=hostname))
-    process = subprocess.Popen(cmd, stderr=stderr_fh, stdout=stdout_fh, shell=shell)
+    process = subprocess.Popen(cmd, stderr=_to_output_stream(stderr_fh), stdout=_to_output_stream(stdout_fh), shell=shell, cwd=cwd)
 
-    # This needs a better dynamic model
-    max_sleep_time = 5
-    sleep_time = 0.1
-    dt = 0.1
+    return _wait_for_command(process, cmd, stdout_fh, stderr_fh, time_out, started_at)
 
-    process.poll()
-    pid = process.pid
-    slog.debug("pid={i} pgroupid={g}".format(i=pid, g=os.getpgid(pid)))
-    while process.returncode is None:
-        process.poll()
-        time.sleep(sleep_time)
-        run_time = time.time() - started_at
-        if time_out is not None:
-            if run_time > time_out:
-                log.info("Exceeded TIMEOUT of {t}. Killing cmd '{c}'".format(t=time_out, c=cmd))
-                try:
-                    process.send_signal(signal.SIGINT) # Maybe get a stack-trace?
-                    time.sleep(1)
-                    process.terminate()
-                    process.kill()
-                except OSError:
-                    log.exception('Problem while terminating sub-process.')
-        if sleep_time < max_sleep_time:
-            sleep_time += dt
 
-    stdout_fh.flush()
-    stderr_fh.flush()
+class ForkedProcess(object):
 
-    run_time = time.time() - started_at
+    """Run func(*args) in a forked child process (Popen-like handle)
 
-    returncode = process.returncode
-    log.info("returncode is {r} in {s:.2f} sec.".format(r=process.returncode,
-                                                        s=run_time))
+    The child inherits the modules already imported by the parent, so there's
+    no interpreter start up or import cost, and a crash of the child doesn't
+    affect the parent. The exit code is the value returned by func (1 if an
+    exception is raised).
+
+    stdout and stderr are a file handle, subprocess.PIPE or None (inherited
+    from the parent).
+    """
+
+    def __init__(self, func, args=(), stdout=None, stderr=None, cwd=None, setsid=False):
+        self.returncode = None
+        self.stdout = None
+        self.stderr = None
+
+        pipes_ = {}
+        for name, fh in (('stdout', stdout), ('stderr', stderr)):
+            if fh == subprocess.PIPE:
+                pipes_[name] = os.pipe()
+
+        # don't write the buffered output of the parent twice
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+        self.pid = os.fork()
+        if self.pid == 0:
+            def _to_fd(name, fh):
+                if name in pipes_:
+                    return pipes_[name][1]
+                return None if fh is None else fh.fileno()
+            self._run_child(func, args, _to_fd('stdout', stdout), _to_fd('stderr', stderr), cwd, setsid)
+
+        for name, (r, w) in pipes_.iteritems():
+            os.close(w)
+            setattr(self, name, os.fdopen(r, 'rb'))
 
-    # FIXME. There's friction with the FH model and not breaking the API
-    # In principle, the stdout can be large, hence using FH
-    stdout, stderr = "", ""
-    return returncode, stdout, stderr, run_time
+    def __repr__(self):
+        _d = dict(k=self.__class__.__name__, p=self.pid, r=self.returncode)
+        return "<{k} pid:{p} returncode:{r} >".format(**_d)
+
+    @staticmethod
+    def _run_child(func, args, stdout_fd, stderr_fd, cwd, setsid):
+        rcode = 1
+        try:
+            if setsid:
+                os.setsid()
+            if cwd is not None:
+                os.chdir(cwd)
+            null_fd = os.open(os.devnull, os.O_RDONLY)
+            os.dup2(null_fd, 0)
+            for fd, to_fd in ((1, stdout_fd), (2, stderr_fd)):
+                if to_fd is not None:
+                    os.dup2(to_fd, fd)
+            rcode = func(*args)
+        except SystemExit as e:
+            rcode = e.code
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            try:
+                sys.stdout.flush()
+                sys.stderr.flush()
+            finally:
+                if rcode is None:
+                    rcode = 0
+                os._exit(rcode if isinstance(rcode, (int, long)) else 1)
+
+    def _set_status(self, status):
+        if os.WIFSIGNALED(status):
+            self.returncode = -os.WTERMSIG(status)
+        else:
+            self.returncode = os.WEXITSTATUS(status)
+
+    def poll(self):
+        if self.returncode is None:
+            pid, status = os.waitpid(self.pid, os.WNOHANG)
+            if pid == self.pid:
+                self._set_status(status)
+        return self.returncode
+
+    def wait(self):
+        while self.returncode is None:
+            try:
+                _, status = os.waitpid(self.pid, 0)
+            except OSError as e:
+                if e.errno == errno.EINTR:
+                    continue
+                raise
+            self._set_status(status)
+        return self.returncode
+
+    def send_signal(self, sig):
+        os.kill(self.pid, sig)
+
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
+
+
+def run_function(func, args, stdout_fh, stderr_fh, time_out=None):
+    """Run func(*args) in a forked child process (see ForkedProcess) with
+    the same semantics as run_command
+
+    :return: (exit code, stdout tail, stderr tail, run_time_sec)
+    """
+    started_at = time.time()
+    slog.debug("calling func {f} in a forked process".format(f=func))
+    process = ForkedProcess(func, args, stdout=_to_output_stream(stdout_fh), stderr=_to_output_stream(stderr_fh))
+    return _wait_for_command(process, func, stdout_fh, stderr_fh, time_out, started_at)
 
 
 def get_results_from_queue(queue):
@@ -413,28 +630,24 @@ class EngineWorker(multiprocessing.Process):
         stdout_h = open(self.stdout, 'w+')
         stderr_h = open(self.stderr, 'w+')
         p = subprocess.Popen(self.script_path, shell=True, stdin=subprocess.PIPE, stdout=stderr_h, stderr=stdout_h, close_fds=True, preexec_fn=os.setsid)
-        # Loop until subprocess is completed, or self.event is set
+        waiter = ProcessWaiter(p)
+        # Block until subprocess is completed, or self.event is set
         started_at = time.time()
 
         e_msg = "Job {u} failed ".format(u=self.task_job_id)
-        while p.returncode is None:
-            # update returncode
-            p.poll()
-
-            # Check for shutdown message from process pool
-            if self.shutdown_event.is_set():
-                # hard kill of subprocess call and all it's children processes
-                print "Sending SIGTERM to process group {p}.".format(p=p.pid)
+        if waiter.wait(shutdown_event=self.shutdown_event, check_interval=self.sleep_time) is None:
+            # Got shutdown message from process pool
+            # hard kill of subprocess call and all it's children processes
+            print "Sending SIGTERM to process group {p}.".format(p=p.pid)
+            try:
                 os.killpg(p.pid, signal.SIGTERM)
-                p.terminate()
+            except OSError:
+                log.exception('Problem while terminating sub-process.')
 
-                run_time = time.time() - started_at
-                e_msg = "Worker {n} shutdown. Job {u} killed by shutdown event. Process ran for {s:.2f} sec.".format(n=self.name, u=self.task_job_id, s=run_time)
-                slog.info(e_msg)
-                time.sleep(self.sleep_time)
-                break
-
-            time.sleep(self.sleep_time)
+            run_time = time.time() - started_at
+            e_msg = "Worker {n} shutdown. Job {u} killed by shutdown event. Process ran for {s:.2f} sec.".format(n=self.name, u=self.task_job_id, s=run_time)
+            slog.info(e_msg)
+            waiter.wait(timeout=self.sleep_time)
 
         run_time = time.time() - started_at
 
@@ -505,28 +718,25 @@ class ClusterEngineWorker(multiprocessing.Process):
         stdout_h.write("Cluster command '{c}'".format(c=cluster_cmd))
         slog.debug(cluster_cmd)
         p = subprocess.Popen(cluster_cmd, shell=True, stdin=subprocess.PIPE, stdout=stderr_h, stderr=stdout_h, close_fds=True)
+        waiter = ProcessWaiter(p)
 
-        # Loop until subprocess is completed, or self.event is set
+        # Block until subprocess is completed, or self.event is set
         started_at = time.time()
 
-        while p.returncode is None:
-            p.poll()
-
-            if self.shutdown_event.is_set():
-                # This will only work if the QueueWorker is a Process (not a Thread)?
+        if waiter.wait(shutdown_event=self.shutdown_event, check_interval=self.sleep_time) is None:
+            # This will only work if the QueueWorker is a Process (not a Thread)?
+            try:
                 p.terminate()
-                # hard return
-                run_time = time.time() - started_at
-                output = (self.task_job_id, p.returncode, run_time, "Job Failed")
-                self.out_queue.put(output)
-                time.sleep(self.sleep_time)
-                slog.info("Job id {i} -> subprocess ran for {x:.2f} sec.".format(x=run_time, i=self.task_job_id))
-
-                # update the return code
-                p.poll()
-                break
+            except OSError:
+                log.exception('Problem while terminating sub-process.')
+            # hard return
+            run_time = time.time() - started_at
+            output = (self.task_job_id, p.returncode, run_time, "Job Failed")
+            self.out_queue.put(output)
+            slog.info("Job id {i} -> subprocess ran for {x:.2f} sec.".format(x=run_time, i=self.task_job_id))
 
-            time.sleep(self.sleep_time)
+            # update the return code
+            waiter.wait(timeout=self.sleep_time)
 
         run_time = time.time() - started_at
         rcode, outs, err = p.returncode, "Job outs in {s:.2f} sec".format(s=run_time), "Job Error"
@@ -648,3 +858,1057 @@ class TaskManifestWorker(multiprocessing.Process):
 
         log.info("exiting Worker {i} (pid {p}) task-id:{t} task-uuid:{u} {k}.run".format(k=self.__class__.__name__, i=self.name, p=self.pid, t=self.task_id, u=self.task_uuid))
         return True
+
+
+def write_task_result(path, state, error_message, run_time_sec):
+    """Write the final state of a task run by the runner. This is how the
+    result is communicated back to the TaskSupervisor.
+
+    The file is written atomically, the supervisor reads the results of
+    the array job tasks while the array job is running.
+    """
+    d = dict(state=state, error_message=error_message, run_time_sec=run_time_sec)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(json.dumps(d))
+    os.rename(tmp_path, path)
+    return path
+
+
+def load_task_result(path):
+    """
+    :rtype: (str, str, float)
+    Returns state, error message, run time (sec)
+    """
+    with open(path, 'r') as f:
+        d = json.loads(f.read())
+    return d['state'], d['error_message'], d['run_time_sec']
+
+
+def extract_last_nlines(path, nlines=GlobalConstants.TASK_LOG_NLINES, max_bytes=65536):
+    """Last nlines of the file. Only the last max_bytes of the file are read"""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - max_bytes))
+            tail = TailBuffer(nlines)
+            tail.feed(f.read())
+            return "".join(line + "\n" for line in tail.get_lines())
+    except IOError:
+        return ""
+
+
+class SupervisedTask(object):
+
+    """Handle to a task manifest subprocess run by the TaskSupervisor
+
+    This has the same interface as the TaskManifestWorker that is used by
+    the driver (name, task_id, pid, exitcode, is_alive, terminate)
+
+    The tasks of an array job share the same process.
+    """
+
+    def __init__(self, task_uuid, task_id, manifest_path, process, name=None):
+        self.task_uuid = task_uuid
+        self.task_id = task_id
+        self.manifest_path = manifest_path
+        # subprocess.Popen instance, or None if the process failed to start
+        self.process = process
+        self.name = name
+        self.started_at = time.time()
+        self.was_terminated = False
+        # the result has been posted (or skipped if terminated)
+        self.has_result = False
+
+    def __repr__(self):
+        _d = dict(k=self.__class__.__name__, i=self.task_id, p=self.pid, n=self.name)
+        return "<{k} {n} task-id:{i} pid:{p} >".format(**_d)
+
+    @property
+    def pid(self):
+        return None if self.process is None else self.process.pid
+
+    @property
+    def exitcode(self):
+        return None if self.process is None else self.process.returncode
+
+    @property
+    def run_time(self):
+        return time.time() - self.started_at
+
+    @property
+    def task_result_json(self):
+        return os.path.join(os.path.dirname(self.manifest_path), GlobalConstants.TASK_RESULT_JSON)
+
+    def is_alive(self):
+        return self.process is not None and self.process.returncode is None and not self.has_result
+
+    def terminate(self):
+        """Kill the task process group (the runner and the task commands)
+
+        For a task of an array job, this kills the entire array job.
+        """
+        self.was_terminated = True
+        if self.is_alive():
+            try:
+                os.killpg(self.process.pid, signal.SIGTERM)
+            except OSError as e:
+                # already exited, the process is reaped by the supervisor
+                if e.errno != errno.ESRCH:
+                    raise
+
+
+def _run_cluster_cmd(cmd):
+    """Run a (short) cluster command, such as qsub or qstat
+
+    :rtype: (int, str, str)
+    Returns rcode, stdout, stderr
+    """
+    with open(os.devnull, 'r') as null_fh:
+        p = subprocess.Popen(cmd, shell=True, stdin=null_fh, stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE, close_fds=True)
+        out, err = p.communicate()
+    return p.returncode, out, err
+
+
+class SupervisedClusterTask(SupervisedTask):
+
+    """Handle to a task submitted to the cluster without blocking
+
+    The job is tracked by the cluster job id (from the submit template) and
+    terminated by the job name (stop template).
+    """
+
+    def __init__(self, task_uuid, task_id, manifest_path, nproc, name=None):
+        super(SupervisedClusterTask, self).__init__(task_uuid, task_id, manifest_path, None, name=name)
+        self.nproc = nproc
+        self.job_name = None
+        # set when the job is successfully submitted
+        self.cluster_job_id = None
+        self.stop_cmd = None
+        # Time when the job was first found to not be active
+        self.inactive_at = None
+
+    def __repr__(self):
+        _d = dict(k=self.__class__.__name__, i=self.task_id, j=self.cluster_job_id, n=self.name)
+        return "<{k} {n} task-id:{i} cluster-job-id:{j} >".format(**_d)
+
+    def is_alive(self):
+        return not self.has_result
+
+    def terminate(self):
+        """Kill the cluster job"""
+        self.was_terminated = True
+        if self.is_alive() and self.stop_cmd is not None:
+            rcode, _, err = _run_cluster_cmd(self.stop_cmd)
+            if rcode != 0:
+                log.warn("Unable to stop cluster job {j} of task {i}. {e}".format(j=self.cluster_job_id, i=self.task_id, e=err))
+
+
+class PilotQueue(object):
+
+    """Shared filesystem queue of the task manifests run by the pilot workers
+
+    The driver adds a task to pending/ and a pilot claims the task by renaming
+    it to claimed/{task-uuid}.{worker-id}. The rename is atomic, hence a task
+    is only claimed by a single pilot. While running, a pilot updates its
+    heartbeat file workers/{worker-id}.
+
+    A task is cancelled by a marker file in cancelled/ and the idle pilots
+    exit once the shutdown file is written.
+    """
+
+    PENDING = "pending"
+    CLAIMED = "claimed"
+    WORKERS = "workers"
+    CANCELLED = "cancelled"
+    SHUTDOWN = "shutdown"
+
+    def __init__(self, queue_dir):
+        self.queue_dir = queue_dir
+        # the driver is the only producer, the items are ordered by submission
+        self._counter = itertools.count()
+
+    def __repr__(self):
+        _d = dict(k=self.__class__.__name__, d=self.queue_dir)
+        return "<{k} {d} >".format(**_d)
+
+    def _to_p(self, *args):
+        return os.path.join(self.queue_dir, *args)
+
+    def create(self):
+        """Create an empty queue. The items of a previous run are removed"""
+        if os.path.exists(self.queue_dir):
+            shutil.rmtree(self.queue_dir)
+        for name in (self.PENDING, self.CLAIMED, self.WORKERS, self.CANCELLED):
+            os.makedirs(self._to_p(name))
+        return self
+
+    def put(self, task_uuid, task_id, manifest_path):
+        name = "{n:08d}-{u}.json".format(n=self._counter.next(), u=task_uuid)
+        # written outside of pending/, so a pilot never reads a partial item
+        tmp_path = self._to_p(name + ".tmp")
+        with open(tmp_path, 'w') as f:
+            f.write(json.dumps(dict(task_uuid=task_uuid, task_id=task_id, manifest_path=manifest_path)))
+        os.rename(tmp_path, self._to_p(self.PENDING, name))
+
+    def claim(self, worker_id):
+        """Claim the oldest pending task
+
+        :rtype: (str, str, str) | None
+        Returns task_uuid, task_id, manifest_path
+        """
+        for name in sorted(os.listdir(self._to_p(self.PENDING))):
+            # {n}-{task-uuid}.json
+            task_uuid = os.path.splitext(name)[0].split("-", 1)[1]
+            claimed_path = self._to_p(self.CLAIMED, "{u}.{w}".format(u=task_uuid, w=worker_id))
+            try:
+                os.rename(self._to_p(self.PENDING, name), claimed_path)
+            except OSError as e:
+                # claimed by another pilot, or cancelled
+                if e.errno == errno.ENOENT:
+                    continue
+                raise
+            with open(claimed_path, 'r') as f:
+                d = json.loads(f.read())
+            return d['task_uuid'], d['task_id'], d['manifest_path']
+        return None
+
+    def get_claimed(self):
+        """:rtype: dict {task_uuid: worker_id}"""
+        return dict(name.split(".", 1) for name in os.listdir(self._to_p(self.CLAIMED)))
+
+    def cancel(self, task_uuid):
+        with open(self._to_p(self.CANCELLED, task_uuid), 'w'):
+            pass
+        suffix = "-{u}.json".format(u=task_uuid)
+        for name in os.listdir(self._to_p(self.PENDING)):
+            if name.endswith(suffix):
+                try:
+                    os.remove(self._to_p(self.PENDING, name))
+                except OSError as e:
+                    # claimed in the meantime
+                    if e.errno != errno.ENOENT:
+                        raise
+
+    def is_cancelled(self, task_uuid):
+        return os.path.exists(self._to_p(self.CANCELLED, task_uuid))
+
+    def heartbeat(self, worker_id):
+        with open(self._to_p(self.WORKERS, worker_id), 'w') as f:
+            f.write(str(time.time()))
+
+    def get_heartbeat(self, worker_id):
+        """Returns the last modified time of the heartbeat or None"""
+        try:
+            return os.stat(self._to_p(self.WORKERS, worker_id)).st_mtime
+        except OSError:
+            return None
+
+    def remove_worker(self, worker_id):
+        try:
+            os.remove(self._to_p(self.WORKERS, worker_id))
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+
+    def request_shutdown(self):
+        with open(self._to_p(self.SHUTDOWN), 'w'):
+            pass
+
+    def is_shutdown(self):
+        return os.path.exists(self._to_p(self.SHUTDOWN))
+
+
+def _run_pilot_task(queue, worker_id, task_uuid, task_id, manifest_path, poll_interval, runner_cmd, task_func=None):
+    """Run the task manifest with the runner in a new process group, so a
+    cancelled task can be killed without killing the pilot
+
+    If task_func is provided, task_func(manifest_path) is run in a forked
+    process instead of the runner (see ForkedProcess)"""
+    if queue.is_cancelled(task_uuid):
+        log.info("Pilot {w} skipping cancelled task {i}".format(w=worker_id, i=task_id))
+        return
+
+    output_dir = os.path.dirname(manifest_path)
+    task_result_json = os.path.join(output_dir, GlobalConstants.TASK_RESULT_JSON)
+    runner_log = os.path.join(output_dir, GlobalConstants.TASK_RUNNER_LOG)
+    started_at = time.time()
+
+    log.info("Pilot {w} starting task {i} {p}".format(w=worker_id, i=task_id, p=manifest_path))
+    try:
+        with open(os.devnull, 'r') as null_fh, open(runner_log, 'w') as log_fh:
+            if task_func is None:
+                process = subprocess.Popen(list(runner_cmd) + [manifest_path], cwd=output_dir, stdin=null_fh,
+                                           stdout=log_fh, stderr=subprocess.STDOUT,
+                                           close_fds=True, preexec_fn=os.setsid)
+            else:
+                process = ForkedProcess(task_func, (manifest_path, ), stdout=log_fh, stderr=log_fh,
+                                        cwd=output_dir, setsid=True)
+    except (OSError, IOError) as e:
+        emsg = "Pilot {w} unable to start task {i}. Error {e}".format(w=worker_id, i=task_id, e=e)
+        log.error(emsg)
+        write_task_result(task_result_json, TaskStates.FAILED, emsg, 0.0)
+        return
+
+    was_cancelled = False
+    waiter = ProcessWaiter(process)
+    while waiter.wait(timeout=poll_interval) is None:
+        queue.heartbeat(worker_id)
+        if not was_cancelled and queue.is_cancelled(task_uuid):
+            log.info("Pilot {w} killing cancelled task {i} (pid {p})".format(w=worker_id, i=task_id, p=process.pid))
+            was_cancelled = True
+            try:
+                os.killpg(process.pid, signal.SIGTERM)
+            except OSError as e:
+                if e.errno != errno.ESRCH:
+                    raise
+
+    run_time = time.time() - started_at
+    log.info("Pilot {w} completed task {i} with exit code {r} in {s:.2f} sec".format(w=worker_id, i=task_id, r=process.returncode, s=run_time))
+
+    if not was_cancelled and not os.path.exists(task_result_json):
+        emsg = "Task {i} runner exited with code {r} in pilot {w} without a task result. See '{f}'\n{x}".format(i=task_id, r=process.returncode, w=worker_id, f=runner_log, x=extract_last_nlines(runner_log))
+        write_task_result(task_result_json, TaskStates.FAILED, emsg, run_time)
+
+
+def run_pilot(queue_dir, worker_id, idle_timeout=GlobalConstants.PILOT_IDLE_TIMEOUT, poll_interval=1, runner_cmd=None, task_func=None):
+    """
+    Pilot worker. Run the task manifests of the pilot queue back-to-back until
+    the queue is shutdown, or no task is claimed within idle_timeout (sec).
+
+    The task result (task-result.json) is written to the task directory.
+
+    If task_func is provided, each task is run by calling
+    task_func(manifest_path) in a process forked from the pilot, which must
+    write the task result.
+
+    :return: number of tasks run
+    """
+    runner_cmd = TaskSupervisor.RUNNER_CMD if runner_cmd is None else runner_cmd
+    queue = PilotQueue(queue_dir)
+    ntasks = 0
+    idle_at = time.time()
+    log.info("Starting pilot {w} on {h} (pid {p}) with queue {q}".format(w=worker_id, h=platform.node(), p=os.getpid(), q=queue_dir))
+    try:
+        while True:
+            queue.heartbeat(worker_id)
+            item = queue.claim(worker_id)
+            if item is None:
+                if queue.is_shutdown():
+                    log.info("Pilot queue was shutdown")
+                    break
+                if time.time() - idle_at >= idle_timeout:
+                    log.info("No task claimed in {s} sec".format(s=idle_timeout))
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            task_uuid, task_id, manifest_path = item
+            _run_pilot_task(queue, worker_id, task_uuid, task_id, manifest_path, poll_interval, runner_cmd, task_func=task_func)
+            ntasks += 1
+            idle_at = time.time()
+    finally:
+        queue.remove_worker(worker_id)
+
+    log.info("exiting pilot {w}. Ran {n} tasks".format(w=worker_id, n=ntasks))
+    return ntasks
+
+
+class SupervisedPilotTask(SupervisedTask):
+
+    """Handle to a task submitted to the pilot queue"""
+
+    def __init__(self, task_uuid, task_id, manifest_path, pool, name=None):
+        super(SupervisedPilotTask, self).__init__(task_uuid, task_id, manifest_path, None, name=name)
+        # PilotPool the task was submitted to
+        self.pool = pool
+        self.queue = pool.queue
+        # set when the task is claimed by a pilot
+        self.worker_id = None
+
+    def __repr__(self):
+        _d = dict(k=self.__class__.__name__, i=self.task_id, w=self.worker_id, n=self.name)
+        return "<{k} {n} task-id:{i} pilot:{w} >".format(**_d)
+
+    def is_alive(self):
+        return not (self.has_result or self.was_terminated)
+
+    def terminate(self):
+        """Cancel the task. The pilot kills the task if it's running"""
+        if self.is_alive():
+            self.queue.cancel(self.task_uuid)
+        self.was_terminated = True
+
+
+class SupervisedInlineTask(SupervisedTask):
+
+    """Handle to a task run by a thread of the TaskSupervisor inline pool
+
+    The task can't be killed. A terminated task runs to completion, but the
+    result is not posted.
+    """
+
+    def __init__(self, task_uuid, task_id, manifest_path, name=None):
+        super(SupervisedInlineTask, self).__init__(task_uuid, task_id, manifest_path, None, name=name)
+
+    def __repr__(self):
+        _d = dict(k=self.__class__.__name__, i=self.task_id, n=self.name)
+        return "<{k} {n} task-id:{i} inline >".format(**_d)
+
+    def is_alive(self):
+        return not (self.has_result or self.was_terminated)
+
+    def terminate(self):
+        self.was_terminated = True
+
+
+class PilotPool(object):
+
+    """Launches (and relaunches) the pilot workers of a PilotQueue
+
+    The pilots are submitted through the blocking cluster start template, run
+    in a subprocess of the driver for the lifetime of the pilot. If no cluster
+    renderer is provided, the pilots are run as local processes (simulation
+    mode).
+
+    A pilot is considered lost if its heartbeat is not updated within the
+    lost timeout. Launching the pilots is stopped after max_nfailures
+    consecutive pilots have exited with a non-zero exit code.
+
+    pilot_args are the extra options of the pilot command (e.g., to run the
+    tasks in-process).
+    """
+
+    PILOT_CMD = (sys.executable, "-m", "pbsmrtpipe.tools.runner", "pilot")
+
+    def __init__(self, queue_dir, max_npilots, nproc=1, cluster_renderer=None,
+                 idle_timeout=GlobalConstants.PILOT_IDLE_TIMEOUT, poll_interval=1, max_nfailures=5,
+                 pilot_args=()):
+        self.queue = PilotQueue(queue_dir)
+        self.max_npilots = max_npilots
+        self.pilot_args = list(pilot_args)
+        # slots requested by each pilot job
+        self.nproc = nproc
+        self.cluster_renderer = cluster_renderer
+        self.idle_timeout = idle_timeout
+        self.poll_interval = poll_interval
+        self.max_nfailures = max_nfailures
+
+        # worker id -> subprocess.Popen of the pilot (or the cluster submission)
+        self._pilots = {}
+        self._npilots = 0
+        self._nfailures = 0
+        # worker id -> (heartbeat, time the heartbeat was last updated)
+        self._heartbeats = {}
+
+    def __repr__(self):
+        _d = dict(k=self.__class__.__name__, n=len(self._pilots), m=self.max_npilots, l=self.is_local)
+        return "<{k} running:{n} max:{m} local:{l} >".format(**_d)
+
+    @property
+    def is_local(self):
+        return self.cluster_renderer is None
+
+    @property
+    def has_failed(self):
+        return self._nfailures >= self.max_nfailures
+
+    @property
+    def pilot_dir(self):
+        return os.path.join(self.queue.queue_dir, "pilots")
+
+    def create(self):
+        self.queue.create()
+        os.makedirs(self.pilot_dir)
+        return self
+
+    def _launch(self):
+        self._npilots += 1
+        # this is also the cluster job name, which must begin with a character
+        worker_id = "pilot-{n}-{u}".format(n=self._npilots, u=uuid.uuid4().hex[:8])
+
+        def _to_p(x_):
+            return os.path.join(self.pilot_dir, worker_id + x_)
+
+        cmd = list(self.PILOT_CMD) + [self.queue.queue_dir, "--worker-id", worker_id, "--idle-timeout", str(self.idle_timeout)] + self.pilot_args
+        if not self.is_local:
+            pilot_shell = _to_p(".sh")
+            with open(pilot_shell, 'w') as f:
+                f.write("#!/bin/bash\n")
+                f.write("{c} > {l} 2>&1\n".format(c=" ".join(pipes.quote(x) for x in cmd), l=pipes.quote(_to_p(".log"))))
+            os.chmod(pilot_shell, 0o755)
+            cmd = self.cluster_renderer.render(ClusterConstants.START, pilot_shell, worker_id,
+                                               stdout=_to_p(".cluster.stdout"), stderr=_to_p(".cluster.stderr"), nproc=self.nproc)
+
+        log.info("Launching pilot {w}".format(w=worker_id))
+        try:
+            with open(os.devnull, 'r') as null_fh, open(_to_p(".log" if self.is_local else ".submit.log"), 'w') as log_fh:
+                process = subprocess.Popen(cmd, shell=not self.is_local, cwd=self.pilot_dir, stdin=null_fh,
+                                           stdout=log_fh, stderr=subprocess.STDOUT,
+                                           close_fds=True, preexec_fn=os.setsid)
+        except (OSError, IOError) as e:
+            log.error("Unable to launch pilot {w}. Error {e}".format(w=worker_id, e=e))
+            self._nfailures += 1
+            return None
+
+        self._pilots[worker_id] = process
+        return worker_id
+
+    def update(self, ntasks):
+        """Reap the exited pilots and launch the pilots for the ntasks queued
+        (or running) tasks
+
+        :return: number of running pilots
+        """
+        for worker_id, process in self._pilots.items():
+            rcode = process.poll()
+            if rcode is not None:
+                log.info("Pilot {w} exited with code {r}".format(w=worker_id, r=rcode))
+                self._nfailures = 0 if rcode == 0 else self._nfailures + 1
+                del self._pilots[worker_id]
+
+        if self.has_failed:
+            return len(self._pilots)
+
+        for _ in xrange(min(self.max_npilots, ntasks) - len(self._pilots)):
+            self._launch()
+        return len(self._pilots)
+
+    def get_lost_workers(self, worker_ids, lost_timeout):
+        """Returns the workers with a heartbeat that hasn't been updated
+        within lost_timeout (sec). The time is from the driver clock, so the
+        clocks of the execution hosts don't need to be in sync."""
+        now = time.time()
+        lost = set()
+        for worker_id in worker_ids:
+            heartbeat = self.queue.get_heartbeat(worker_id)
+            last = self._heartbeats.get(worker_id)
+            if last is None or last[0] != heartbeat:
+                self._heartbeats[worker_id] = (heartbeat, now)
+            elif now - last[1] >= lost_timeout:
+                lost.add(worker_id)
+        return lost
+
+    def shutdown(self):
+        """The idle pilots exit. The running tasks are not terminated"""
+        if os.path.exists(self.queue.queue_dir):
+            self.queue.request_shutdown()
+
+
+class TaskSupervisor(threading.Thread):
+
+    """Runs task manifests as subprocesses of the driver
+
+    The runner (pbtools-runner run-manifest) is launched directly for each
+    task and a single supervisor thread reaps the processes and posts a
+    TaskResult to q_out. The supervisor is woken by SIGCHLD (if started from
+    the main thread), a new submitted task, or every wakeup_interval (sec).
+
+    Chunked tasks can be submitted as a single cluster array job
+    (pbtools-runner run-array), and a chain of fused tasks as a single job
+    that runs the tasks in sequence (pbtools-runner run-chain). The result
+    of each of these tasks is posted when the task result is written.
+
+    If the cluster templates support it (submit and status templates),
+    distributed tasks are submitted without blocking and the state of all the
+    cluster jobs is checked with a single status call every
+    cluster_status_interval (sec). A job that is no longer active is failed
+    if the task result isn't written within lost_job_timeout (sec).
+
+    If a PilotPool is provided, the tasks submitted with submit_to_pilot are
+    added to the pilot queue and run back-to-back by the pilot workers. A task
+    claimed by a pilot that is lost (see lost_job_timeout) is failed.
+
+    The tasks submitted with submit_in_process are run by the local pilots
+    of the in-process PilotPool, which run the Python tool contract tasks
+    in processes forked from the pilot (no interpreter start up).
+
+    The (lightweight) tasks submitted with submit_inline are run by a pool of
+    max_ninline_workers threads of the driver, without a runner process. The
+    result is posted as soon as the task is completed.
+    """
+
+    RUNNER_CMD = (sys.executable, "-m", "pbsmrtpipe.tools.runner", "run-manifest")
+    ARRAY_RUNNER_CMD = (sys.executable, "-m", "pbsmrtpipe.tools.runner", "run-array")
+    CHAIN_RUNNER_CMD = (sys.executable, "-m", "pbsmrtpipe.tools.runner", "run-chain")
+
+    def __init__(self, q_out, wakeup_interval=5, name="task-supervisor",
+                 cluster_renderer=None, cluster_status_interval=30, lost_job_timeout=120,
+                 pilot_pool=None, inprocess_pool=None, max_ninline_workers=0):
+        super(TaskSupervisor, self).__init__(name=name)
+        self.daemon = True
+        self.q_out = q_out
+        self.wakeup_interval = wakeup_interval
+
+        self.cluster_renderer = cluster_renderer
+        self.cluster_status_interval = cluster_status_interval
+        self.lost_job_timeout = lost_job_timeout
+
+        # pid -> [SupervisedTask]
+        self._tasks = {}
+        # Submitted (or to be submitted) cluster jobs [SupervisedClusterTask]
+        self._cluster_tasks = []
+        self._cluster_status_at = 0
+        self.pilot_pool = pilot_pool
+        self.inprocess_pool = inprocess_pool
+        self._pilot_pools = [x for x in (pilot_pool, inprocess_pool) if x is not None]
+        # Queued (or running) pilot tasks [SupervisedPilotTask] of all pools
+        self._pilot_tasks = []
+        self.max_ninline_workers = max_ninline_workers
+        # ThreadPool of the inline tasks, created when the supervisor is started
+        self._inline_pool = None
+        self._lock = threading.Lock()
+        self._shutdown_event = threading.Event()
+
+        # self-pipe to wakeup the supervisor thread
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        for fd in (self._wakeup_r, self._wakeup_w):
+            fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+
+        self._prev_sigchld_handler = None
+        self._has_sigchld_handler = False
+
+    def __repr__(self):
+        _d = dict(k=self.__class__.__name__, n=len(self._tasks), c=len(self._cluster_tasks), p=len(self._pilot_tasks))
+        return "<{k} running:{n} cluster-jobs:{c} pilot-tasks:{p} >".format(**_d)
+
+    @property
+    def supports_async_cluster(self):
+        return self.cluster_renderer is not None and self.cluster_renderer.supports_async
+
+    def _wakeup(self):
+        try:
+            os.write(self._wakeup_w, "\0")
+        except OSError as e:
+            # pipe is full, the supervisor will be woken up anyway
+            if e.errno != errno.EAGAIN:
+                raise
+
+    def _on_sigchld(self, signum, frame):
+        self._wakeup()
+        if callable(self._prev_sigchld_handler):
+            self._prev_sigchld_handler(signum, frame)
+
+    def _install_sigchld_handler(self):
+        # signal handlers can only be installed from the main thread
+        if isinstance(threading.current_thread(), threading._MainThread):
+            self._prev_sigchld_handler = signal.signal(signal.SIGCHLD, self._on_sigchld)
+            # restart the interrupted system calls of the driver
+            signal.siginterrupt(signal.SIGCHLD, False)
+            self._has_sigchld_handler = True
+        else:
+            log.debug("{k} not started from the main thread. Polling every {s} sec".format(k=self.__class__.__name__, s=self.wakeup_interval))
+
+    def _restore_sigchld_handler(self):
+        if self._has_sigchld_handler:
+            signal.signal(signal.SIGCHLD, self._prev_sigchld_handler or signal.SIG_DFL)
+            self._has_sigchld_handler = False
+
+    def start(self):
+        for pool in self._pilot_pools:
+            pool.create()
+        if self.max_ninline_workers > 0:
+            self._inline_pool = ThreadPool(self.max_ninline_workers)
+        self._install_sigchld_handler()
+        super(TaskSupervisor, self).start()
+
+    def shutdown(self):
+        """Stop the supervisor thread. Running tasks are not terminated"""
+        self._shutdown_event.set()
+        self._wakeup()
+        self._restore_sigchld_handler()
+        for pool in self._pilot_pools:
+            pool.shutdown()
+        if self._inline_pool is not None:
+            # the worker threads are daemon threads
+            self._inline_pool.close()
+            self._inline_pool = None
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(self.wakeup_interval)
+
+    def _to_failed_result(self, task, msg):
+        log.error(msg)
+        return TaskResult(task.task_uuid, task.task_id, TaskStates.FAILED, msg, round(task.run_time, 2))
+
+    def _to_tasks(self, task_items):
+        """Create the tasks and remove the previous results. A failed result
+        is posted for the tasks without a manifest.
+
+        :param task_items: [(task_uuid, task_id, manifest_path, name)]
+        """
+        tasks = []
+        for task_uuid, task_id, manifest_path, name in task_items:
+            task = SupervisedTask(task_uuid, task_id, manifest_path, None, name=name)
+            if os.path.exists(manifest_path):
+                if os.path.exists(task.task_result_json):
+                    os.remove(task.task_result_json)
+            else:
+                task.has_result = True
+                self.q_out.put(self._to_failed_result(task, "Unable to find manifest {p}".format(p=manifest_path)))
+            tasks.append(task)
+        return tasks
+
+    def _launch(self, cmd, output_dir, tasks):
+        """Start the runner process shared by the tasks"""
+        log.debug("Starting {n} task(s) with cmd '{c}'".format(n=len(tasks), c=" ".join(cmd)))
+        try:
+            with open(os.devnull, 'r') as null_fh, open(os.path.join(output_dir, GlobalConstants.TASK_RUNNER_LOG), 'w') as log_fh:
+                # new session, so the entire process group can be killed
+                process = subprocess.Popen(cmd, cwd=output_dir, stdin=null_fh,
+                                           stdout=log_fh, stderr=subprocess.STDOUT,
+                                           close_fds=True, preexec_fn=os.setsid)
+        except (OSError, IOError) as e:
+            for task in tasks:
+                task.has_result = True
+                self.q_out.put(self._to_failed_result(task, "Unable to start task {i}. Error {e}".format(i=task.task_id, e=e)))
+            return
+
+        for task in tasks:
+            task.process = process
+
+        with self._lock:
+            self._tasks[process.pid] = tasks
+
+        # the process might have already exited before it was registered
+        self._wakeup()
+
+    def submit(self, task_uuid, task_id, manifest_path, is_distributed=False, name=None, nproc=1):
+        """Launch the runner subprocess for the task manifest
+
+        Distributed tasks are submitted to the cluster by the supervisor
+        thread if the cluster templates support non-blocking submission.
+
+        :rtype: SupervisedTask
+        """
+        if is_distributed and self.supports_async_cluster:
+            return self._submit_cluster_task(task_uuid, task_id, manifest_path, name, nproc)
+
+        task = self._to_tasks([(task_uuid, task_id, manifest_path, name)])[0]
+        if not task.has_result:
+            cmd = list(self.RUNNER_CMD) + [manifest_path]
+            if is_distributed:
+                cmd.append("--cluster")
+            self._launch(cmd, os.path.dirname(manifest_path), [task])
+        return task
+
+    def submit_array(self, task_items, output_dir):
+        """Submit the task manifests as a single cluster array job. The
+        array job files are written to output_dir.
+
+        :param task_items: [(task_uuid, task_id, manifest_path, name)]
+        :rtype: list[SupervisedTask]
+        """
+        tasks = self._to_tasks(task_items)
+        array_tasks = [t for t in tasks if not t.has_result]
+        if array_tasks:
+            if not os.path.exists(output_dir):
+                os.makedirs(output_dir)
+            cmd = list(self.ARRAY_RUNNER_CMD) + ["--output-dir", output_dir] + [t.manifest_path for t in array_tasks]
+            self._launch(cmd, output_dir, array_tasks)
+        return tasks
+
+    def submit_chain(self, task_items, output_dir, is_distributed=False):
+        """Run the task manifests of fused tasks in sequence in a single
+        process (or cluster job). The job files are written to output_dir.
+
+        :param task_items: [(task_uuid, task_id, manifest_path, name)] in
+        the order the tasks are run
+        :rtype: list[SupervisedTask]
+        """
+        tasks = self._to_tasks(task_items)
+        if any(t.has_result for t in tasks):
+            # the downstream tasks can't run without the upstream task
+            for task in tasks:
+                if not task.has_result:
+                    task.has_result = True
+                    self.q_out.put(self._to_failed_result(task, "Unable to run fused task {i}. A manifest of the fused tasks is missing".format(i=task.task_id)))
+            return tasks
+
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        cmd = list(self.CHAIN_RUNNER_CMD) + ["--output-dir", output_dir]
+        if is_distributed:
+            cmd.append("--cluster")
+        self._launch(cmd + [t.manifest_path for t in tasks], output_dir, tasks)
+        return tasks
+
+    def _submit_cluster_task(self, task_uuid, task_id, manifest_path, name, nproc):
+        task = SupervisedClusterTask(task_uuid, task_id, manifest_path, nproc, name=name)
+        if os.path.exists(manifest_path):
+            if os.path.exists(task.task_result_json):
+                os.remove(task.task_result_json)
+            with self._lock:
+                self._cluster_tasks.append(task)
+            self._wakeup()
+        else:
+            task.has_result = True
+            self.q_out.put(self._to_failed_result(task, "Unable to find manifest {p}".format(p=manifest_path)))
+        return task
+
+    def submit_to_pilot(self, task_uuid, task_id, manifest_path, name=None, pool=None):
+        """Add the task manifest to the pilot queue (of the pilot pool by
+        default)
+
+        :rtype: SupervisedPilotTask
+        """
+        pool = self.pilot_pool if pool is None else pool
+        task = SupervisedPilotTask(task_uuid, task_id, manifest_path, pool, name=name)
+        if os.path.exists(manifest_path):
+            if os.path.exists(task.task_result_json):
+                os.remove(task.task_result_json)
+            with self._lock:
+                self._pilot_tasks.append(task)
+            pool.queue.put(task_uuid, task_id, manifest_path)
+            self._wakeup()
+        else:
+            task.has_result = True
+            self.q_out.put(self._to_failed_result(task, "Unable to find manifest {p}".format(p=manifest_path)))
+        return task
+
+    def submit_in_process(self, task_uuid, task_id, manifest_path, name=None):
+        """Run the task manifest in a pre-warmed in-process pilot
+
+        :rtype: SupervisedPilotTask
+        """
+        return self.submit_to_pilot(task_uuid, task_id, manifest_path, name=name, pool=self.inprocess_pool)
+
+    def submit_inline(self, task_uuid, task_id, manifest_path, task_func, name=None):
+        """Run task_func(manifest_path) in a thread of the inline pool. The
+        task func must return (state, error message, run_time_sec) and not
+        change the process state (e.g., the current dir)
+
+        :rtype: SupervisedInlineTask
+        """
+        task = SupervisedInlineTask(task_uuid, task_id, manifest_path, name=name)
+        if os.path.exists(manifest_path):
+            if os.path.exists(task.task_result_json):
+                os.remove(task.task_result_json)
+            self._inline_pool.apply_async(self._run_inline_task, (task, task_func))
+        else:
+            task.has_result = True
+            self.q_out.put(self._to_failed_result(task, "Unable to find manifest {p}".format(p=manifest_path)))
+        return task
+
+    def _run_inline_task(self, task, task_func):
+        try:
+            state, msg, run_time = task_func(task.manifest_path)
+            write_task_result(task.task_result_json, state, msg, run_time)
+            result = TaskResult(task.task_uuid, task.task_id, state, msg, round(run_time, 2))
+        except Exception as e:
+            log.exception("Failed to run inline task {i}".format(i=task.task_id))
+            result = self._to_failed_result(task, "Failed to run inline task {i}. Error {e}".format(i=task.task_id, e=e))
+
+        task.has_result = True
+        if task.was_terminated:
+            log.info("Inline task {i} was terminated".format(i=task.task_id))
+        else:
+            log.info("Inline task {i} completed ({s}) in {t:.2f} sec".format(i=task.task_id, s=result.state, t=task.run_time))
+            self.q_out.put(result)
+
+    def _submit_cluster_job(self, task):
+        """Submit the job (non-blocking) and return the cluster job id or None"""
+        output_dir = os.path.dirname(task.manifest_path)
+
+        def _to_p(x_):
+            return os.path.join(output_dir, x_)
+
+        # Run the task manifest on the execution host
+        run_shell = _to_p("cluster-run.sh")
+        runner_cmd = " ".join(pipes.quote(x) for x in list(self.RUNNER_CMD) + [task.manifest_path])
+        with open(run_shell, 'w') as f:
+            f.write("#!/bin/bash\n")
+            f.write("cd {d}\n".format(d=pipes.quote(output_dir)))
+            f.write("{c} > {l} 2>&1\n".format(c=runner_cmd, l=pipes.quote(_to_p(GlobalConstants.TASK_RUNNER_LOG))))
+        os.chmod(run_shell, 0o755)
+
+        # Job names must begin with a character
+        task.job_name = "j" + task.task_uuid.replace("-", "")[:12]
+        cmd = self.cluster_renderer.render(ClusterConstants.SUBMIT, run_shell, task.job_name,
+                                           stdout=_to_p("cluster.stdout"), stderr=_to_p("cluster.stderr"), nproc=task.nproc)
+        task.stop_cmd = self.cluster_renderer.render(ClusterConstants.STOP, run_shell, task.job_name)
+
+        started_at = time.time()
+        rcode, out, err = _run_cluster_cmd(cmd)
+        run_time = time.time() - started_at
+        # e.g., slurm --parsable writes 'job-id;cluster-name'
+        job_ids = [x.split()[0].split(";")[0] for x in out.splitlines() if x.strip()]
+        if rcode != 0 or not job_ids:
+            emsg = "Unable to submit task {i} to the cluster (exit code {r}) with cmd '{c}' {e}".format(i=task.task_id, r=rcode, c=cmd, e=err)
+            task.has_result = True
+            self.q_out.put(self._to_failed_result(task, emsg))
+            return None
+
+        task.cluster_job_id = job_ids[0]
+        log.info("Submitted task {i} as cluster job {j} in {s:.2f} sec".format(i=task.task_id, j=task.cluster_job_id, s=run_time))
+        return task.cluster_job_id
+
+    def _get_active_cluster_job_ids(self):
+        """Returns the set of the active cluster job ids or None if the
+        status command failed"""
+        cmd = self.cluster_renderer.render_status()
+        rcode, out, err = _run_cluster_cmd(cmd)
+        if rcode != 0:
+            log.warn("Failed to get cluster job status (exit code {r}) with cmd '{c}' {e}".format(r=rcode, c=cmd, e=err))
+            return None
+        return {x.split()[0] for x in out.splitlines() if x.strip()}
+
+    def _update_cluster_tasks(self):
+        """Submit the new cluster jobs and post the results of the completed
+        (or lost) cluster jobs"""
+        with self._lock:
+            tasks = list(self._cluster_tasks)
+
+        for task in tasks:
+            if task.cluster_job_id is None and not task.has_result and not task.was_terminated:
+                self._submit_cluster_job(task)
+
+        submitted = [t for t in tasks if t.cluster_job_id is not None and not t.has_result]
+
+        # the task result is written at the end of the job
+        for task in submitted:
+            if os.path.exists(task.task_result_json):
+                self._post_result(task)
+
+        now = time.time()
+        submitted = [t for t in submitted if not t.has_result]
+        if submitted and now - self._cluster_status_at >= self.cluster_status_interval:
+            self._cluster_status_at = now
+            active_job_ids = self._get_active_cluster_job_ids()
+            if active_job_ids is not None:
+                for task in submitted:
+                    if task.cluster_job_id in active_job_ids:
+                        task.inactive_at = None
+                    elif task.inactive_at is None:
+                        task.inactive_at = now
+
+        for task in submitted:
+            # check the task result (again) to avoid filesystem latency
+            if task.inactive_at is not None and now - task.inactive_at >= self.lost_job_timeout:
+                if os.path.exists(task.task_result_json):
+                    self._post_result(task)
+                else:
+                    task.has_result = True
+                    if not task.was_terminated:
+                        emsg = "Cluster job {j} of task {i} is no longer active and did not write a task result.".format(j=task.cluster_job_id, i=task.task_id)
+                        self.q_out.put(self._to_failed_result(task, emsg))
+
+        with self._lock:
+            self._cluster_tasks = [t for t in self._cluster_tasks if not (t.has_result or (t.was_terminated and t.cluster_job_id is None))]
+
+    def _update_pilot_tasks(self):
+        """Post the results of the completed (or lost) pilot tasks and launch
+        the pilots for the queued tasks"""
+        with self._lock:
+            tasks = [t for t in self._pilot_tasks if not (t.has_result or t.was_terminated)]
+
+        for pool in self._pilot_pools:
+            self._update_pool_tasks(pool, [t for t in tasks if t.pool is pool])
+
+        with self._lock:
+            self._pilot_tasks = [t for t in self._pilot_tasks if not (t.has_result or t.was_terminated)]
+
+    def _update_pool_tasks(self, pilot_pool, tasks):
+        if tasks:
+            claimed = pilot_pool.queue.get_claimed()
+            for task in tasks:
+                task.worker_id = claimed.get(task.task_uuid, task.worker_id)
+                if os.path.exists(task.task_result_json):
+                    self._post_result(task)
+
+        tasks = [t for t in tasks if not t.has_result]
+        pilot_pool.update(len(tasks))
+
+        if tasks:
+            worker_ids = {t.worker_id for t in tasks if t.worker_id is not None}
+            lost_worker_ids = pilot_pool.get_lost_workers(worker_ids, self.lost_job_timeout)
+
+            for task in tasks:
+                emsg = None
+                if task.worker_id in lost_worker_ids:
+                    # check the task result (again) to avoid filesystem latency
+                    if os.path.exists(task.task_result_json):
+                        self._post_result(task)
+                    else:
+                        emsg = "Pilot {w} of task {i} is no longer active and did not write a task result.".format(w=task.worker_id, i=task.task_id)
+                elif task.worker_id is None and pilot_pool.has_failed:
+                    emsg = "Unable to launch the pilot workers for task {i}. See the pilot logs in {d}".format(i=task.task_id, d=pilot_pool.pilot_dir)
+                if emsg is not None:
+                    task.has_result = True
+                    self.q_out.put(self._to_failed_result(task, emsg))
+
+    def _to_task_result(self, task):
+        try:
+            state, msg, run_time = load_task_result(task.task_result_json)
+            return TaskResult(task.task_uuid, task.task_id, state, msg, round(run_time, 2))
+        except (IOError, ValueError, KeyError) as e:
+            runner_log = os.path.join(os.path.dirname(task.manifest_path), GlobalConstants.TASK_RUNNER_LOG)
+            emsg = "Task {i} runner exited with code {r} without a valid task result ({e}). See '{f}'\n{x}".format(i=task.task_id, r=task.exitcode, e=e, f=runner_log, x=extract_last_nlines(runner_log))
+            return self._to_failed_result(task, emsg)
+
+    def _post_result(self, task):
+        task.has_result = True
+        if task.was_terminated:
+            log.info("Task {i} (pid {p}) was terminated".format(i=task.task_id, p=task.pid))
+        else:
+            log.info("Task {i} (pid {p}) completed with exit code {x} in {s:.2f} sec".format(i=task.task_id, p=task.pid, x=task.exitcode, s=task.run_time))
+            self.q_out.put(self._to_task_result(task))
+
+    def _wakeup_interval(self):
+        interval = self.wakeup_interval
+        if self._cluster_tasks:
+            interval = min(interval, self.cluster_status_interval)
+        if self._pilot_tasks:
+            interval = min([interval] + [x.poll_interval for x in self._pilot_pools])
+        return interval
+
+    def _reap(self):
+        """Post the results of the completed tasks"""
+        with self._lock:
+            items = self._tasks.items()
+
+        for pid, tasks in items:
+            # waitpid(pid, WNOHANG) of the task process
+            has_exited = tasks[0].process.poll() is not None
+            is_array = len(tasks) > 1
+            for task in tasks:
+                if task.has_result:
+                    continue
+                # the array (or fused) tasks are completed independently
+                if has_exited or (is_array and os.path.exists(task.task_result_json)):
+                    self._post_result(task)
+            if has_exited:
+                with self._lock:
+                    self._tasks.pop(pid, None)
+
+    def _wait_for_wakeup(self, timeout):
+        try:
+            rs, _, _ = select.select([self._wakeup_r], [], [], timeout)
+        except select.error as e:
+            if e.args[0] != errno.EINTR:
+                raise
+            return
+        if rs:
+            try:
+                while os.read(self._wakeup_r, 4096):
+                    pass
+            except OSError as e:
+                if e.errno != errno.EAGAIN:
+                    raise
+
+    def run(self):
+        log.info("Starting {k} {n}".format(k=self.__class__.__name__, n=self.name))
+        while not self._shutdown_event.is_set():
+            self._wait_for_wakeup(self._wakeup_interval())
+            try:
+                self._reap()
+                if self._cluster_tasks:
+                    self._update_cluster_tasks()
+                if self._pilot_pools:
+                    self._update_pilot_tasks()
+            except Exception as ex:
+                log.exception("Unhandled exception in {n}. Exception {e}".format(n=self.name, e=ex))
+
+        for fd in (self._wakeup_r, self._wakeup_w):
+            os.close(fd)
+        log.info("exiting {k} {n}".format(k=self.__class__.__name__, n=self.name))
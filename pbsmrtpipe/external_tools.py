@@ -6,6 +6,7 @@ difficult to consistent to install.
 import os
 import logging
 import functools
+import subprocess
 
 from pbsmrtpipe.exceptions import RequiredExeNotFoundError
 from pbsmrtpipe.engine import backticks
@@ -17,7 +18,7 @@ _SUPPORTED_IMAGE_TYPES = 'png svg eps'.split()
 DOT_EXE = 'dot'
 
 
-def _dot_to_image(image_type, dot_file, image_file):
+def _validate_dot_to_image(image_type, dot_file):
     assert image_type.lower() in _SUPPORTED_IMAGE_TYPES
 
     if not os.path.exists(dot_file):
@@ -26,6 +27,10 @@ def _dot_to_image(image_type, dot_file, image_file):
     if which(DOT_EXE) is None:
         raise RequiredExeNotFoundError("Unable to find required external exe '{x}'".format(x=DOT_EXE))
 
+
+def _dot_to_image(image_type, dot_file, image_file):
+    _validate_dot_to_image(image_type, dot_file)
+
     cmd_str = "{e} -T{t} {i} -o {o}"
     d = dict(e=DOT_EXE, t=image_type, i=dot_file, o=image_file)
     cmd = cmd_str.format(**d)
@@ -37,6 +42,36 @@ def _dot_to_image(image_type, dot_file, image_file):
 # For backward compatibility
 dot_to_image = _dot_to_image
 
+
+def dot_to_image_or_cancel(image_type, dot_file, image_file, cancel_event, poll_interval=0.5):
+    """
+    Like dot_to_image, but the dot process is killed when the cancel_event
+    (threading.Event) is set. The image is written to a temp file that is
+    renamed to image_file, hence a partial image is never written.
+
+    :return: True if the image was written
+    """
+    _validate_dot_to_image(image_type, dot_file)
+
+    tmp_file = image_file + ".tmp"
+    cmd = [DOT_EXE, "-T" + image_type, dot_file, "-o", tmp_file]
+    with open(os.devnull, 'w') as null_fh:
+        p = subprocess.Popen(cmd, stdout=null_fh, stderr=null_fh, close_fds=True)
+
+    while p.poll() is None:
+        if cancel_event.wait(poll_interval):
+            log.info("Cancelled cmd '{c}'".format(c=" ".join(cmd)))
+            p.kill()
+            p.wait()
+            break
+
+    if p.returncode == 0 and not cancel_event.is_set():
+        os.rename(tmp_file, image_file)
+        return True
+    if os.path.exists(tmp_file):
+        os.remove(tmp_file)
+    return False
+
 dot_file_to_png = functools.partial(_dot_to_image, 'png')
 dot_file_to_svg = functools.partial(_dot_to_image, 'svg')
 dot_file_to_eps = functools.partial(_dot_to_image, 'eps')
@@ -6,7 +6,7 @@ import os
 import logging
 import re
 import tempfile
-from collections import defaultdict
+from collections import defaultdict, OrderedDict, Counter
 import itertools
 import types
 import uuid
@@ -45,6 +45,7 @@ from pbsmrtpipe.graph.models import (TaskBindingNode,
                                      BindingChunkOutFileNode,
                                      TaskGatherBindingNode,
                                      VALID_ALL_TASK_NODE_CLASSES)
+from pbsmrtpipe.graph.node_store import NodeStateStore
 
 log = logging.getLogger(__name__)
 slog = logging.getLogger(GlobalConstants.SLOG_PREFIX + "__name__")
@@ -55,6 +56,79 @@ class BindingsGraph(nx.DiGraph):
 
     # This is the new model. This will replace the Abstract Graph
 
+    # Node attributes that are tracked by the Task State and Ready Task indexes
+    INDEXED_ATTRS = frozenset([ConstantsNodes.TASK_ATTR_STATE,
+                               ConstantsNodes.TASK_ATTR_IS_CHUNKABLE,
+                               ConstantsNodes.FILE_ATTR_IS_RESOLVED,
+                               ConstantsNodes.FILE_ATTR_PATH])
+    # The state listeners are called when these attributes are updated
+    STATE_ATTRS = frozenset([ConstantsNodes.TASK_ATTR_STATE,
+                             ConstantsNodes.FILE_ATTR_IS_RESOLVED])
+
+    def __init__(self, data=None, **attr):
+        # {state: set of task-like nodes}
+        self._state_index = defaultdict(set)
+        # {task-like node: indexed state}
+        self._task_states = {}
+        # TaskBindingNode(s) in a runnable state with all the inputs resolved.
+        # Ordered by the time the task became ready.
+        self._ready_tasks = OrderedDict()
+        # Nodes with the is_resolved attribute that are not resolved
+        self._unresolved_nodes = set()
+        # File nodes that were resolved (or linked to new file nodes) since
+        # the resolved paths were last propagated to the successor file nodes
+        self._updated_file_nodes = OrderedDict()
+        # Nodes with added or removed edges since the graph integrity was
+        # last validated
+        self._integrity_updated_nodes = set()
+        # Always validate the integrity of the entire graph (debugging)
+        self.full_integrity_check = GlobalConstants.FULL_GRAPH_INTEGRITY_CHECK
+        # {key: Counter of the instance ids} and {key: max instance id} of the
+        # Task-like and File nodes, used to assign the next instance id.
+        # See _to_instance_id_key
+        self._instance_ids = defaultdict(Counter)
+        self._max_instance_ids = {}
+        # Incremented when nodes or edges are added or removed. Used to
+        # invalidate cached values computed from the graph structure.
+        self.structure_version = 0
+        # Incremented when an indexed node attribute (e.g., the task state)
+        # is updated. Used to detect changes of the graph state.
+        self.state_version = 0
+        # Cached topological sort of the nodes. Only invalidated by changes of
+        # the graph structure (see structure_version)
+        self._topological_order = None
+        self._topological_order_version = None
+        # func(node, key, value) called when the task state or the file
+        # resolved state of a node is updated (e.g., the workflow journal)
+        self._state_listeners = []
+        super(BindingsGraph, self).__init__(data=data, **attr)
+        # Compact node attributes container. (networkx also uses the
+        # node_dict_factory for the adjacency dicts)
+        # The node attributes are updated directly throughout the code base
+        # (e.g., g.node[n]['state'] = 'running'), the listener keeps the graph
+        # indexes in sync without requiring every caller to go through the
+        # graph.
+        node_store = NodeStateStore(listener=self._on_node_attr_updated,
+                                    listener_keys=self.INDEXED_ATTRS)
+        node_store.update(self.node)
+        self.node = node_store
+
+    def __deepcopy__(self, memo):
+        # The indexes are copied with the nodes (and the node attributes).
+        # The node attribute listener must be bound to the copy, otherwise
+        # the indexes of the copy are not updated.
+        other = self.__class__.__new__(self.__class__)
+        memo[id(self)] = other
+        for key, value in self.__dict__.iteritems():
+            if key != '_state_listeners':
+                other.__dict__[key] = copy.deepcopy(value, memo)
+        # the state listeners (e.g., the workflow journal) are specific to
+        # the original graph
+        other._state_listeners = []
+        other.node.listener = other._on_node_attr_updated
+        other.node.listener_keys = self.node.listener_keys
+        return other
+
     def _validate_type(self, n):
         _allowed_types = tuple(itertools.chain(VALID_TASK_NODE_CLASSES, VALID_FILE_NODE_CLASSES))
 
@@ -72,26 +146,204 @@ class BindingsGraph(nx.DiGraph):
     def add_edge(self, u, v, attr_dict=None, **attr):
         for n in (u, v):
             self._validate_type(n)
+            if n not in self.node:
+                self.add_node(n)
         super(BindingsGraph, self).add_edge(u, v, attr_dict=attr_dict, **attr)
+        self.structure_version += 1
+        self._integrity_updated_nodes.update((u, v))
+        if isinstance(u, VALID_FILE_NODE_CLASSES) and isinstance(v, VALID_FILE_NODE_CLASSES):
+            self._updated_file_nodes[u] = True
+        self._update_ready_tasks([v])
 
     def add_node(self, n, attr_dict=None, **attr):
         self._validate_type(n)
+        is_new = n not in self.node
         super(BindingsGraph, self).add_node(n, attr_dict=attr_dict, **attr)
+        if is_new:
+            self.structure_version += 1
+            self._integrity_updated_nodes.add(n)
+            self._index_node(n)
+
+    def remove_edge(self, u, v):
+        super(BindingsGraph, self).remove_edge(u, v)
+        self.structure_version += 1
+        self._integrity_updated_nodes.update((u, v))
+        self._update_ready_tasks([v])
+
+    def remove_node(self, n):
+        successors = self.successors(n) if n in self.node else []
+        predecessors = self.predecessors(n) if n in self.node else []
+        super(BindingsGraph, self).remove_node(n)
+        self.structure_version += 1
+        self._integrity_updated_nodes.update(successors)
+        self._integrity_updated_nodes.update(predecessors)
+        self._unindex_node(n)
+        self._update_ready_tasks(successors)
+
+    def remove_nodes_from(self, nodes):
+        # Like networkx, silently ignore nodes that are not in the graph
+        for n in list(nodes):
+            if n in self.node:
+                self.remove_node(n)
+
+    # The networkx bulk methods don't call add_node, add_edge and remove_edge.
+    # They are overridden to keep the graph indexes in sync.
+    def add_nodes_from(self, nodes, **attr):
+        for n in nodes:
+            if isinstance(n, tuple) and len(n) == 2 and isinstance(n[1], dict):
+                node, node_attr = n
+                d = dict(attr)
+                d.update(node_attr)
+                self.add_node(node, **d)
+            else:
+                self.add_node(n, **attr)
+
+    def add_edges_from(self, ebunch, attr_dict=None, **attr):
+        for e in ebunch:
+            d = dict(attr_dict or {})
+            d.update(attr)
+            if len(e) == 3:
+                d.update(e[2])
+            self.add_edge(e[0], e[1], attr_dict=d)
+
+    def remove_edges_from(self, ebunch):
+        # Like networkx, silently ignore edges that are not in the graph
+        for e in list(ebunch):
+            if self.has_edge(e[0], e[1]):
+                self.remove_edge(e[0], e[1])
+
+    @staticmethod
+    def _to_instance_id_key(n):
+        if isinstance(n, EntryPointNode):
+            return None
+        elif isinstance(n, _TaskLike):
+            return n.meta_task.task_id
+        elif isinstance(n, BindingInFileNode):
+            return BindingInFileNode
+        elif isinstance(n, BindingOutFileNode):
+            return BindingOutFileNode
+        return None
+
+    def _index_instance_id(self, n):
+        key = self._to_instance_id_key(n)
+        if key is not None:
+            self._instance_ids[key][n.instance_id] += 1
+            self._max_instance_ids[key] = max(n.instance_id, self._max_instance_ids.get(key, 0))
+
+    def _unindex_instance_id(self, n):
+        key = self._to_instance_id_key(n)
+        if key is not None:
+            instance_ids = self._instance_ids[key]
+            instance_ids[n.instance_id] -= 1
+            if instance_ids[n.instance_id] <= 0:
+                del instance_ids[n.instance_id]
+                if n.instance_id == self._max_instance_ids.get(key):
+                    self._max_instance_ids[key] = max(instance_ids) if instance_ids else 0
+
+    def _get_max_instance_id(self, key):
+        return max(0, self._max_instance_ids.get(key, 0))
+
+    def _index_node(self, n):
+        self._index_instance_id(n)
+        if isinstance(n, _TaskLike):
+            self._index_task_state(n)
+        self._index_resolved_state(n)
+        self._update_ready_tasks([n])
+
+    def _unindex_node(self, n):
+        self._unindex_instance_id(n)
+        state = self._task_states.pop(n, None)
+        self._state_index[state].discard(n)
+        self._ready_tasks.pop(n, None)
+        self._unresolved_nodes.discard(n)
+        self._updated_file_nodes.pop(n, None)
+        self._integrity_updated_nodes.discard(n)
+
+    def _index_resolved_state(self, n):
+        attrs = self.node[n]
+        if ConstantsNodes.FILE_ATTR_IS_RESOLVED in attrs and not attrs[ConstantsNodes.FILE_ATTR_IS_RESOLVED]:
+            self._unresolved_nodes.add(n)
+        else:
+            self._unresolved_nodes.discard(n)
+
+    def _index_task_state(self, n):
+        state = self.node[n].get(ConstantsNodes.TASK_ATTR_STATE)
+        if n in self._task_states:
+            self._state_index[self._task_states[n]].discard(n)
+        self._task_states[n] = state
+        self._state_index[state].add(n)
+
+    def _is_task_ready(self, tnode):
+        attrs = self.node[tnode]
+        if attrs.get(ConstantsNodes.TASK_ATTR_STATE) not in TaskStates.RUNNABLE_STATES():
+            return False
+        # Skip original 'unchunked' tasks.
+        if attrs.get(ConstantsNodes.TASK_ATTR_IS_CHUNKABLE) is True:
+            return False
+        # must have at least one input file and all are resolved
+        ninputs = 0
+        for fnode in self.pred[tnode]:
+            if isinstance(fnode, VALID_FILE_NODE_CLASSES):
+                if not self.node[fnode].get(ConstantsNodes.FILE_ATTR_IS_RESOLVED, False):
+                    return False
+                ninputs += 1
+        return ninputs > 0
+
+    def _update_ready_tasks(self, nodes):
+        for n in nodes:
+            if isinstance(n, TaskBindingNode) and n in self.node:
+                if self._is_task_ready(n):
+                    self._ready_tasks.setdefault(n, True)
+                else:
+                    self._ready_tasks.pop(n, None)
+
+    def _on_node_attr_updated(self, n, key):
+        self.state_version += 1
+        if key == ConstantsNodes.TASK_ATTR_STATE:
+            if isinstance(n, _TaskLike):
+                self._index_task_state(n)
+            self._update_ready_tasks([n])
+        elif key == ConstantsNodes.TASK_ATTR_IS_CHUNKABLE:
+            self._update_ready_tasks([n])
+        elif key == ConstantsNodes.FILE_ATTR_IS_RESOLVED:
+            self._index_resolved_state(n)
+            self._update_ready_tasks(self.succ.get(n, ()))
+            if isinstance(n, VALID_FILE_NODE_CLASSES):
+                self._updated_file_nodes[n] = True
+        elif key == ConstantsNodes.FILE_ATTR_PATH:
+            if isinstance(n, VALID_FILE_NODE_CLASSES):
+                self._updated_file_nodes[n] = True
+
+        if self._state_listeners and key in self.STATE_ATTRS:
+            value = self.node[n][key]
+            for func in self._state_listeners:
+                func(n, key, value)
+
+    def add_state_listener(self, func):
+        """Register func(node, key, value) to be called when the task state
+        or the file resolved state (see STATE_ATTRS) of a node is updated"""
+        self._state_listeners.append(func)
 
     def _get_nodes_by_klasses(self, klasses, data=False):
         return [n for n in list(self.nodes_iter(data=data)) if isinstance(n, klasses)]
 
+    def topological_sort(self):
+        """Returns the nodes in topological order. The order is cached until the
+        graph structure is changed (nodes or edges added or removed).
+
+        :rtype: list
+        """
+        if self._topological_order_version != self.structure_version:
+            self._topological_order = nx.topological_sort(self)
+            self._topological_order_version = self.structure_version
+        return list(self._topological_order)
+
     def _get_sorted_nodes_by_klass(self, klasses):
-        nodes = nx.topological_sort(self)
+        nodes = self.topological_sort()
         return [n for n in nodes if isinstance(n, klasses)]
 
     def _get_next_instance_id(self, meta_task):
-        xd = defaultdict(lambda : 0)
-        for tnode in self.all_task_type_nodes():
-            if not isinstance(tnode, EntryPointNode):
-                i = max(tnode.instance_id, xd[tnode.meta_task.task_id])
-                xd[tnode.meta_task.task_id] = i
-        return xd[meta_task.task_id] + 1
+        return self._get_max_instance_id(meta_task.task_id) + 1
 
     def add_meta_task(self, meta_task):
         """Generate a TaskBindingNode and assign an instance-id
@@ -124,12 +376,12 @@ class BindingsGraph(nx.DiGraph):
         return t
 
     def _get_next_file_instance_id(self, file_node_class, file_type):
-        xd = defaultdict(lambda : 0)
-        for fnode in self.file_nodes():
-            if not isinstance(fnode, file_node_class):
-                i = max(fnode.instance_id, xd[file_type.file_type_id])
-                xd[file_type.file_type_id] = i
-        return xd[file_type.file_type_id] + 1
+        # Max instance id of the file nodes that are not of the file_node_class
+        # (the instance id of an EntryOutBindingFileNode is always 0)
+        if not isinstance(file_node_class, tuple):
+            file_node_class = (file_node_class, )
+        keys = [k for k in (BindingInFileNode, BindingOutFileNode) if not issubclass(k, file_node_class)]
+        return max([0] + [self._get_max_instance_id(k) for k in keys]) + 1
 
     def add_binding_in(self, meta_task, index, file_type):
         i = self._get_next_file_instance_id((BindingInFileNode, BindingChunkInFileNode), file_type)
@@ -185,17 +437,74 @@ class BindingsGraph(nx.DiGraph):
 
     def entry_binding_nodes(self):
         # these are files-esque
-        nodes = nx.topological_sort(self)
+        nodes = self.topological_sort()
         return [n for n in nodes if isinstance(n, EntryOutBindingFileNode)]
 
     def entry_point_nodes(self):
         # these are task-esque
-        nodes = nx.topological_sort(self)
+        nodes = self.topological_sort()
         return [n for n in nodes if isinstance(n, EntryPointNode)]
 
     def get_tasks_by_state(self, state):
         return get_tasks_by_state(self, state)
 
+    def task_nodes_in_state(self, state):
+        """Returns the Task-like nodes in the state (unordered)"""
+        return list(self._state_index.get(state, ()))
+
+    def ntask_nodes(self):
+        """Number of Task-like nodes"""
+        return len(self._task_states)
+
+    def ntask_nodes_in_states(self, states):
+        return sum(len(self._state_index.get(s, ())) for s in set(states))
+
+    def pop_updated_file_nodes(self):
+        """
+        Returns (and clears) the file nodes that were resolved, or linked to
+        new file nodes, since the last call.
+        """
+        fnodes = list(self._updated_file_nodes)
+        self._updated_file_nodes.clear()
+        return fnodes
+
+    def integrity_updated_task_nodes(self):
+        """
+        Returns the Task-like nodes that need to be (re)validated since the
+        last call to clear_integrity_updated_nodes.
+
+        A Task-like node is valid if its input file nodes have the expected
+        in-degree, hence the Task-like nodes with an added/removed edge and
+        the Task-like successors of the nodes with an added/removed edge.
+        """
+        tnodes = set()
+        for n in self._integrity_updated_nodes:
+            if isinstance(n, _TaskLike):
+                tnodes.add(n)
+            for s in self.succ.get(n, ()):
+                if isinstance(s, _TaskLike):
+                    tnodes.add(s)
+        return list(tnodes)
+
+    def clear_integrity_updated_nodes(self):
+        self._integrity_updated_nodes.clear()
+
+    def nunresolved_nodes(self):
+        """Number of nodes (files and entry points) that are not resolved"""
+        return len(self._unresolved_nodes)
+
+    def ready_task_nodes(self):
+        """
+        Returns the TaskBindingNode(s) that are in a runnable state and have
+        all the inputs resolved, in the order they became ready.
+        """
+        return list(self._ready_tasks)
+
+    def get_next_ready_task(self):
+        for tnode in self._ready_tasks:
+            return tnode
+        return None
+
     def is_workflow_complete(self):
         return _is_workflow_complete(self)
 
@@ -209,38 +518,55 @@ class BindingsGraph(nx.DiGraph):
         return "<{k} Tasks:{t} Files:{f} EntryPoints:{p} node:{n} edges:{e} >".format(**d)
 
 
-def validate_binding_graph_integrity(bg):
+def _validate_task_node_integrity(bg, n):
+    for i in bg.predecessors(n):
+        # the in degree should be 1,
+        # or 0 if the node is an Entry Point
+        i_d, o_d = bg.in_degree(i), bg.out_degree(i)
+        d = o_d - i_d
+        # print i_d, o_d, d, n, i
+
+        emsg = "Invalid In-degree ({x}) of task id {d} with file node {f}.".format(x=i_d, d=n, f=i)
+
+        if i_d == 0:
+            if not isinstance(i, EntryPointNode):
+                raise MalformedBindingGraphError(emsg)
+        elif i_d == 1:
+            # this is the expected
+            pass
+        else:
+            # Gather Tasks are allowed to have an in-degree > 1
+            if not isinstance(n, TaskGatherBindingNode):
+                raise MalformedBindingGraphError(emsg)
+
+    return True
+
+
+def validate_binding_graph_integrity(bg, full=None):
     """
     Check for malformed graphs with dangling input file nodes.
 
+    By default, only the Task-like nodes touched (nodes or edges added or
+    removed) since the last validation are checked. The entire graph is
+    checked if full is True, or if bg.full_integrity_check is enabled.
 
     :raises: MalformedBindingGraphError
     :param bg: Binding Graph
+    :param full: Validate every Task-like node. Defaults to
+    bg.full_integrity_check
 
     :type bg: BindingsGraph
     :return:
     """
-    for n in bg.all_task_type_nodes():
-        for i in bg.predecessors(n):
-            # the in degree should be 1,
-            # or 0 if the node is an Entry Point
-            i_d, o_d = bg.in_degree(i), bg.out_degree(i)
-            d = o_d - i_d
-            # print i_d, o_d, d, n, i
-
-            emsg = "Invalid In-degree ({x}) of task id {d} with file node {f}.".format(x=i_d, d=n, f=i)
-
-            if i_d == 0:
-                if not isinstance(i, EntryPointNode):
-                    raise MalformedBindingGraphError(emsg)
-            elif i_d == 1:
-                # this is the expected
-                pass
-            else:
-                # Gather Tasks are allowed to have an in-degree > 1
-                if not isinstance(n, TaskGatherBindingNode):
-                    raise MalformedBindingGraphError(emsg)
+    if full is None:
+        full = bg.full_integrity_check
+
+    tnodes = bg.all_task_type_nodes() if full else bg.integrity_updated_task_nodes()
 
+    for n in tnodes:
+        _validate_task_node_integrity(bg, n)
+
+    bg.clear_integrity_updated_nodes()
     return True
 
 
@@ -580,18 +906,17 @@ def _is_workflow_complete(g):
 
     1. All the task nodes must be in the 'finished' state
 
+    The counts are maintained by the graph as the states are updated, so
+    this is O(1).
+
+    :type g: BindingsGraph
     :rtype: bool
     """
 
-    for task_node in g.all_task_type_nodes():
-        states = get_node_attributes(g, ConstantsNodes.TASK_ATTR_STATE)
-        state = states[task_node]
-        if state not in TaskStates.COMPLETED_STATES():
-            return False
+    if g.ntask_nodes_in_states(TaskStates.COMPLETED_STATES()) != g.ntask_nodes():
+        return False
 
-    states = get_node_attributes(g, 'is_resolved')
-    all_resolved = all(states.values())
-    if not all_resolved:
+    if g.nunresolved_nodes() != 0:
         return False
 
     # made it here all the files are resolved and the tasks are all in
@@ -612,96 +937,127 @@ def was_task_successful_with_resolve_outputs(bg, task_like_node):
 
 
 def was_workflow_successful(bg):
-    return all(was_task_successful(bg, t) for t in bg.all_task_type_nodes())
+    return bg.ntask_nodes_in_states([TaskStates.SUCCESSFUL]) == bg.ntask_nodes()
 
 
-def _are_all_inputs_resolved(bg, tnode):
-    _ns = {}
-    for fnode in bg.predecessors(tnode):
-        if isinstance(fnode, VALID_FILE_NODE_CLASSES):
-            is_resolved = bg.node[fnode][ConstantsNodes.FILE_ATTR_IS_RESOLVED]
-            _ns[fnode] = is_resolved
+def get_next_runnable_task(g):
+    """
+    Returns the next runnable TaskBindingNode (in a runnable state, not an
+    original 'unchunked' task and all the inputs are resolved) or None.
 
-    # must have at least one value and all are resolved
-    if _ns:
-        return all(_ns.values())
+    The graph keeps track of the runnable tasks as the task and file states
+    are updated, hence this doesn't require scanning the graph.
 
-    return False
+    :type g: BindingsGraph
+    """
+    return g.get_next_ready_task()
 
 
-def get_next_runnable_task(g):
+class CriticalPathPrioritizer(object):
 
-    if g.is_workflow_complete():
-        return None
+    """
+    Select the runnable task with the longest estimated remaining critical
+    path (the task run time + the longest path of the downstream tasks).
 
-    # this should probably do a top sort, then return
-    for tnode in g.all_task_type_nodes():
-        if isinstance(tnode, TaskBindingNode):
-            state = g.node[tnode][ConstantsNodes.TASK_ATTR_STATE]
-            is_chunkable = g.node[tnode][ConstantsNodes.TASK_ATTR_IS_CHUNKABLE]
-            if state == TaskStates.SCATTERED:
-                # these tasks are labeled as on-hold and will be deleted
-                # once the gather step is successful
-                continue
-            elif is_chunkable is True:
-                # Skip original 'unchunked' tasks.
-                continue
-            elif state in TaskStates.RUNNABLE_STATES():
-                if _are_all_inputs_resolved(g, tnode):
-                    return tnode
-            else:
-                # log.debug("Skipping chunkable tasks {n}".format(n=tnode))
-                pass
+    Task run times are looked up by task type id (e.g., from a previous
+    run of the pipeline), otherwise a static default weight is used.
+
+    The remaining critical path of every node is cached and only recomputed
+    when the structure of the graph changes (e.g., chunking/gathering).
+    """
 
-    # log.debug("Unable to find runnable task")
-    return None
+    def __init__(self, task_run_times=None, default_weight=GlobalConstants.DEFAULT_TASK_WEIGHT):
+        """
+        :param task_run_times: {task type id: run time (sec)}
+        :param default_weight: weight of task types without a run time
+        """
+        self.task_run_times = {} if task_run_times is None else task_run_times
+        self.default_weight = default_weight
+        self._structure_version = None
+        self._remaining = {}
+
+    def __repr__(self):
+        _d = dict(k=self.__class__.__name__, n=len(self.task_run_times), w=self.default_weight)
+        return "<{k} task run times:{n} default weight:{w} >".format(**_d)
+
+    def to_weight(self, node):
+        if isinstance(node, TaskBindingNode):
+            return self.task_run_times.get(node.meta_task.task_id, self.default_weight)
+        return 0.0
+
+    def _update_remaining(self, g):
+        if self._structure_version == g.structure_version:
+            return self._remaining
+
+        remaining = {}
+        for node in reversed(g.topological_sort()):
+            downstream = [remaining[x] for x in g.successors_iter(node)]
+            remaining[node] = self.to_weight(node) + (max(downstream) if downstream else 0.0)
+
+        self._remaining = remaining
+        self._structure_version = g.structure_version
+        return remaining
+
+    def get_remaining_critical_path(self, g, tnode):
+        return self._update_remaining(g)[tnode]
+
+    def get_runnable_tasks(self, g):
+        """
+        Runnable tasks ordered by the remaining critical path (longest first)
+
+        :type g: BindingsGraph
+        """
+        remaining = self._update_remaining(g)
+        # sort is stable, ties are broken by the order the tasks became runnable
+        return sorted(g.ready_task_nodes(), key=lambda x: remaining[x], reverse=True)
+
+
+def get_runnable_tasks(g):
+    """
+    Returns all the runnable TaskBindingNode(s) in the order they became
+    runnable.
+
+    :type g: BindingsGraph
+    """
+    return g.ready_task_nodes()
 
 
 def has_task_in_states(g, task_states):
     # All tasks are running or completed
-    return any((g.node[t][ConstantsNodes.TASK_ATTR_STATE] not in task_states for t in g.all_task_type_nodes()))
+    return g.ntask_nodes() > g.ntask_nodes_in_states(task_states)
 
 
 def are_all_tasks_running(g):
-    return all((g.node[t][ConstantsNodes.TASK_ATTR_STATE] not in TaskStates.RUNNABLE_STATES() for t in g.all_task_type_nodes()))
+    return g.ntask_nodes_in_states(TaskStates.RUNNABLE_STATES()) == 0
 
 
 def has_running_task(g):
-    return any(g.node[x][ConstantsNodes.TASK_ATTR_STATE] == TaskStates.RUNNING for x in g.all_task_type_nodes())
+    return g.ntask_nodes_in_states([TaskStates.RUNNING]) > 0
 
 
 def has_next_runnable_task(g):
     """
-    If there is a valid runnable task
-
-    All tasks are running
+    If there is a ready task (see get_next_runnable_task). The chunkable
+    (unchunked) tasks and the tasks without input files are never ready.
 
     :type g: BindingsGraph
     :rtype: Boolean
     """
+    return g.get_next_ready_task() is not None
 
-    if g.is_workflow_complete():
-        return False
 
-    # All tasks are running or completed
-    if all((g.node[t][ConstantsNodes.TASK_ATTR_STATE] not in TaskStates.RUNNABLE_STATES() for t in g.all_task_type_nodes())):
-        return False
-
-    for tnode in get_tasks_by_state(g, TaskStates.RUNNABLE_STATES()):
-        _ns = {}
-        for fnode in g.predecessors(tnode):
-            if isinstance(fnode, VALID_FILE_NODE_CLASSES):
-                is_resolved = g.node[fnode][ConstantsNodes.FILE_ATTR_IS_RESOLVED]
-                if is_resolved:
-                    _ns[fnode] = is_resolved
-                else:
-                    # try to find task that is running
-                    _ns[fnode] = is_resolved
-
-        if all(_ns.values()):
-            return True
+def is_workflow_stalled(g):
+    """
+    The workflow is not complete, no task is running and every task is
+    waiting to run, but none of the tasks is ready (e.g., unresolved entry
+    points). Used by the driver to fail the job instead of waiting forever.
 
-    return False
+    :type g: BindingsGraph
+    :rtype: Boolean
+    """
+    if g.is_workflow_complete() or has_running_task(g):
+        return False
+    return not has_task_in_states(g, TaskStates.RUNNABLE_STATES()) and not has_next_runnable_task(g)
 
 
 def get_task_input_files(g, tnode):
@@ -735,18 +1091,95 @@ def get_task_output_files(g, tnode):
     return [p for _, p in sorted(files)]
 
 
+def _get_successor_task_nodes(g, tnode):
+    """Task nodes that have an input bound to an output of tnode"""
+    tnodes = []
+    for out_fnode in g.successors_iter(tnode):
+        for in_fnode in g.successors_iter(out_fnode):
+            for node in g.successors_iter(in_fnode):
+                if isinstance(node, TaskBindingNode) and node not in tnodes:
+                    tnodes.append(node)
+    return tnodes
+
+
+def _is_fusible_task_node(g, tnode):
+    """Distributed task that isn't scattered, chunked or gathered"""
+    return (type(tnode) is TaskBindingNode and tnode.meta_task.is_distributed and
+            not g.node[tnode][ConstantsNodes.TASK_ATTR_IS_CHUNKABLE])
+
+
+def _are_all_inputs_from_task(g, tnode, upstream_tnode):
+    for in_fnode in g.predecessors_iter(tnode):
+        out_fnodes = g.predecessors(in_fnode)
+        if len(out_fnodes) != 1 or g.predecessors(out_fnodes[0]) != [upstream_tnode]:
+            return False
+    return True
+
+
+def get_fusible_task_chain(g, tnode, max_ntasks):
+    """
+    Returns the linear chain of tasks (starting with tnode) that can be run
+    sequentially as a single job, or [tnode] if there is nothing to fuse.
+
+    A task is appended to the chain if it's the only successor of the last
+    task of the chain that has all its inputs bound to outputs of the last
+    task. All the tasks of the chain must be distributed tasks that are not
+    scattered, chunked or gathered, and the appended tasks must not be
+    submitted yet.
+
+    :type g: BindingsGraph
+    :type tnode: TaskBindingNode
+    :param max_ntasks: Max number of tasks in the chain
+    """
+    chain = [tnode]
+    if not _is_fusible_task_node(g, tnode):
+        return chain
+
+    while len(chain) < max_ntasks:
+        last = chain[-1]
+        candidates = [x for x in _get_successor_task_nodes(g, last)
+                      if _is_fusible_task_node(g, x) and
+                      g.node[x][ConstantsNodes.TASK_ATTR_STATE] in TaskStates.RUNNABLE_STATES() and
+                      _are_all_inputs_from_task(g, x, last)]
+        if len(candidates) != 1:
+            break
+        chain.append(candidates[0])
+
+    return chain
+
+
+def get_fused_task_input_files(g, tnode, upstream_output_files):
+    """
+    Returns the input files of a fused task (see get_fusible_task_chain) from
+    the output files of the upstream task in the chain. The input file nodes
+    are only resolved after the upstream task has completed.
+
+    :type tnode: TaskBindingNode
+    :param upstream_output_files: Output files of the upstream Task
+    """
+    ninput_files = len(tnode.meta_task.input_types)
+
+    files = {}
+    for in_fnode in g.predecessors_iter(tnode):
+        out_fnode = g.predecessors(in_fnode)[0]
+        files[in_fnode.index] = upstream_output_files[out_fnode.index]
+
+    if ninput_files != len(files):
+        raise ValueError("Expected inputs to have {n}. Got {x}".format(n=ninput_files, x=len(files)))
+
+    return [p for _, p in sorted(files.iteritems())]
+
+
 def get_tasks_by_state(g, state_or_states):
-    if isinstance(state_or_states, (list, type)):
-        states = state_or_states
+    if isinstance(state_or_states, (list, tuple, set, frozenset)):
+        states = set(state_or_states)
     else:
         states = [state_or_states]
 
     node_states = {}
-    for n in g.nodes():
-        if isinstance(n, VALID_ALL_TASK_NODE_CLASSES):
-            state = g.node[n][ConstantsNodes.TASK_ATTR_STATE]
-            if state in states:
-                node_states[n] = state
+    for state in states:
+        for n in g.task_nodes_in_state(state):
+            node_states[n] = state
 
     return node_states
 
@@ -843,29 +1276,50 @@ def update_task_output_file_nodes(bg, tnode, task):
     return True
 
 
-def resolve_successor_binding_file_path(g):
-    """update linked bound files
+def _resolve_successor_binding_file_path(g, fnode):
+    attrs = g.node[fnode]
+    is_resolved = attrs.get(ConstantsNodes.FILE_ATTR_IS_RESOLVED, False)
+    path = attrs.get(ConstantsNodes.FILE_ATTR_PATH, None)
+
+    if is_resolved and path is None:
+        log.debug("Incompatible attrs. Resolved files, must have path defined. File {f}".format(f=fnode))
+
+    if is_resolved and path is not None:
+        for s in g.successors_iter(fnode):
+            if isinstance(s, (BindingInFileNode, BindingOutFileNode)):
+                update_file_state_to_resolved(g, s, path)
+
+
+def propagate_resolved_file_paths(g, fnodes):
+    """
+    Update the linked (successor) bound files of the file nodes, then
+    the linked files of the updated files, until nothing is left to update.
 
+    Only the file nodes that were updated are visited (instead of every file
+    node in the graph).
 
     :type g: BindingsGraph
+    :param fnodes: File nodes that were resolved (or linked to new file nodes)
     """
+    fnodes = list(fnodes)
+    while fnodes:
+        for fnode in fnodes:
+            if fnode in g.node:
+                _resolve_successor_binding_file_path(g, fnode)
+        # successor files that were resolved in this pass
+        fnodes = g.pop_updated_file_nodes()
+
+    return True
 
-    for fnode in g.file_nodes():
-        attrs = g.node[fnode]
-        is_resolved = attrs.get(ConstantsNodes.FILE_ATTR_IS_RESOLVED, False)
-        path = attrs.get(ConstantsNodes.FILE_ATTR_PATH, None)
 
-        if is_resolved and path is None:
-            log.debug("Incompatible attrs. Resolved files, must have path defined. File {f}".format(f=fnode))
+def resolve_successor_binding_file_path(g):
+    """update linked bound files
 
-        if is_resolved and path is not None:
-            snodes = g.successors(fnode)
-            # log.debug("Updating {n} nodes".format(n=len(snodes)))
-            for s in snodes:
-                if isinstance(s, (BindingInFileNode, BindingOutFileNode)):
-                    update_file_state_to_resolved(g, s, path)
+    Propagates from the file nodes that were updated since the last call.
 
-    return True
+    :type g: BindingsGraph
+    """
+    return propagate_resolved_file_paths(g, g.pop_updated_file_nodes())
 
 
 def resolve_entry_point(g, entry_id, path):
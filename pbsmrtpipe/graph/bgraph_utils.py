@@ -3,10 +3,13 @@ import json
 import datetime
 import os
 import functools
+import threading
+from collections import defaultdict
 
 import networkx as nx
 
 import pbsmrtpipe.external_tools as ET
+import pbsmrtpipe.constants as GlobalConstants
 
 from pbsmrtpipe.models import TaskStates
 from pbsmrtpipe.graph.models import (ConstantsNodes,
@@ -69,26 +72,152 @@ def write_bindings_graph_to_json(bg, path):
         w.write(json.dumps(d, indent=4, sort_keys=True, cls=DateTimeEncoder))
 
 
-def write_binding_graph_images(g, root_dir):
+_GRAPH_IMAGE_FORMATS = ('png', 'svg')
+
+
+def _to_image_path(root_dir, image_format):
+    return os.path.join(root_dir, '.'.join(['workflow', image_format]))
+
+
+def _to_chunk_group_node_ids(g):
+    """
+    Returns {node: collapsed node id} of the chunked tasks (and the chunked
+    files of the tasks). All the chunks of a task in a chunk group are
+    collapsed into a single node.
+    """
+    groups = defaultdict(list)
+    for node in g.nodes():
+        if isinstance(node, (TaskChunkedBindingNode, BindingChunkInFileNode, BindingChunkOutFileNode)):
+            groups[(node.meta_task.task_id, node.chunk_group_id)].append(node)
+
+    node_ids = {}
+    for (task_id, chunk_group_id), nodes in groups.iteritems():
+        nchunks = sum(1 for n in nodes if isinstance(n, TaskChunkedBindingNode))
+        node_id = "ChunkGroup {t} nchunks:{n} chunk-group-id:{u}".format(t=task_id, n=nchunks, u=chunk_group_id)
+        for node in nodes:
+            node_ids[node] = node_id
+    return node_ids
+
+
+def _write_dot_and_json(g, root_dir, collapse_nnodes, max_image_nnodes):
+    """
+    Write the JSON graph and the dot file of the graph. Chunk groups are
+    collapsed if the graph has more than collapse_nnodes nodes.
+
+    Returns the path to the dot file, or None if the (collapsed) graph has
+    more than max_image_nnodes nodes. The stale dot file and images are
+    removed.
+    """
+    workflow_json = os.path.join(root_dir, 'workflow-graph.json')
+    write_bindings_graph_to_json(g, workflow_json)
+
+    nnodes = len(g)
+    collapse_chunks = nnodes > collapse_nnodes
+    if collapse_chunks:
+        node_ids = _to_chunk_group_node_ids(g)
+        nnodes = nnodes - len(node_ids) + len(set(node_ids.values()))
 
     dot_file = os.path.join(root_dir, 'workflow.dot')
-    s = binding_graph_to_dot(g)
+    if nnodes > max_image_nnodes:
+        log.info("Graph has {n} nodes (max {m}). Only writing {p}".format(n=nnodes, m=max_image_nnodes, p=workflow_json))
+        stale_files = [dot_file] + [_to_image_path(root_dir, x) for x in _GRAPH_IMAGE_FORMATS]
+        for path in stale_files:
+            if os.path.exists(path):
+                os.remove(path)
+        return None
+
+    s = binding_graph_to_dot(g, collapse_chunks=collapse_chunks)
     with open(dot_file, 'w') as f:
         f.write(s)
+    return dot_file
 
-    formats = ('png', 'svg')
-    for f in formats:
-        p = os.path.join(root_dir, '.'.join(['workflow', f]))
-        ET.dot_to_image(f, dot_file, p)
 
-    workflow_json = os.path.join(root_dir, 'workflow-graph.json')
-    write_bindings_graph_to_json(g, workflow_json)
+def write_binding_graph_images(g, root_dir,
+                               collapse_nnodes=GlobalConstants.BINDING_GRAPH_COLLAPSE_NNODES,
+                               max_image_nnodes=GlobalConstants.BINDING_GRAPH_MAX_IMAGE_NNODES):
+    """Write the JSON graph, the dot file and the (png, svg) images of the
+    graph (see BindingGraphImageWriter to render the images in the
+    background)"""
+    dot_file = _write_dot_and_json(g, root_dir, collapse_nnodes, max_image_nnodes)
+    if dot_file is not None:
+        for f in _GRAPH_IMAGE_FORMATS:
+            ET.dot_to_image(f, dot_file, _to_image_path(root_dir, f))
+
+
+def _render_images(dot_file, root_dir, cancel_event):
+    try:
+        for f in _GRAPH_IMAGE_FORMATS:
+            if not ET.dot_to_image_or_cancel(f, dot_file, _to_image_path(root_dir, f), cancel_event):
+                log.warn("Unable to write {f} image of {d}".format(f=f, d=dot_file))
+            if cancel_event.is_set():
+                break
+    except Exception as e:
+        log.error("Failed to render the images of {d}. {e}".format(d=dot_file, e=e))
+
 
+class BindingGraphImageWriter(object):
 
-def binding_graph_to_dot(g):
+    """Writes the images of the graph (see write_binding_graph_images)
+
+    The JSON graph and the dot file are written by the caller, the graph is
+    not thread-safe. The images are rendered by the external dot exe in a
+    background thread, which can take minutes for large graphs. A new write
+    cancels the rendering of the previous graph.
+    """
+
+    def __init__(self, root_dir,
+                 collapse_nnodes=GlobalConstants.BINDING_GRAPH_COLLAPSE_NNODES,
+                 max_image_nnodes=GlobalConstants.BINDING_GRAPH_MAX_IMAGE_NNODES):
+        self.root_dir = root_dir
+        self.collapse_nnodes = collapse_nnodes
+        self.max_image_nnodes = max_image_nnodes
+        self._thread = None
+        self._cancel_event = threading.Event()
+
+    def __repr__(self):
+        _d = dict(k=self.__class__.__name__, d=self.root_dir, r=self.is_rendering())
+        return "<{k} {d} rendering:{r} >".format(**_d)
+
+    def is_rendering(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def write(self, g):
+        self.cancel()
+        dot_file = _write_dot_and_json(g, self.root_dir, self.collapse_nnodes, self.max_image_nnodes)
+        if dot_file is not None:
+            self._cancel_event = threading.Event()
+            self._thread = threading.Thread(target=_render_images, name="binding-graph-images",
+                                            args=(dot_file, self.root_dir, self._cancel_event))
+            self._thread.daemon = True
+            self._thread.start()
+
+    def wait(self, timeout=None):
+        """Returns True if the images are rendered"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return not self.is_rendering()
+
+    def cancel(self):
+        if self.is_rendering():
+            log.info("Cancelling the rendering of the graph images in {d}".format(d=self.root_dir))
+            self._cancel_event.set()
+            self._thread.join()
+        self._thread = None
+
+    def close(self, timeout=None):
+        """Wait at most timeout sec for the rendering of the images"""
+        if not self.wait(timeout):
+            log.warn("Graph images were not rendered in {t} sec".format(t=timeout))
+        self.cancel()
+
+
+def binding_graph_to_dot(g, collapse_chunks=False):
     """
     Custom generation of dot file format
 
+    If collapse_chunks is True, the chunked tasks (and files) of each task
+    of a chunk group are a single node.
+
     :rtype: str
     """
 
@@ -153,8 +282,12 @@ def binding_graph_to_dot(g):
         attrs_str = _to_attr_s(_d)
         return ' '.join([s, attrs_str])
 
+    node_ids = _to_chunk_group_node_ids(g) if collapse_chunks else {}
+
     # write the node metadata
     for node in g.nodes():
+        if node in node_ids:
+            continue
         funcs = {TaskBindingNode: _task_node_to_dot,
                  TaskChunkedBindingNode: _task_node_to_dot,
                  TaskScatterBindingNode: _task_node_to_dot,
@@ -169,9 +302,21 @@ def binding_graph_to_dot(g):
         x = f(g, node)
         _add(_to_l(x))
 
+    # collapsed chunk groups
+    failed_node_ids = {node_ids[n] for n in node_ids
+                       if isinstance(n, TaskChunkedBindingNode) and g.node[n]['state'] == TaskStates.FAILED}
+    for node_id in set(node_ids.values()):
+        color = DotColorConstants.RED if node_id in failed_node_ids else TaskChunkedBindingNode.DOT_COLOR
+        _d = dict(fillcolor=color, color=color, style=DotStyleConstants.FILLED, shape=TaskChunkedBindingNode.DOT_SHAPE)
+        _add(_to_l(' '.join([_to_s(node_id), _to_attr_s(_d)])))
+
+    edges = set()
     for i, f in g.edges():
+        i, f = node_ids.get(i, i), node_ids.get(f, f)
         s = ' -> ' .join([_to_s(i), _to_s(f)])
-        _add(_to_l(s))
+        if i != f and s not in edges:
+            edges.add(s)
+            _add(_to_l(s))
 
     _add("}")
     return "\n".join(outs)
@@ -203,7 +348,7 @@ def to_binding_graph_summary(bg):
     _add("Task Summary {n} tasks ({s})".format(n=len(bg.task_nodes()), s=str(tn_s)))
     _add_sp()
 
-    sorted_nodes = nx.topological_sort(bg)
+    sorted_nodes = bg.topological_sort()
 
     _add(" ".join(["resolved inputs".ljust(20), "resolved outputs".ljust(20), "state".ljust(12), "NodeType".ljust(30), "N inputs".ljust(12), "N outputs".ljust(12), "run time".ljust(12), "Id".ljust(60), ]))
     _add_sp()
@@ -97,11 +97,18 @@ class ConstantsNodes(object):
 
 class _NodeLike(object):
 
-    """Base Graph Node type"""
+    """Base Graph Node type
+
+    Nodes are created per task and per file (and per chunk), the node classes
+    use __slots__ to keep the memory footprint of large graphs down.
+    """
+    __slots__ = ()
     NODE_ATTRS = {}
 
 
 class _NodeEqualityMixin(object):
+    # Cached hash of the node id
+    __slots__ = ('_hash', )
 
     @property
     def ix(self):
@@ -116,9 +123,17 @@ class _NodeEqualityMixin(object):
         return "{k} ix:{i}".format(k=self.__class__.__name__, i=self.ix)
 
     def __hash__(self):
-        return hash(self.ix)
+        # The node id is immutable and nodes are hashed for every graph
+        # access, compute the hash once.
+        try:
+            return self._hash
+        except AttributeError:
+            self._hash = hash(self.ix)
+            return self._hash
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if isinstance(other, self.__class__):
             if self.ix == other.ix:
                 return True
@@ -129,11 +144,13 @@ class _NodeEqualityMixin(object):
 
 
 class _DotAbleMixin(object):
+    __slots__ = ()
     DOT_SHAPE = DotShapeConstants.ELLIPSE
     DOT_COLOR = DotColorConstants.WHITE
 
 
 class _FileLike(_NodeLike):
+    __slots__ = ()
     # Attributes initialized at the graph level
     NODE_ATTRS = {ConstantsNodes.FILE_ATTR_IS_RESOLVED: False,
                   ConstantsNodes.FILE_ATTR_PATH: None,
@@ -151,6 +168,7 @@ class _TaskLike(_NodeLike):
     scatter/chunking are sloppy equivalents
     All of the chunked
     """
+    __slots__ = ()
     NODE_ATTRS = {ConstantsNodes.TASK_ATTR_STATE: TaskStates.CREATED,
                   ConstantsNodes.TASK_ATTR_ROPTS: {},
                   ConstantsNodes.TASK_ATTR_NPROC: 1,
@@ -171,12 +189,14 @@ class _TaskLike(_NodeLike):
 
 class _ChunkLike(object):
     # Must have self.chunk_id
+    __slots__ = ()
     pass
 
 
 class EntryPointNode(_NodeEqualityMixin, _DotAbleMixin, _TaskLike):
     # this is like a Task
     # This abstraction needs to be deleted
+    __slots__ = ('_idx', 'file_klass', 'instance_id')
     NODE_ATTRS = {ConstantsNodes.FILE_ATTR_IS_RESOLVED: False,
                   ConstantsNodes.FILE_ATTR_PATH: None,
                   ConstantsNodes.TASK_ATTR_RUN_TIME: 1}
@@ -215,6 +235,7 @@ class EntryPointNode(_NodeEqualityMixin, _DotAbleMixin, _TaskLike):
 class TaskBindingNode(_NodeEqualityMixin, _DotAbleMixin, _TaskLike):
 
     """ Standard base Task Node """
+    __slots__ = ('meta_task', 'instance_id', 'display_name')
     DOT_COLOR = DotColorConstants.AQUA
     DOT_SHAPE = DotShapeConstants.OCTAGON
 
@@ -251,6 +272,7 @@ class TaskBindingNode(_NodeEqualityMixin, _DotAbleMixin, _TaskLike):
 class TaskChunkedBindingNode(TaskBindingNode):
 
     """Chunked "instances" of a Task node, must have chunk_id"""
+    __slots__ = ('operator_id', 'chunk_id', 'chunk_group_id')
 
     DOT_SHAPE = DotShapeConstants.TRIPLE_OCTAGON
     DOT_COLOR = DotColorConstants.AQUA_DARK
@@ -277,6 +299,7 @@ class TaskScatterBindingNode(TaskBindingNode):
 
     This will have a 'companion' task that shares the same input file type signature
     """
+    __slots__ = ('original_task_id', 'original_nid', 'chunk_group_id')
 
     DOT_SHAPE = DotShapeConstants.OCTAGON
     DOT_COLOR = DotColorConstants.ORANGE
@@ -302,6 +325,7 @@ class TaskGatherBindingNode(TaskBindingNode):
     """Gathered Task node. Consumes a gathered chunk.json and emits a single
     file type
     """
+    __slots__ = ('chunk_key', )
     DOT_SHAPE = DotShapeConstants.OCTAGON
     DOT_COLOR = DotColorConstants.GREY
 
@@ -319,6 +343,7 @@ class TaskGatherBindingNode(TaskBindingNode):
 
 
 class _BindingFileNode(_NodeEqualityMixin, _DotAbleMixin, _FileLike):
+    __slots__ = ('meta_task', 'instance_id', 'index', 'file_klass', 'task_instance_id')
     # Grab from meta task
     ATTR_NAME = "input_types"
     # Used as a label in dot
@@ -378,6 +403,7 @@ class _BindingFileNode(_NodeEqualityMixin, _DotAbleMixin, _FileLike):
 
 
 class BindingInFileNode(_BindingFileNode):
+    __slots__ = ()
     DIRECTION = "in"
     # Grab from meta task
     ATTR_NAME = "input_types"
@@ -391,6 +417,7 @@ class BindingChunkInFileNode(BindingInFileNode):
 
     This should always be generated from a Chunk.json
     """
+    __slots__ = ('chunk_id', 'chunk_group_id')
 
     def __init__(self, meta_task, instance_id, index, file_type_instance, chunk_id, chunk_group_id):
         super(BindingChunkInFileNode, self).__init__(meta_task, instance_id, index, file_type_instance)
@@ -399,6 +426,7 @@ class BindingChunkInFileNode(BindingInFileNode):
 
 
 class BindingOutFileNode(_BindingFileNode):
+    __slots__ = ()
     DIRECTION = "out"
     ATTR_NAME = "output_types"
 
@@ -406,6 +434,7 @@ class BindingOutFileNode(_BindingFileNode):
 
 
 class BindingChunkOutFileNode(BindingOutFileNode):
+    __slots__ = ('chunk_id', 'chunk_group_id')
 
     def __init__(self, meta_task, instance_id, index, file_type_instance, chunk_id, chunk_group_id):
         super(BindingChunkOutFileNode, self).__init__(meta_task, instance_id, index, file_type_instance)
@@ -414,6 +443,7 @@ class BindingChunkOutFileNode(BindingOutFileNode):
 
 
 class EntryOutBindingFileNode(_NodeEqualityMixin, _DotAbleMixin, _FileLike):
+    __slots__ = ('entry_id', 'file_klass', 'instance_id', 'index', 'direction')
     DOT_SHAPE = DotShapeConstants.RECTANGLE
     DOT_COLOR = DotColorConstants.WHITE
 
@@ -0,0 +1,321 @@
+"""Compact storage of the BindingsGraph node attributes
+
+Each node of a networkx graph has a node attribute dict. After chunking,
+the BindingsGraph can have 100k+ nodes, hence 100k+ dicts of ~15 items.
+
+NodeStateStore is used as the node attribute container (i.e., g.node) of the
+BindingsGraph. Each node is assigned an integer id and the frequently used
+attributes are stored in columns indexed by the node id (arrays for the
+low cardinality values, e.g., the task state, and float values, lists for
+the object values). The values that are identical to the node class default
+(NODE_ATTRS) are not stored per node. Everything else is stored in a sparse
+per node dict.
+
+g.node[n] returns a NodeAttrs instance which behaves like the original
+node attribute dict (e.g., g.node[n]['state'] = TaskStates.RUNNING)
+"""
+import array
+import copy
+import logging
+from collections import MutableMapping
+
+from pbsmrtpipe.graph.models import ConstantsNodes
+
+log = logging.getLogger(__name__)
+
+# Value of a missing attribute
+_MISSING = object()
+
+
+class _CodedColumn(object):
+
+    """Low cardinality values (e.g., task state, bool) stored as int codes
+
+    At most 127 distinct values are supported, set will return False for
+    new values after that.
+    """
+    __slots__ = ('_codes', '_values', '_value_to_code')
+
+    MAX_CODES = 127
+
+    def __init__(self):
+        self._codes = array.array('b')
+        self._values = []
+        # the type is part of the key to keep True, 1 and 1.0 separate
+        self._value_to_code = {}
+
+    def append(self):
+        self._codes.append(-1)
+
+    def get(self, i):
+        code = self._codes[i]
+        return _MISSING if code < 0 else self._values[code]
+
+    def set(self, i, value):
+        try:
+            key = (value.__class__, value)
+            code = self._value_to_code.get(key)
+        except TypeError:
+            # unhashable
+            return False
+        if code is None:
+            if len(self._values) >= self.MAX_CODES:
+                return False
+            code = len(self._values)
+            self._values.append(value)
+            self._value_to_code[key] = code
+        self._codes[i] = code
+        return True
+
+    def delete(self, i):
+        self._codes[i] = -1
+
+
+class _FloatColumn(object):
+
+    """Float values (e.g., run time). Other types are not supported."""
+    __slots__ = ('_values', '_is_set')
+
+    def __init__(self):
+        self._values = array.array('d')
+        self._is_set = bytearray()
+
+    def append(self):
+        self._values.append(0.0)
+        self._is_set.append(0)
+
+    def get(self, i):
+        return self._values[i] if self._is_set[i] else _MISSING
+
+    def set(self, i, value):
+        if value.__class__ is not float:
+            return False
+        self._values[i] = value
+        self._is_set[i] = 1
+        return True
+
+    def delete(self, i):
+        self._values[i] = 0.0
+        self._is_set[i] = 0
+
+
+class _ObjectColumn(object):
+
+    """Any python object (e.g., path, datetime)"""
+    __slots__ = ('_values', )
+
+    def __init__(self):
+        self._values = []
+
+    def append(self):
+        self._values.append(_MISSING)
+
+    def get(self, i):
+        return self._values[i]
+
+    def set(self, i, value):
+        self._values[i] = value
+        return True
+
+    def delete(self, i):
+        self._values[i] = _MISSING
+
+
+def _to_columns():
+    c = ConstantsNodes
+    d = {}
+    for name in (c.TASK_ATTR_STATE, c.TASK_ATTR_NPROC,
+                 c.TASK_ATTR_IS_CHUNKABLE, c.TASK_ATTR_WAS_CHUNKED,
+                 c.TASK_ATTR_WAS_GATHERED, c.FILE_ATTR_IS_RESOLVED):
+        d[name] = _CodedColumn()
+    d[c.TASK_ATTR_RUN_TIME] = _FloatColumn()
+    for name in (c.FILE_ATTR_PATH, c.FILE_ATTR_RESOLVED_AT,
+                 c.TASK_ATTR_CREATED_AT, c.TASK_ATTR_UPDATED_AT, 'task'):
+        d[name] = _ObjectColumn()
+    return d
+
+
+class NodeAttrs(MutableMapping):
+
+    """Node attribute dict-like view of a node in the NodeStateStore"""
+    __slots__ = ('_store', '_node', '_nid')
+
+    def __init__(self, store, node, nid):
+        self._store = store
+        self._node = node
+        self._nid = nid
+
+    def __getitem__(self, key):
+        value = self._store._get_attr(self._node, self._nid, key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        value = self._store._get_attr(self._node, self._nid, key)
+        return default if value is _MISSING else value
+
+    def __contains__(self, key):
+        return self._store._get_attr(self._node, self._nid, key) is not _MISSING
+
+    def __setitem__(self, key, value):
+        store = self._store
+        store._set_attr(self._node, self._nid, key, value)
+        if store.listener is not None and key in store.listener_keys:
+            store.listener(self._node, key)
+
+    def __delitem__(self, key):
+        if not self._store._delete_attr(self._node, self._nid, key):
+            raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._store._get_keys(self._node, self._nid))
+
+    def __len__(self):
+        return len(self._store._get_keys(self._node, self._nid))
+
+    def copy(self):
+        return dict(self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class NodeStateStore(MutableMapping):
+
+    """Node to node attributes container. Used as the networkx node dict.
+
+    listener(node, key) is called when one of the listener_keys attributes
+    is set on a NodeAttrs. Setting the attributes of a new node, store[node] =
+    {}, does not call the listener.
+    """
+
+    def __init__(self, listener=None, listener_keys=()):
+        # {node: int node id}
+        self._ids = {}
+        self._free_ids = []
+        self._nids = 0
+        self._columns = _to_columns()
+        # node id -> frozenset of the keys set to the node class default
+        self._default_keys = []
+        # interned frozenset(s) of the default keys
+        self._default_keysets = {frozenset(): frozenset()}
+        # {node id: {key: value}} of the values that are not stored in a
+        # column or are not the node class default
+        self._extras = {}
+        self.listener = listener
+        self.listener_keys = frozenset(listener_keys)
+
+    def _to_nid(self):
+        if self._free_ids:
+            return self._free_ids.pop()
+        nid = self._nids
+        self._nids += 1
+        for column in self._columns.itervalues():
+            column.append()
+        self._default_keys.append(frozenset())
+        return nid
+
+    def _intern_keys(self, keys):
+        keys = frozenset(keys)
+        return self._default_keysets.setdefault(keys, keys)
+
+    @staticmethod
+    def _get_node_default(node, key):
+        return getattr(node, 'NODE_ATTRS', {}).get(key, _MISSING)
+
+    def _get_attr(self, node, nid, key):
+        column = self._columns.get(key)
+        if column is not None:
+            value = column.get(nid)
+            if value is not _MISSING:
+                return value
+        extras = self._extras.get(nid)
+        if extras is not None and key in extras:
+            return extras[key]
+        if key in self._default_keys[nid]:
+            return self._get_node_default(node, key)
+        return _MISSING
+
+    def _set_attr(self, node, nid, key, value):
+        # remove the previous value
+        self._delete_attr(node, nid, key)
+
+        column = self._columns.get(key)
+        if column is not None and column.set(nid, value):
+            return
+        if column is None and value is self._get_node_default(node, key):
+            self._default_keys[nid] = self._intern_keys(self._default_keys[nid] | {key})
+            return
+        self._extras.setdefault(nid, {})[key] = value
+
+    def _delete_attr(self, node, nid, key):
+        was_deleted = False
+        column = self._columns.get(key)
+        if column is not None and column.get(nid) is not _MISSING:
+            column.delete(nid)
+            was_deleted = True
+        extras = self._extras.get(nid)
+        if extras is not None and key in extras:
+            del extras[key]
+            if not extras:
+                del self._extras[nid]
+            was_deleted = True
+        if key in self._default_keys[nid]:
+            self._default_keys[nid] = self._intern_keys(self._default_keys[nid] - {key})
+            was_deleted = True
+        return was_deleted
+
+    def _get_keys(self, node, nid):
+        keys = [key for key, column in self._columns.iteritems() if column.get(nid) is not _MISSING]
+        keys.extend(self._extras.get(nid, ()))
+        keys.extend(self._default_keys[nid])
+        return keys
+
+    def _clear_attrs(self, node, nid):
+        for column in self._columns.itervalues():
+            column.delete(nid)
+        self._extras.pop(nid, None)
+        self._default_keys[nid] = frozenset()
+
+    def __getitem__(self, node):
+        return NodeAttrs(self, node, self._ids[node])
+
+    def __setitem__(self, node, attrs):
+        nid = self._ids.get(node)
+        if nid is None:
+            nid = self._to_nid()
+            self._ids[node] = nid
+        else:
+            self._clear_attrs(node, nid)
+        for key, value in attrs.iteritems():
+            self._set_attr(node, nid, key, value)
+
+    def __delitem__(self, node):
+        nid = self._ids.pop(node)
+        self._clear_attrs(node, nid)
+        self._free_ids.append(nid)
+
+    def __contains__(self, node):
+        return node in self._ids
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def clear(self):
+        # Keep the listener
+        self.__init__(listener=self.listener, listener_keys=self.listener_keys)
+
+    def __deepcopy__(self, memo):
+        # The listener is specific to the graph, it's not copied. (See
+        # BindingsGraph.__deepcopy__)
+        other = self.__class__()
+        for node, attrs in self.iteritems():
+            other[node] = copy.deepcopy(dict(attrs), memo)
+        return other
+
+    def __repr__(self):
+        return "<{k} nodes:{n} >".format(k=self.__class__.__name__, n=len(self))
@@ -13,6 +13,7 @@ from pbcommand.models.common import REGISTERED_FILE_TYPES, to_workflow_option_ns
 
 import pbsmrtpipe
 from pbsmrtpipe.constants import RESOLVED_TOOL_CONTRACT_JSON
+import pbsmrtpipe.constants as GlobalConstants
 from pbsmrtpipe.exceptions import (MalformedChunkOperatorError)
 
 log = logging.getLogger(__name__)
@@ -164,22 +165,29 @@ class TaskStates(object):
     # chunked tasks were created.
     SCATTERED = 'scattered'
 
+    # These are used in the inner loops of the graph, create the
+    # tuples once
+    _ALL_STATES = (CREATED, READY, SUBMITTED, RUNNING,
+                   SUCCESSFUL, FAILED, SCATTERED, KILLED)
+    _COMPLETED_STATES = (SUCCESSFUL, FAILED, KILLED, SCATTERED)
+    _RUNNABLE_STATES = (CREATED, READY)
+    _FAILURE_STATES = (FAILED, KILLED)
+
     @classmethod
     def ALL_STATES(cls):
-        return (cls.CREATED, cls.READY, cls.SUBMITTED, cls.RUNNING,
-                cls.SUCCESSFUL, cls.FAILED, cls.SCATTERED, cls.KILLED)
+        return cls._ALL_STATES
 
     @classmethod
     def COMPLETED_STATES(cls):
-        return cls.SUCCESSFUL, cls.FAILED, cls.KILLED, cls.SCATTERED
+        return cls._COMPLETED_STATES
 
     @classmethod
     def RUNNABLE_STATES(cls):
-        return cls.CREATED, cls.READY
+        return cls._RUNNABLE_STATES
 
     @classmethod
     def FAILURE_STATES(cls):
-        return cls.FAILED, cls.KILLED
+        return cls._FAILURE_STATES
 
     @staticmethod
     def from_int(i):
@@ -773,6 +781,16 @@ class WorkflowLevelOptions(collections.Sized):
                   'max_nproc': to_workflow_option_ns('max_nproc'),
                   'total_max_nproc': to_workflow_option_ns("max_total_nproc"),
                   'max_nworkers': to_workflow_option_ns('max_nworkers'),
+                  'scheduler': to_workflow_option_ns('scheduler'),
+                  'scheduler_run_times_job_dir': to_workflow_option_ns('scheduler_run_times_job_dir'),
+                  'max_npilots': to_workflow_option_ns('max_npilots'),
+                  'pilot_mode': to_workflow_option_ns('pilot_mode'),
+                  'max_nfused_tasks': to_workflow_option_ns('max_nfused_tasks'),
+                  'backfill_max_wait': to_workflow_option_ns('backfill_max_wait'),
+                  'max_ninprocess_workers': to_workflow_option_ns('max_ninprocess_workers'),
+                  'inprocess_task_ids': to_workflow_option_ns('inprocess_task_ids'),
+                  'max_ninline_workers': to_workflow_option_ns('max_ninline_workers'),
+                  'max_task_log_size': to_workflow_option_ns('max_task_log_size'),
                   "distributed_mode": to_workflow_option_ns("distributed_mode"),
                   "cluster_manager_path": to_workflow_option_ns("cluster_manager"),
                   "tmp_dir": to_workflow_option_ns("tmp_dir"),
@@ -783,7 +801,17 @@ class WorkflowLevelOptions(collections.Sized):
     def __init__(self, chunk_mode, max_nchunks, max_nproc, total_max_nproc, max_nworkers,
                  distributed_mode, cluster_manager_path, tmp_dir,
                  progress_status_url, exit_on_failure, debug_mode,
-                 system_message=None):
+                 system_message=None,
+                 scheduler=GlobalConstants.SCHEDULER,
+                 scheduler_run_times_job_dir=GlobalConstants.SCHEDULER_RUN_TIMES_JOB_DIR,
+                 max_npilots=GlobalConstants.MAX_NPILOTS,
+                 pilot_mode=GlobalConstants.PILOT_MODE,
+                 max_nfused_tasks=GlobalConstants.MAX_NFUSED_TASKS,
+                 max_task_log_size=GlobalConstants.MAX_TASK_LOG_SIZE,
+                 max_ninprocess_workers=GlobalConstants.MAX_NINPROCESS_WORKERS,
+                 inprocess_task_ids=GlobalConstants.INPROCESS_TASK_IDS,
+                 max_ninline_workers=GlobalConstants.MAX_NINLINE_WORKERS,
+                 backfill_max_wait=GlobalConstants.BACKFILL_MAX_WAIT):
         """ Container for the known workflow options"""
         self.chunk_mode = chunk_mode
         self.max_nchunks = max_nchunks
@@ -801,6 +829,23 @@ class WorkflowLevelOptions(collections.Sized):
         # XXX hack to facilitate displaying runtime information such as
         # sys.argv in pbsmrtpipe.log
         self.system_message = system_message
+        # Order the runnable tasks are submitted in (see SCHEDULERS)
+        self.scheduler = scheduler
+        self.scheduler_run_times_job_dir = scheduler_run_times_job_dir
+        # Run the distributed tasks in long-lived pilot workers
+        self.max_npilots = max_npilots
+        self.pilot_mode = pilot_mode
+        # Run linear chains of distributed tasks as a single job
+        self.max_nfused_tasks = max_nfused_tasks
+        # Rotate the task stdout/stderr files larger than this (MB)
+        self.max_task_log_size = max_task_log_size
+        # Run the (opted-in) Python tool contract tasks in pre-warmed workers
+        self.max_ninprocess_workers = max_ninprocess_workers
+        self.inprocess_task_ids = inprocess_task_ids
+        # Run the lightweight scatter and gather tasks in driver threads
+        self.max_ninline_workers = max_ninline_workers
+        # Max time (sec) smaller tasks are backfilled while a task is waiting
+        self.backfill_max_wait = backfill_max_wait
 
     @staticmethod
     def from_defaults():
@@ -121,6 +121,16 @@ def default_to_ropts(user_opts, pacbio_options_list):
     return ropts
 
 
+def resolve_nproc(meta_task, max_nproc):
+    """Resolve the nproc of the task (same as the Task created by meta_task_to_task)"""
+    if meta_task.nproc == SymbolTypes.MAX_NPROC:
+        return max_nproc
+    elif isinstance(meta_task.nproc, int):
+        return min(meta_task.nproc, max_nproc)
+    else:
+        return 1
+
+
 def meta_task_to_task(meta_task,
                       input_files,
                       all_task_options,
@@ -162,14 +172,6 @@ def meta_task_to_task(meta_task,
     # filter the opts with only the options that in the opts schema
     user_opts = {k: v for k, v in all_task_options.iteritems() if k in meta_task.option_schemas}
 
-    def _default_resolve_nproc():
-        if meta_task.nproc == SymbolTypes.MAX_NPROC:
-            return max_nproc
-        elif isinstance(meta_task.nproc, int):
-            return min(meta_task.nproc, max_nproc)
-        else:
-            return 1
-
     def _default_task_type():
         return meta_task.is_distributed
 
@@ -188,7 +190,7 @@ def meta_task_to_task(meta_task,
 
     r_nchunks = _default_nchunks()
     r_task_options = default_to_ropts(user_opts, meta_task.option_schemas)
-    r_nproc = _default_resolve_nproc()
+    r_nproc = resolve_nproc(meta_task, max_nproc)
 
     # Resolve Resources
     rfiles = to_resources_func(meta_task.resource_types)
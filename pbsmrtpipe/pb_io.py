@@ -204,6 +204,91 @@ def _get_workflow_option_schema():
                                "Max Number of concurrently running tasks. (Note:  max_nproc will restrict the number of workers if max_nworkers * max_nproc > max_total_nproc)", GlobalConstants.MAX_NWORKERS)
 
 
+@register_workflow_option
+def _get_scheduler_option_schema():
+    return OP.to_option_schema(_to_wopt_id("scheduler"), "string",
+                               "Task Scheduler",
+                               "Order runnable tasks are submitted in. '{f}' (order the tasks became runnable) or '{c}' "
+                               "(tasks with the longest estimated remaining critical path first)".format(f=GlobalConstants.SCHEDULER_FIFO, c=GlobalConstants.SCHEDULER_CRITICAL_PATH),
+                               GlobalConstants.SCHEDULER)
+
+
+@register_workflow_option
+def _get_scheduler_run_times_job_dir_schema():
+    return OP.to_option_schema(_to_wopt_id("scheduler_run_times_job_dir"), ("string", "null"),
+                               "Task Scheduler Run Times Job Dir",
+                               "Path to the job dir of a previous run. The task run times recorded in the task-report.json files "
+                               "are used by the '{c}' scheduler to estimate the critical path (otherwise a static weight per task is used)".format(c=GlobalConstants.SCHEDULER_CRITICAL_PATH),
+                               GlobalConstants.SCHEDULER_RUN_TIMES_JOB_DIR)
+
+
+@register_workflow_option
+def _get_max_npilots_schema():
+    return OP.to_option_schema(_to_wopt_id("max_npilots"), "integer",
+                               "Max Number of Pilot Workers",
+                               "Max Number of long-lived pilot workers that run the distributed tasks back-to-back "
+                               "to amortize the cluster queue latency across many short tasks (0 disables the pilot mode)", GlobalConstants.MAX_NPILOTS)
+
+
+@register_workflow_option
+def _get_pilot_mode_schema():
+    return OP.to_option_schema(_to_wopt_id("pilot_mode"), "string",
+                               "Pilot Worker Mode",
+                               "'{c}' (submit the pilot workers through the cluster templates) or '{l}' "
+                               "(run the pilot workers as local processes)".format(c=GlobalConstants.PILOT_MODE_CLUSTER, l=GlobalConstants.PILOT_MODE_LOCAL),
+                               GlobalConstants.PILOT_MODE)
+
+
+@register_workflow_option
+def _get_backfill_max_wait_schema():
+    return OP.to_option_schema(_to_wopt_id("backfill_max_wait"), "integer",
+                               "Max Backfill Wait",
+                               "Max time (sec) smaller tasks are started while a task is waiting for enough free "
+                               "processors (see max_total_nproc). After this, no new tasks are started until the waiting task can run", GlobalConstants.BACKFILL_MAX_WAIT)
+
+
+@register_workflow_option
+def _get_max_nfused_tasks_schema():
+    return OP.to_option_schema(_to_wopt_id("max_nfused_tasks"), "integer",
+                               "Max Number of Fused Tasks",
+                               "Max Number of tasks of a linear chain of distributed tasks (each task only depends on the outputs "
+                               "of the previous task) that are submitted as a single cluster job and run in sequence (1 disables the task fusion)", GlobalConstants.MAX_NFUSED_TASKS)
+
+
+@register_workflow_option
+def _get_max_ninprocess_workers_schema():
+    return OP.to_option_schema(_to_wopt_id("max_ninprocess_workers"), "integer",
+                               "Max Number of In-Process Workers",
+                               "Max Number of pre-warmed local workers that run the Python tool contract tasks "
+                               "(see inprocess_task_ids) in processes forked from the worker, without starting "
+                               "a new interpreter (0 disables the in-process mode)", GlobalConstants.MAX_NINPROCESS_WORKERS)
+
+
+@register_workflow_option
+def _get_inprocess_task_ids_schema():
+    return OP.to_option_schema(_to_wopt_id("inprocess_task_ids"), "string",
+                               "In-Process Task Ids",
+                               "Comma separated list of the Python tool contract ids (e.g., pbsmrtpipe.tasks.dev_txt_to_fasta) "
+                               "that are run by the in-process workers", GlobalConstants.INPROCESS_TASK_IDS)
+
+
+@register_workflow_option
+def _get_max_ninline_workers_schema():
+    return OP.to_option_schema(_to_wopt_id("max_ninline_workers"), "integer",
+                               "Max Number of Inline Workers",
+                               "Max Number of driver threads that run the lightweight scatter and gather tasks "
+                               "(tool contracts that are not distributed and use a single proc) without "
+                               "a task runner process (0 disables the inline mode)", GlobalConstants.MAX_NINLINE_WORKERS)
+
+
+@register_workflow_option
+def _get_max_task_log_size_schema():
+    return OP.to_option_schema(_to_wopt_id("max_task_log_size"), "integer",
+                               "Max Task Log Size (MB)",
+                               "Max size (MB) of the stdout and stderr files of a task. Larger files are rotated "
+                               "and gzip'ed (0 disables the rotation)", GlobalConstants.MAX_TASK_LOG_SIZE)
+
+
 @register_workflow_option
 def _get_chunked_mode_schema():
     return OP.to_option_schema(_to_wopt_id("chunk_mode"), "boolean",
@@ -281,6 +366,38 @@ def validate_or_modify_workflow_level_options(wopts):
         slog.warn("distribute_mode is False, Disabling cluster manager, running in LOCAL ONLY mode.")
         wopts.cluster_manager_path = None
 
+    if wopts.scheduler not in GlobalConstants.SCHEDULERS:
+        raise ValueError("Invalid scheduler '{s}'. Supported schedulers {x}".format(s=wopts.scheduler, x=GlobalConstants.SCHEDULERS))
+
+    if wopts.scheduler_run_times_job_dir is not None:
+        if not os.path.isdir(wopts.scheduler_run_times_job_dir):
+            raise IOError("Unable to find scheduler run times job dir '{d}'".format(d=wopts.scheduler_run_times_job_dir))
+
+    if wopts.max_npilots < 0:
+        raise ValueError("Max number of pilots ({n}) must be >= 0".format(n=wopts.max_npilots))
+
+    if wopts.pilot_mode not in GlobalConstants.PILOT_MODES:
+        raise ValueError("Invalid pilot mode '{s}'. Supported pilot modes {x}".format(s=wopts.pilot_mode, x=GlobalConstants.PILOT_MODES))
+
+    if wopts.backfill_max_wait < 0:
+        raise ValueError("Max backfill wait ({n}) must be >= 0".format(n=wopts.backfill_max_wait))
+
+    if wopts.max_nfused_tasks < 1:
+        raise ValueError("Max number of fused tasks ({n}) must be >= 1".format(n=wopts.max_nfused_tasks))
+
+    if wopts.max_ninprocess_workers < 0:
+        raise ValueError("Max number of in-process workers ({n}) must be >= 0".format(n=wopts.max_ninprocess_workers))
+
+    if wopts.max_ninline_workers < 0:
+        raise ValueError("Max number of inline workers ({n}) must be >= 0".format(n=wopts.max_ninline_workers))
+
+    if wopts.max_task_log_size < 0:
+        raise ValueError("Max task log size ({n}) must be >= 0".format(n=wopts.max_task_log_size))
+
+    if wopts.max_npilots > 0 and wopts.pilot_mode == GlobalConstants.PILOT_MODE_CLUSTER and not wopts.distributed_mode:
+        slog.warn("distributed_mode is False, Disabling cluster pilot workers.")
+        wopts.max_npilots = 0
+
     if wopts.total_max_nproc is not None:
         if wopts.max_nproc > wopts.total_max_nproc:
             raise ValueError("Max nproc ({x}) must be <= Total Max nproc ({t})".format(x=wopts.max_nproc, t=wopts.total_max_nproc))
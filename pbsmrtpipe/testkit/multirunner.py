@@ -24,6 +24,8 @@ __version__ = '0.1.0'
 log = logging.getLogger(__name__)
 
 _EXE = 'pbtestkit-runner'
+# Only the last lines of the (debug) output of each testkit job are kept
+_MAX_NLINES = 200
 
 
 def _testkit_cfg_fofn_to_files(butler_fofn, root_dir):
@@ -98,7 +100,7 @@ merge_nunit_results = functools.partial(_merge_xml_results, "Nunit",
 def _run_testkit_cfg(testkit_cfg, debug=False, misc_opts=""):
     os.chdir(os.path.dirname(testkit_cfg))
     cmd = "{e} --debug {m} {c}".format(c=testkit_cfg, e=_EXE, m=misc_opts)
-    rcode, stdout, stderr, run_time = backticks(cmd)
+    rcode, stdout, stderr, run_time = backticks(cmd, max_nlines=_MAX_NLINES)
 
     if debug:
         log.debug(" ".join([str(i) for i in [cmd, rcode, stdout, stderr]]))
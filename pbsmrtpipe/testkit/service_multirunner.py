@@ -32,6 +32,8 @@ class Constants(object):
     NPROC = 1
     MISC_OPTS = ""
     SLEEP_TIME = 4 # seconds
+    # Only the last lines of the output of each testkit job are kept
+    MAX_NLINES = 200
 
 
 # FIXME(nechols)(2016-01-22): this should use API calls, but I'd like to
@@ -44,7 +46,7 @@ def _run_testkit_cfg(testkit_cfg, debug=False, misc_opts=Constants.MISC_OPTS,
         e=Constants.EXE,
         m=misc_opts,
         t=sleep_time)
-    rcode, stdout, stderr, run_time = backticks(cmd)
+    rcode, stdout, stderr, run_time = backticks(cmd, max_nlines=Constants.MAX_NLINES)
     if debug:
         log.debug(" ".join([str(i) for i in [cmd, rcode, stdout, stderr]]))
     # Returning the butler cfg is a bit odd, but this is necessary for the
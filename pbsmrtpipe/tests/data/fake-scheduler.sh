@@ -0,0 +1,47 @@
+#!/bin/bash
+# Fake cluster scheduler to test the (non-blocking) cluster submission
+# without a cluster. The jobs are run in the background on the local host.
+#
+# fake-scheduler.sh submit <job-name> <stdout> <stderr> <script>
+#     Run the script and write the job id to stdout
+# fake-scheduler.sh status
+#     Write the ids of the active jobs to stdout
+# fake-scheduler.sh delete <job-name>
+#     Kill the job(s) by name
+set -o nounset
+
+state_dir=${FAKE_SCHEDULER_DIR:-${TMPDIR:-/tmp}/fake-scheduler-${USER:-$(id -u)}}
+mkdir -p "${state_dir}"
+
+case "$1" in
+    submit)
+        # the job removes the state file when it completes
+        setsid nohup bash -c 'bash "$0"; rcode=$?; rm -f "$1/$$"; exit ${rcode}' "$5" "${state_dir}" > "$3" 2> "$4" < /dev/null &
+        echo "$2" > "${state_dir}/$!"
+        echo "$!"
+        ;;
+    status)
+        for f in "${state_dir}"/*; do
+            [ -e "${f}" ] || continue
+            job_id=$(basename "${f}")
+            if kill -0 "${job_id}" 2> /dev/null; then
+                echo "${job_id}"
+            else
+                rm -f "${f}"
+            fi
+        done
+        ;;
+    delete)
+        for f in "${state_dir}"/*; do
+            [ -e "${f}" ] || continue
+            if [ "$(cat "${f}")" = "$2" ]; then
+                kill -- "-$(basename "${f}")" 2> /dev/null
+                rm -f "${f}"
+            fi
+        done
+        ;;
+    *)
+        echo "Unsupported command '$1'" 1>&2
+        exit 1
+        ;;
+esac
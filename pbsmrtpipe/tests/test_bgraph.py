@@ -1,3 +1,6 @@
+import copy
+import os
+import tempfile
 import unittest
 import logging
 
@@ -8,6 +11,7 @@ import pbsmrtpipe.loader
 RTASKS = pbsmrtpipe.loader.load_all_tool_contracts()
 
 import pbsmrtpipe.graph.bgraph as B
+import pbsmrtpipe.graph.bgraph_utils as BU
 import pbsmrtpipe.cluster as C
 import pbsmrtpipe.pb_io as IO
 
@@ -53,3 +57,348 @@ class TestConvertBindingStrToXml(unittest.TestCase):
         xml = B.binding_strs_to_xml(self.bs)
         log.info(str(xml))
         self.assertIsNotNone(xml)
+
+
+class TestBindingGraphReadyTasks(unittest.TestCase):
+
+    bindings = [("$entry:e_01", "pbsmrtpipe.tasks.dev_hello_world:0"),
+                ("pbsmrtpipe.tasks.dev_hello_world:0", "pbsmrtpipe.tasks.dev_hello_worlder:0")]
+
+    def setUp(self):
+        self.bg = B.binding_strs_to_binding_graph(RTASKS, self.bindings)
+
+    def _to_task_node(self, task_id):
+        return [t for t in self.bg.task_nodes() if t.idx == task_id][0]
+
+    def test_no_ready_tasks_before_entry_points(self):
+        self.assertIsNone(B.get_next_runnable_task(self.bg))
+        self.assertFalse(B.has_next_runnable_task(self.bg))
+
+    def test_workflow_stalled(self):
+        # the entry points are not resolved, no task can run
+        self.assertTrue(B.is_workflow_stalled(self.bg))
+        B.resolve_entry_points(self.bg, {"e_01": "/path/to/file.txt"})
+        self.assertFalse(B.is_workflow_stalled(self.bg))
+        t1 = self._to_task_node("pbsmrtpipe.tasks.dev_hello_world")
+        B.update_task_state(self.bg, t1, B.TaskStates.RUNNING)
+        self.assertFalse(B.has_next_runnable_task(self.bg))
+        self.assertFalse(B.is_workflow_stalled(self.bg))
+
+    def test_bulk_edge_updates(self):
+        B.resolve_entry_points(self.bg, {"e_01": "/path/to/file.txt"})
+        t1 = self._to_task_node("pbsmrtpipe.tasks.dev_hello_world")
+        in_edges = self.bg.in_edges(t1)
+        structure_version = self.bg.structure_version
+        self.bg.remove_edges_from(in_edges)
+        self.assertGreater(self.bg.structure_version, structure_version)
+        self.assertNotIn(t1, self.bg.ready_task_nodes())
+        self.bg.add_edges_from(in_edges)
+        self.assertIn(t1, self.bg.ready_task_nodes())
+
+    def test_deepcopy(self):
+        B.resolve_entry_points(self.bg, {"e_01": "/path/to/file.txt"})
+        bg = copy.deepcopy(self.bg)
+        t1 = [t for t in bg.task_nodes() if t.idx == "pbsmrtpipe.tasks.dev_hello_world"][0]
+        self.assertEqual(bg.ready_task_nodes(), [t1])
+        B.update_task_state(bg, t1, B.TaskStates.SUBMITTED)
+        self.assertEqual(bg.ready_task_nodes(), [])
+        self.assertEqual(len(self.bg.ready_task_nodes()), 1)
+        B.update_task_state_to_success(bg, t1, 1.0)
+        for fnode in bg.successors(t1):
+            B.update_file_state_to_resolved(bg, fnode, "/path/to/output.txt")
+        B.resolve_successor_binding_file_path(bg)
+        self.assertEqual([t.idx for t in bg.ready_task_nodes()], ["pbsmrtpipe.tasks.dev_hello_worlder"])
+
+    def test_chunkable_task_is_not_runnable(self):
+        B.resolve_entry_points(self.bg, {"e_01": "/path/to/file.txt"})
+        t1 = self._to_task_node("pbsmrtpipe.tasks.dev_hello_world")
+        self.bg.node[t1][B.ConstantsNodes.TASK_ATTR_IS_CHUNKABLE] = True
+        self.assertFalse(B.has_next_runnable_task(self.bg))
+
+    def test_ready_tasks_are_updated_by_state_transitions(self):
+        B.resolve_entry_points(self.bg, {"e_01": "/path/to/file.txt"})
+        t1 = self._to_task_node("pbsmrtpipe.tasks.dev_hello_world")
+        t2 = self._to_task_node("pbsmrtpipe.tasks.dev_hello_worlder")
+
+        self.assertEqual(B.get_next_runnable_task(self.bg), t1)
+
+        B.update_task_state(self.bg, t1, B.TaskStates.SUBMITTED)
+        self.assertIsNone(B.get_next_runnable_task(self.bg))
+        self.assertEqual(B.get_tasks_by_state(self.bg, B.TaskStates.SUBMITTED), {t1: B.TaskStates.SUBMITTED})
+
+        B.update_task_state_to_success(self.bg, t1, 1.0)
+        for fnode in self.bg.successors(t1):
+            B.update_file_state_to_resolved(self.bg, fnode, "/path/to/output.txt")
+        B.resolve_successor_binding_file_path(self.bg)
+
+        self.assertEqual(B.get_next_runnable_task(self.bg), t2)
+        # tuple of states are supported
+        self.assertIn(t1, B.get_tasks_by_state(self.bg, B.TaskStates.COMPLETED_STATES()))
+
+    def test_topological_sort_cache(self):
+        bg = B.binding_strs_to_binding_graph(RTASKS, _to_fan_out_bindings(3))
+        nodes = bg.topological_sort()
+        self.assertEqual(set(nodes), set(bg.nodes()))
+        self.assertEqual(bg.topological_sort(), nodes)
+        tnode = bg.task_nodes()[-1]
+        bg.remove_node(tnode)
+        self.assertNotIn(tnode, bg.topological_sort())
+
+    def test_state_version(self):
+        t1 = self._to_task_node("pbsmrtpipe.tasks.dev_hello_world")
+        structure_version, state_version = self.bg.structure_version, self.bg.state_version
+        B.update_task_state(self.bg, t1, B.TaskStates.SUBMITTED)
+        self.assertGreater(self.bg.state_version, state_version)
+        self.assertEqual(self.bg.structure_version, structure_version)
+
+    def test_state_listener(self):
+        events = []
+        self.bg.add_state_listener(lambda n, k, v: events.append((n, k, v)))
+        t1 = self._to_task_node("pbsmrtpipe.tasks.dev_hello_world")
+        B.update_task_state(self.bg, t1, B.TaskStates.SUBMITTED)
+        B.resolve_entry_points(self.bg, {"e_01": "/path/to/file.txt"})
+        self.assertEqual(events[0], (t1, "state", B.TaskStates.SUBMITTED))
+        self.assertIn("is_resolved", [k for _, k, _ in events])
+
+    def test_propagate_resolved_file_paths(self):
+        B.resolve_entry_points(self.bg, {"e_01": "/path/to/file.txt"})
+        t1 = self._to_task_node("pbsmrtpipe.tasks.dev_hello_world")
+        t2 = self._to_task_node("pbsmrtpipe.tasks.dev_hello_worlder")
+
+        output_file = "/path/to/output.txt"
+        for fnode in self.bg.successors(t1):
+            B.update_file_state_to_resolved(self.bg, fnode, output_file)
+
+        B.propagate_resolved_file_paths(self.bg, self.bg.successors(t1))
+        self.assertEqual(B.get_task_input_files(self.bg, t2), [output_file])
+        # nothing left to propagate
+        self.assertEqual(self.bg.pop_updated_file_nodes(), [])
+
+
+class TestFusibleTaskChain(unittest.TestCase):
+
+    # linear chain of distributed tasks
+    bindings = [("$entry:e_01", "pbcommand.tasks.dev_qhello_world:0"),
+                ("pbcommand.tasks.dev_qhello_world:0", "pbcommand.tasks.dev_qhello_world:1:0"),
+                ("pbcommand.tasks.dev_qhello_world:1:0", "pbcommand.tasks.dev_qhello_world:2:0")]
+
+    def _to_chain(self, bindings, max_ntasks=10):
+        bg = B.binding_strs_to_binding_graph(RTASKS, bindings)
+        B.resolve_entry_points(bg, {"e_01": "/path/to/file.fasta"})
+        tnode = B.get_next_runnable_task(bg)
+        B.update_task_state(bg, tnode, B.TaskStates.SUBMITTED)
+        return bg, B.get_fusible_task_chain(bg, tnode, max_ntasks)
+
+    def test_linear_chain(self):
+        bg, chain = self._to_chain(self.bindings)
+        self.assertEqual([t.instance_id for t in chain], [0, 1, 2])
+        _, chain = self._to_chain(self.bindings, max_ntasks=2)
+        self.assertEqual([t.instance_id for t in chain], [0, 1])
+
+    def test_fused_task_input_files(self):
+        bg, chain = self._to_chain(self.bindings)
+        output_file = "/path/to/output.fasta"
+        self.assertEqual(B.get_fused_task_input_files(bg, chain[1], [output_file]), [output_file])
+
+    def test_fan_out_is_not_fused(self):
+        bindings = self.bindings + [("pbcommand.tasks.dev_qhello_world:0", "pbcommand.tasks.dev_qhello_world:3:0")]
+        _, chain = self._to_chain(bindings)
+        self.assertEqual(len(chain), 1)
+
+    def test_non_distributed_tasks_are_not_fused(self):
+        _, chain = self._to_chain(TestBindingGraphReadyTasks.bindings)
+        self.assertEqual(len(chain), 1)
+
+
+class TestBindingGraphIntegrity(unittest.TestCase):
+
+    bindings = TestBindingGraphReadyTasks.bindings
+
+    def setUp(self):
+        self.bg = B.binding_strs_to_binding_graph(RTASKS, self.bindings)
+
+    def _to_malformed_graph(self):
+        # Bind the output of the first task to the input of the second task twice
+        t1 = [t for t in self.bg.task_nodes() if t.idx == "pbsmrtpipe.tasks.dev_hello_world"][0]
+        t2 = [t for t in self.bg.task_nodes() if t.idx == "pbsmrtpipe.tasks.dev_hello_worlder"][0]
+        out_node = self.bg.successors(t1)[0]
+        in_node = self.bg.predecessors(t2)[0]
+        other_out_node = self.bg.add_binding_out(t1.meta_task, 0, out_node.file_klass)
+        self.bg.add_edge(t1, other_out_node)
+        self.bg.add_edge(other_out_node, in_node)
+        return t2
+
+    def test_only_updated_task_nodes_are_validated(self):
+        # validated when the graph was created
+        self.assertEqual(self.bg.integrity_updated_task_nodes(), [])
+        t2 = self._to_malformed_graph()
+        self.assertIn(t2, self.bg.integrity_updated_task_nodes())
+        self.assertRaises(B.MalformedBindingGraphError, B.validate_binding_graph_integrity, self.bg)
+
+    def test_full_integrity_check(self):
+        self._to_malformed_graph()
+        self.bg.clear_integrity_updated_nodes()
+        # nothing to validate in the incremental mode
+        self.assertTrue(B.validate_binding_graph_integrity(self.bg))
+        self.bg.full_integrity_check = True
+        self.assertRaises(B.MalformedBindingGraphError, B.validate_binding_graph_integrity, self.bg)
+
+
+class TestNodeStateStore(unittest.TestCase):
+
+    bindings = TestBindingGraphReadyTasks.bindings
+
+    def setUp(self):
+        self.bg = B.binding_strs_to_binding_graph(RTASKS, self.bindings)
+        self.tnode = [t for t in self.bg.task_nodes() if t.idx == "pbsmrtpipe.tasks.dev_hello_world"][0]
+
+    def test_node_attrs(self):
+        attrs = self.bg.node[self.tnode]
+        self.assertEqual(attrs['state'], B.TaskStates.CREATED)
+        self.assertEqual(attrs['nproc'], 1)
+        self.assertIsNone(attrs['run_time'])
+        self.assertIsNone(attrs.get('task'))
+        self.assertNotIn('task', attrs)
+        self.assertEqual(set(attrs.keys()), set(self.tnode.NODE_ATTRS.keys()))
+
+    def test_update_node_attrs(self):
+        attrs = self.bg.node[self.tnode]
+        attrs['run_time'] = 1.5
+        attrs['nproc'] = 4
+        attrs['error_message'] = "Failed"
+        attrs['ropts'] = {'a': 1}
+        self.assertEqual(dict(self.bg.node[self.tnode])['run_time'], 1.5)
+        self.assertEqual(self.bg.node[self.tnode]['nproc'], 4)
+        self.assertEqual(self.bg.node[self.tnode]['error_message'], "Failed")
+        self.assertEqual(self.bg.node[self.tnode]['ropts'], {'a': 1})
+        # unchanged class default
+        self.assertEqual(self.bg.node[self.tnode]['cmds'], [])
+
+        # Types are preserved
+        attrs['run_time'] = 2
+        self.assertIsInstance(self.bg.node[self.tnode]['run_time'], int)
+        attrs['is_chunkable'] = 1
+        self.assertNotIsInstance(self.bg.node[self.tnode]['is_chunkable'], bool)
+
+        del attrs['error_message']
+        self.assertNotIn('error_message', self.bg.node[self.tnode])
+
+    def test_removed_node(self):
+        self.bg.remove_node(self.tnode)
+        self.assertNotIn(self.tnode, self.bg.node)
+        self.assertRaises(KeyError, lambda: self.bg.node[self.tnode])
+
+
+def _to_fan_out_bindings(ntasks):
+    """Entry point -> Task -> N instances of the same Task"""
+    b = [("$entry:e_01", "pbsmrtpipe.tasks.dev_hello_world:0")]
+    for i in xrange(1, ntasks + 1):
+        b.append(("pbsmrtpipe.tasks.dev_hello_world:0", "pbsmrtpipe.tasks.dev_hello_worlder:{i}:0".format(i=i)))
+    return b
+
+
+class TestBindingGraphStateCheckPerformance(unittest.TestCase):
+
+    """The state checks called by the driver on every iteration should use the
+    counts maintained by the graph and never scan the nodes. (See
+    pbsmrtpipe.tools.benchmark_bgraph for the timings)
+    """
+    NTASKS = 100
+    SCAN_METHODS = ('nodes', 'nodes_iter', 'topological_sort',
+                    '_get_nodes_by_klasses', '_get_sorted_nodes_by_klass',
+                    'all_task_type_nodes', 'file_nodes')
+
+    def setUp(self):
+        self.bg = B.binding_strs_to_binding_graph(RTASKS, _to_fan_out_bindings(self.NTASKS))
+        B.resolve_entry_points(self.bg, {"e_01": "/path/to/file.txt"})
+        self.scans = []
+
+        def _to_scan(name):
+            def _scan(*args, **kwargs):
+                self.scans.append(name)
+                raise AssertionError("Unexpected graph scan {n}".format(n=name))
+            return _scan
+
+        # shadow the methods on the instance
+        for name in self.SCAN_METHODS:
+            setattr(self.bg, name, _to_scan(name))
+
+    def tearDown(self):
+        for name in self.SCAN_METHODS:
+            delattr(self.bg, name)
+
+    def _test_check(self, func, expected):
+        self.assertEqual(func(self.bg), expected)
+        self.assertEqual(self.scans, [])
+
+    def test_is_workflow_complete(self):
+        self._test_check(B._is_workflow_complete, False)
+
+    def test_was_workflow_successful(self):
+        self._test_check(B.was_workflow_successful, False)
+
+    def test_has_next_runnable_task(self):
+        self._test_check(B.has_next_runnable_task, True)
+
+    def test_is_workflow_stalled(self):
+        self._test_check(B.is_workflow_stalled, False)
+
+    def test_has_task_in_states(self):
+        def has_task_in_runnable_states(bg):
+            return B.has_task_in_states(bg, B.TaskStates.RUNNABLE_STATES())
+        # the resolved entry point nodes are successful
+        self._test_check(has_task_in_runnable_states, True)
+
+
+class TestCriticalPathPrioritizer(unittest.TestCase):
+
+    # worlder-2 has a downstream task, worlder-1 doesn't
+    bindings = [("$entry:e_01", "pbsmrtpipe.tasks.dev_hello_world:0"),
+                ("pbsmrtpipe.tasks.dev_hello_world:0", "pbsmrtpipe.tasks.dev_hello_worlder:1:0"),
+                ("pbsmrtpipe.tasks.dev_hello_world:0", "pbsmrtpipe.tasks.dev_hello_worlder:2:0"),
+                ("pbsmrtpipe.tasks.dev_hello_worlder:2:0", "pbsmrtpipe.tasks.dev_hello_worlder:3:0")]
+
+    def setUp(self):
+        self.bg = B.binding_strs_to_binding_graph(RTASKS, self.bindings)
+        B.resolve_entry_points(self.bg, {"e_01": "/path/to/file.txt"})
+        t1 = B.get_next_runnable_task(self.bg)
+        B.update_task_state_to_success(self.bg, t1, 1.0)
+        for fnode in self.bg.successors(t1):
+            B.update_file_state_to_resolved(self.bg, fnode, "/path/to/output.txt")
+        B.resolve_successor_binding_file_path(self.bg)
+
+    def test_longest_remaining_critical_path_first(self):
+        self.assertEqual(len(self.bg.ready_task_nodes()), 2)
+        p = B.CriticalPathPrioritizer()
+        tnodes = p.get_runnable_tasks(self.bg)
+        self.assertEqual([t.instance_id for t in tnodes], [2, 1])
+        self.assertEqual(p.get_remaining_critical_path(self.bg, tnodes[0]), 2 * p.default_weight)
+        self.assertEqual(p.get_remaining_critical_path(self.bg, tnodes[1]), p.default_weight)
+
+    def test_ties_in_runnable_order(self):
+        # with a zero run time, the downstream task doesn't add to the critical path
+        p = B.CriticalPathPrioritizer({"pbsmrtpipe.tasks.dev_hello_worlder": 0.0})
+        tnodes = p.get_runnable_tasks(self.bg)
+        self.assertEqual(p.get_remaining_critical_path(self.bg, tnodes[0]),
+                         p.get_remaining_critical_path(self.bg, tnodes[1]))
+        self.assertEqual(tnodes, self.bg.ready_task_nodes())
+
+
+class TestBindingGraphImages(unittest.TestCase):
+
+    def setUp(self):
+        self.bg = B.binding_strs_to_binding_graph(RTASKS, _to_fan_out_bindings(10))
+        self.output_dir = tempfile.mkdtemp(suffix="-graph-images")
+
+    def test_max_image_nnodes(self):
+        dot_file = BU._write_dot_and_json(self.bg, self.output_dir, 0, 5)
+        self.assertIsNone(dot_file)
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, "workflow-graph.json")))
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, "workflow.dot")))
+
+    def test_write_dot(self):
+        dot_file = BU._write_dot_and_json(self.bg, self.output_dir, 1000, 1000)
+        self.assertTrue(os.path.exists(dot_file))
+
+    def test_collapse_without_chunks(self):
+        self.assertEqual(BU.binding_graph_to_dot(self.bg, collapse_chunks=True), BU.binding_graph_to_dot(self.bg))
@@ -62,6 +62,33 @@ class TestCluster(unittest.TestCase):
         log.info(s)
 
 
+class TestClusterArrayTemplates(unittest.TestCase):
+
+    def test_render_array_templates(self):
+        for name in ("sge", "slurm", "lsf", "pbs"):
+            renderer = C.load_installed_cluster_templates_by_name(name)
+            self.assertTrue(renderer.supports_array)
+            s = renderer.render_array("/path/to/array-task.sh", "c1234", 17, stdout="/path/to/stdout", stderr="/path/to/stderr", nproc=2)
+            log.info("Rendered cluster array for {n} '{s}'".format(n=name, s=s))
+            self.assertIn("17", s)
+            self.assertIn("/path/to/array-task.sh", s)
+
+    def test_render_submit_and_status_templates(self):
+        for name in ("sge", "slurm", "lsf", "pbs"):
+            renderer = C.load_installed_cluster_templates_by_name(name)
+            self.assertTrue(renderer.supports_async)
+            s = renderer.render(ClusterConstants.SUBMIT, "/path/to/cluster-run.sh", "c1234", stdout="/path/to/stdout", stderr="/path/to/stderr", nproc=2)
+            self.assertIn("/path/to/cluster-run.sh", s)
+            # the escaped $$ are rendered as $
+            self.assertNotIn("$$", renderer.render_status())
+
+    def test_no_array_template(self):
+        renderer = C.load_installed_cluster_templates_by_name("sge_pacbio")
+        self.assertFalse(renderer.supports_array)
+        with self.assertRaises(ValueError):
+            renderer.render_array("/path/to/array-task.sh", "c1234", 17)
+
+
 class TestValidateClusterTemplate(unittest.TestCase):
 
     def _test_validate_template_name_relative_path(self, name):
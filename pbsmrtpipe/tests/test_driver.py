@@ -1,6 +1,10 @@
 """This needs to be completely redone to use the DI model"""
 import logging
+import multiprocessing
+import os
 import pprint
+import tempfile
+import threading
 import unittest
 from collections import namedtuple
 
@@ -10,6 +14,7 @@ import time
 import pbsmrtpipe.driver as D
 import pbsmrtpipe.graph.bgraph as B
 from pbsmrtpipe.decos import timeit
+from pbsmrtpipe.exceptions import PipelineRuntimeKeyboardInterrupt
 from pbsmrtpipe.models import GlobalRegistry
 from pbsmrtpipe.pb_io import WorkflowLevelOptions
 from base import HAS_CLUSTER_QSUB, SLOW_ATTR
@@ -128,3 +133,183 @@ class MyTest(unittest.TestCase):
     def test_run_driver(self):
         state = _run_driver_from_job_config(self.JOB_CONFIG)
         self.assertTrue(state, "Job {n} failed".format(n=self.JOB_CONFIG.job_name))
+
+
+_FusedTask = namedtuple("_FusedTask", "nproc output_files")
+
+
+class TestFusedTaskChainResources(unittest.TestCase):
+
+    # linear chain of distributed tasks
+    bindings = [("$entry:e_01", "pbcommand.tasks.dev_qhello_world:0"),
+                ("pbcommand.tasks.dev_qhello_world:0", "pbcommand.tasks.dev_qhello_world:1:0"),
+                ("pbcommand.tasks.dev_qhello_world:1:0", "pbcommand.tasks.dev_qhello_world:2:0")]
+
+    nproc = 4
+
+    def setUp(self):
+        registered_tasks_d, _ = _get_registered_tasks_and_operators()
+        self.bg = B.binding_strs_to_binding_graph(registered_tasks_d, self.bindings)
+        B.resolve_entry_points(self.bg, {"e_01": "/path/to/file.txt"})
+        # {instance id: nproc} of the tasks that don't use self.nproc
+        self.nprocs = {}
+        self.created_instance_ids = []
+
+    def _to_nproc(self, tnode):
+        return self.nprocs.get(tnode.instance_id, self.nproc)
+
+    def _to_task(self, tnode, input_files=None):
+        self.created_instance_ids.append(tnode.instance_id)
+        output_files = ["/path/to/{i}-{n}.txt".format(i=tnode.instance_id, n=i) for i, _ in enumerate(self.bg.successors(tnode))]
+        return _FusedTask(self._to_nproc(tnode), output_files)
+
+    @staticmethod
+    def _to_tid(tnode):
+        return "-".join([tnode.meta_task.task_id, str(tnode.instance_id)])
+
+    def _submit_chain(self, slots):
+        # same as the submission in the driver loop
+        tnode = B.get_next_runnable_task(self.bg)
+        task = self._to_task(tnode)
+        self.assertTrue(slots.has_available_worker())
+        self.assertTrue(slots.has_available_nproc(task.nproc))
+        slots.reserve(self._to_tid(tnode), task.nproc)
+        B.update_task_state(self.bg, tnode, B.TaskStates.SUBMITTED)
+
+        chains, others = D._to_fused_task_chains(self.bg, [(tnode, task)], self._to_task, self._to_nproc, 10)
+        self.assertEqual(others, [])
+        self.assertEqual(len(chains), 1)
+        tids = [self._to_tid(t) for t, _ in chains[0]]
+        slots.add_chain(tids[0], tids[1:])
+        return chains[0], tids
+
+    def test_chain_uses_the_procs_of_the_head_task(self):
+        slots = D._ResourceSlots(1, max_total_nproc=self.nproc)
+        chain, tids = self._submit_chain(slots)
+        self.assertEqual(len(chain), 3)
+        for tnode, _ in chain:
+            self.assertEqual(self.bg.node[tnode]['state'], B.TaskStates.SUBMITTED)
+        self.assertEqual(slots.total_nproc, self.nproc)
+        self.assertFalse(slots.has_available_worker())
+
+        # released when the last task of the chain has completed
+        for tid in tids[:-1]:
+            slots.release(tid)
+            self.assertEqual(slots.total_nproc, self.nproc)
+        slots.release(tids[-1])
+        self.assertEqual(slots.total_nproc, 0)
+        self.assertTrue(slots.has_available_worker())
+
+    def test_chain_stops_at_different_nproc(self):
+        self.nprocs[2] = 1
+        slots = D._ResourceSlots(1, max_total_nproc=self.nproc)
+        chain, _ = self._submit_chain(slots)
+        self.assertEqual([t.instance_id for t, _ in chain], [0, 1])
+        # the Task (and task dir) of the task that isn't fused is not created
+        self.assertEqual(self.created_instance_ids, [0, 1])
+        tnode = [t for t in self.bg.task_nodes() if t.instance_id == 2][0]
+        self.assertEqual(self.bg.node[tnode]['state'], B.TaskStates.CREATED)
+
+    def test_failed_chain_task(self):
+        slots = D._ResourceSlots(1, max_total_nproc=self.nproc)
+        _, tids = self._submit_chain(slots)
+        slots.release(tids[0])
+        slots.release(tids[1], was_successful=False)
+        self.assertEqual(slots.total_nproc, 0)
+        self.assertEqual(slots.nworkers, 0)
+        # the failed result of the task that was not run
+        slots.release(tids[2], was_successful=False)
+        self.assertEqual(slots.total_nproc, 0)
+        self.assertEqual(slots.nworkers, 0)
+
+
+_MetaTask = namedtuple("_MetaTask", "task_id")
+_TaskNode = namedtuple("_TaskNode", "meta_task instance_id nproc")
+
+
+def _to_task_node(instance_id, nproc):
+    return _TaskNode(_MetaTask("pbsmrtpipe.tasks.dev_hello_world"), instance_id, nproc)
+
+
+class TestToSubmittableTasks(unittest.TestCase):
+
+    max_wait = 10
+
+    def setUp(self):
+        # 2 of the 4 procs are used by a running task
+        self.slots = D._ResourceSlots(10, max_total_nproc=4)
+        self.slots.reserve("running", 2)
+        self.wait = D._BackfillWait(self.max_wait)
+        self.large = _to_task_node(0, 4)
+        self.smalls = [_to_task_node(i, 1) for i in (1, 2)]
+
+    @staticmethod
+    def _to_task(tnode):
+        return _FusedTask(tnode.nproc, [])
+
+    def _submit(self, tnodes, now):
+        tnodes_tasks = D._to_submittable_tasks(tnodes, self.slots, self._to_task, self.wait, now=now)
+        return [tnode for tnode, _ in tnodes_tasks]
+
+    def test_backfill(self):
+        tnodes = self._submit([self.large] + self.smalls, 0)
+        self.assertEqual(tnodes, self.smalls)
+        self.assertEqual(self.slots.total_nproc, 4)
+        self.assertEqual(self.wait.tnode, self.large)
+        self.assertEqual(self.wait.started_at, 0)
+
+    def test_expired_wait(self):
+        self._submit([self.large, self.smalls[0]], 0)
+        self.slots.release(D._to_task_id(self.smalls[0]))
+        # once the wait has expired, only the waiting task can be submitted
+        self.assertEqual(self._submit([self.large, self.smalls[1]], self.max_wait + 1), [])
+        self.assertEqual(self.slots.total_nproc, 2)
+        self.slots.release("running")
+        self.assertEqual(self._submit([self.large, self.smalls[1]], self.max_wait + 2), [self.large])
+        self.assertIsNone(self.wait.tnode)
+
+    def test_reset_when_not_runnable(self):
+        self._submit([self.large], 0)
+        self.assertEqual(self.wait.tnode, self.large)
+        # e.g., the task was submitted in a fused chain
+        self.assertEqual(self._submit(self.smalls, self.max_wait + 1), self.smalls)
+        self.assertIsNone(self.wait.tnode)
+
+
+class TestGetTaskResults(unittest.TestCase):
+
+    def setUp(self):
+        self.q = multiprocessing.Queue()
+        self.term_file = os.path.join(tempfile.mkdtemp(suffix="-driver"), "terminate")
+
+    def _put_later(self, item, delay=0.1):
+        t = threading.Timer(delay, self.q.put, args=(item, ))
+        t.start()
+        return t
+
+    def test_timeout(self):
+        started_at = time.time()
+        self.assertEqual(D._get_task_results(self.q, 0.2, self.term_file, wakeup_interval=0.05), [])
+        self.assertGreaterEqual(time.time() - started_at, 0.2)
+
+    def test_blocks_until_result(self):
+        self._put_later("result")
+        self.assertEqual(D._get_task_results(self.q, 30, self.term_file, wakeup_interval=0.05), ["result"])
+
+    def test_drain_after_first_result(self):
+        for i in xrange(3):
+            self.q.put(i)
+        # wait for the queue feeder thread
+        time.sleep(0.2)
+        self.assertEqual(D._get_task_results(self.q, 30, self.term_file), [0, 1, 2])
+        self.assertEqual(D._get_task_results(self.q, 0, self.term_file), [])
+
+    def test_terminate_file(self):
+        open(self.term_file, 'w').close()
+        self.q.put("result")
+        self.assertRaises(PipelineRuntimeKeyboardInterrupt, D._get_task_results, self.q, 30, self.term_file)
+
+    def test_terminate_file_while_blocked(self):
+        t = threading.Timer(0.1, lambda: open(self.term_file, 'w').close())
+        t.start()
+        self.assertRaises(PipelineRuntimeKeyboardInterrupt, D._get_task_results, self.q, 30, self.term_file, 0.05)
@@ -0,0 +1,161 @@
+import json
+import logging
+import os
+import tempfile
+import unittest
+import uuid
+
+from pbcommand.models import DataStore, DataStoreFile, FileTypes
+
+from pbsmrtpipe.driver_utils import (DataStoreWriter, RateLimitedReportWriter,
+                                     WorkflowJournal, load_workflow_journal)
+from pbsmrtpipe.graph.models import ConstantsNodes
+
+log = logging.getLogger(__name__)
+
+
+def _to_ds_file(output_dir, i):
+    path = os.path.join(output_dir, "file-{i}.txt".format(i=i))
+    with open(path, 'w') as f:
+        f.write("file {i}".format(i=i))
+    return DataStoreFile(str(uuid.uuid4()), "pbsmrtpipe-out-{i}".format(i=i), FileTypes.TXT.file_type_id, path)
+
+
+class TestDataStoreWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp(suffix="-datastore")
+        self.json_path = os.path.join(self.output_dir, "datastore.json")
+        self.html_path = os.path.join(self.output_dir, "datastore.html")
+
+    def _load_nfiles(self):
+        with open(self.json_path) as f:
+            return len(json.load(f)['files'])
+
+    def _to_writer(self, **kwargs):
+        ds = DataStore([])
+        ds.write_json(self.json_path)
+        return DataStoreWriter(ds, self.json_path, self.html_path, **kwargs)
+
+    def test_batch_writes(self):
+        w = self._to_writer(write_interval=3600, max_nfiles=3, html_interval=3600)
+        w.add(_to_ds_file(self.output_dir, 0))
+        w.add(_to_ds_file(self.output_dir, 1))
+        self.assertEqual(self._load_nfiles(), 0)
+        w.add(_to_ds_file(self.output_dir, 2))
+        self.assertEqual(self._load_nfiles(), 3)
+
+    def test_html_interval(self):
+        w = self._to_writer(write_interval=0, max_nfiles=100, html_interval=3600)
+        # the first update is rendered immediately
+        w.add(_to_ds_file(self.output_dir, 0))
+        self.assertTrue(os.path.exists(self.html_path))
+        os.remove(self.html_path)
+        w.add(_to_ds_file(self.output_dir, 1))
+        self.assertFalse(os.path.exists(self.html_path))
+        w.flush(force=True)
+        self.assertTrue(os.path.exists(self.html_path))
+
+    def test_flush(self):
+        w = self._to_writer(write_interval=3600, max_nfiles=100, html_interval=3600)
+        w.add(_to_ds_file(self.output_dir, 0))
+        w.flush()
+        self.assertEqual(self._load_nfiles(), 0)
+        w.flush(force=True)
+        self.assertEqual(self._load_nfiles(), 1)
+        self.assertTrue(os.path.exists(self.html_path))
+        self.assertFalse(os.path.exists(self.json_path + ".tmp"))
+
+    def test_write_interval(self):
+        w = self._to_writer(write_interval=0, max_nfiles=100, html_interval=0)
+        w.add(_to_ds_file(self.output_dir, 0))
+        self.assertEqual(self._load_nfiles(), 1)
+        self.assertTrue(os.path.exists(self.html_path))
+
+
+class _Graph(object):
+    structure_version = 0
+    state_version = 0
+
+
+class TestRateLimitedReportWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.reports = []
+        self.bg = _Graph()
+
+    def _write_report(self, bg, state):
+        self.reports.append(state)
+
+    def test_write_only_changed_graph(self):
+        w = RateLimitedReportWriter(self._write_report, min_interval=0)
+        self.assertTrue(w.write(self.bg, "running"))
+        self.assertFalse(w.write(self.bg, "running"))
+        self.bg.state_version += 1
+        self.assertTrue(w.write(self.bg, "running"))
+        self.assertTrue(w.write(self.bg, "failed"))
+        self.assertEqual(self.reports, ["running", "running", "failed"])
+
+    def test_min_interval(self):
+        w = RateLimitedReportWriter(self._write_report, min_interval=3600)
+        self.assertTrue(w.write(self.bg, "running"))
+        self.bg.state_version += 1
+        self.assertFalse(w.write(self.bg, "running"))
+        # terminal states are always written
+        self.assertTrue(w.write(self.bg, "successful", force=True))
+        self.assertEqual(w.nwrites, 2)
+
+
+class _MetaTask(object):
+    task_id = "pbsmrtpipe.tasks.dev_hello_world"
+
+
+class _Node(object):
+    meta_task = _MetaTask()
+
+    def __init__(self, ix):
+        self.ix = ix
+
+
+class TestWorkflowJournal(unittest.TestCase):
+
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(suffix="-journal"), "workflow-journal.jsonl")
+        self.tnode = _Node("pbsmrtpipe.tasks.dev_hello_world-1")
+        self.fnode = _Node("BindingOutFileNode out 0")
+        self.bg = _Graph()
+        self.bg.node = {self.fnode: {ConstantsNodes.FILE_ATTR_PATH: "/path/to/file.txt"}}
+
+    def test_only_transitions(self):
+        j = WorkflowJournal(self.path, write_interval=0)
+        f = j.to_listener(self.bg)
+        f(self.tnode, ConstantsNodes.TASK_ATTR_STATE, "submitted")
+        f(self.tnode, ConstantsNodes.TASK_ATTR_STATE, "submitted")
+        f(self.tnode, ConstantsNodes.TASK_ATTR_STATE, "successful")
+        f(self.fnode, ConstantsNodes.FILE_ATTR_IS_RESOLVED, True)
+        j.flush()
+        records = load_workflow_journal(self.path)
+        self.assertEqual([r.get('state') for r in records], ["submitted", "successful", None])
+        self.assertEqual(records[0]['task_id'], "pbsmrtpipe.tasks.dev_hello_world")
+        self.assertEqual(records[-1]['event'], "file_state")
+        self.assertEqual(records[-1]['path'], "/path/to/file.txt")
+
+    def test_buffered_writes(self):
+        j = WorkflowJournal(self.path, write_interval=3600, max_nrecords=2)
+        j.add(self.bg, self.tnode, ConstantsNodes.TASK_ATTR_STATE, "submitted")
+        j.flush()
+        self.assertFalse(os.path.exists(self.path))
+        j.add(self.bg, self.tnode, ConstantsNodes.TASK_ATTR_STATE, "running")
+        self.assertEqual(len(load_workflow_journal(self.path)), 2)
+        j.add(self.bg, self.tnode, ConstantsNodes.TASK_ATTR_STATE, "successful")
+        j.flush(force=True)
+        self.assertEqual(len(load_workflow_journal(self.path)), 3)
+        self.assertEqual(j.nrecords, 3)
+
+    def test_partial_line(self):
+        j = WorkflowJournal(self.path, write_interval=0)
+        j.add(self.bg, self.tnode, ConstantsNodes.TASK_ATTR_STATE, "submitted")
+        j.flush()
+        with open(self.path, 'a') as f:
+            f.write('{"node_id": ')
+        self.assertEqual(len(load_workflow_journal(self.path)), 1)
@@ -1,18 +1,31 @@
 import logging
 import os
+import sys
 import unittest
 import time
 import tempfile
 import stat
 import multiprocessing
+import signal
+import subprocess
+import threading
 import warnings
+import gzip
+import shutil
+import Queue
 
 from pbsmrtpipe.engine import (ProcessPoolManager, EngineWorker,
-                               get_results_from_queue, backticks)
+                               get_results_from_queue, backticks,
+                               run_command, ProcessWaiter, TaskSupervisor,
+                               PilotQueue, PilotPool, OutputCapture, TailBuffer,
+                               run_command_async, run_function, run_pilot,
+                               write_task_result, load_task_result)
+from pbsmrtpipe.models import TaskStates
 from pbsmrtpipe.cluster_templates import CLUSTER_TEMPLATE_DIR
-from pbsmrtpipe.cluster import ClusterTemplateRender
+from pbsmrtpipe.cluster import ClusterTemplateRender, ClusterTemplate
+from pbsmrtpipe.cluster import Constants as ClusterConstants
 
-from base import HAS_CLUSTER_QSUB, NO_CLUSTER_COMMAND_MESSAGE
+from base import HAS_CLUSTER_QSUB, NO_CLUSTER_COMMAND_MESSAGE, get_data_file
 
 log = logging.getLogger(__name__)
 
@@ -31,6 +44,139 @@ class TestUtilFuncs(unittest.TestCase):
 
         self.assertEqual(err, "")
 
+    def test_run_command(self):
+        with tempfile.TemporaryFile() as stdout_fh:
+            with tempfile.TemporaryFile() as stderr_fh:
+                rcode, _, _, run_time = run_command("sleep 0.2; exit 3", stdout_fh, stderr_fh)
+        self.assertEqual(rcode, 3)
+        # the exit is not detected by (slow) polling
+        self.assertLess(run_time, 1.0)
+
+    def test_run_command_timeout(self):
+        with tempfile.TemporaryFile() as stdout_fh:
+            with tempfile.TemporaryFile() as stderr_fh:
+                rcode, _, _, run_time = run_command("exec sleep 30", stdout_fh, stderr_fh, time_out=0.5)
+        self.assertNotEqual(rcode, 0)
+        self.assertLess(run_time, 5.0)
+
+    def test_backticks_max_nlines(self):
+        rcode, out, err, run_time = backticks("seq 1 1000", max_nlines=3)
+        self.assertEqual(rcode, 0)
+        self.assertEqual(out, ["998", "999", "1000"])
+
+
+class TestOutputCapture(unittest.TestCase):
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp(suffix="-output-capture")
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+
+    def _to_p(self, name):
+        return os.path.join(self.output_dir, name)
+
+    def test_tail_buffer(self):
+        t = TailBuffer(nlines=3, max_line_length=5)
+        t.feed("a\nb")
+        t.feed("b\r\nc\rd\n0123456789\npartial")
+        self.assertEqual(t.get_lines(), ["d", "56789", "rtial"])
+
+    def test_run_command(self):
+        stdout, stderr = self._to_p("stdout"), self._to_p("stderr")
+        cmd = "seq 1 10000; echo error-1 1>&2; echo error-2 1>&2; exit 2"
+        with OutputCapture(stdout, nlines=2) as stdout_fh:
+            with OutputCapture(stderr, nlines=2) as stderr_fh:
+                stdout_fh.write("header\n")
+                rcode, out, err, run_time = run_command(cmd, stdout_fh, stderr_fh)
+        self.assertEqual(rcode, 2)
+        self.assertEqual(out, "9999\n10000")
+        self.assertEqual(err, "error-1\nerror-2")
+        with open(stdout) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[0], "header")
+        self.assertEqual(len(lines), 10001)
+
+    def test_rotate(self):
+        stdout = self._to_p("stdout")
+        with OutputCapture(stdout, max_bytes=1000, nbackups=2) as stdout_fh:
+            for i in xrange(10):
+                stdout_fh.write("{i}\n".format(i=i) * 300)
+        self.assertEqual(stdout_fh.nrotations, 5)
+        self.assertEqual(stdout_fh.get_tail().splitlines()[-1], "9")
+        self.assertEqual(os.path.getsize(stdout), 0)
+        with gzip.open(stdout + ".1.gz") as f:
+            self.assertEqual(f.read(), "8\n" * 300 + "9\n" * 300)
+        self.assertTrue(os.path.exists(stdout + ".2.gz"))
+        self.assertFalse(os.path.exists(stdout + ".3.gz"))
+
+    def test_run_command_async(self):
+        stdout, stderr = self._to_p("stdout"), self._to_p("stderr")
+        rcode, out, err, _ = run_command_async("seq 1 100", stdout, stderr)
+        self.assertEqual(rcode, 0)
+        self.assertTrue(out.endswith("99\n100"))
+        self.assertEqual(err, "")
+        with open(stdout) as f:
+            self.assertEqual(len(f.read().splitlines()), 100)
+
+
+def _print_and_return(msg, rcode):
+    print msg
+    sys.stderr.write("pid {p}\n".format(p=os.getpid()))
+    return rcode
+
+
+def _raise_error():
+    raise ValueError("Task failed")
+
+
+class TestRunFunction(unittest.TestCase):
+
+    def test_run_function(self):
+        with OutputCapture() as stdout_fh:
+            with OutputCapture() as stderr_fh:
+                rcode, out, err, _ = run_function(_print_and_return, ("hello", 3), stdout_fh, stderr_fh)
+        self.assertEqual(rcode, 3)
+        self.assertEqual(out, "hello")
+        # run in a forked process
+        self.assertNotEqual(err, "pid {p}".format(p=os.getpid()))
+
+    def test_run_function_crash(self):
+        with OutputCapture() as stdout_fh:
+            with OutputCapture() as stderr_fh:
+                rcode, _, err, _ = run_function(_raise_error, (), stdout_fh, stderr_fh)
+                self.assertEqual(rcode, 1)
+                self.assertIn("ValueError: Task failed", err)
+                rcode, _, _, _ = run_function(os.abort, (), stdout_fh, stderr_fh)
+                self.assertEqual(rcode, -signal.SIGABRT)
+
+
+class TestProcessWaiter(unittest.TestCase):
+
+    def test_wait(self):
+        w = ProcessWaiter(subprocess.Popen(["sleep", "0.1"]))
+        started_at = time.time()
+        self.assertEqual(w.wait(), 0)
+        self.assertLess(time.time() - started_at, 1.0)
+        # the exit code is cached
+        self.assertEqual(w.wait(), 0)
+
+    def test_wait_timeout(self):
+        p = subprocess.Popen(["sleep", "30"])
+        w = ProcessWaiter(p)
+        self.assertIsNone(w.wait(timeout=0.1))
+        p.terminate()
+        self.assertEqual(w.wait(timeout=5), -signal.SIGTERM)
+
+    def test_wait_shutdown_event(self):
+        p = subprocess.Popen(["sleep", "30"])
+        w = ProcessWaiter(p)
+        shutdown_event = threading.Event()
+        shutdown_event.set()
+        self.assertIsNone(w.wait(shutdown_event=shutdown_event, check_interval=0.1))
+        p.kill()
+        self.assertEqual(w.wait(timeout=5), -signal.SIGKILL)
+
 
 def _task_generator(max_tasks):
     def _to_tmp(suffix):
@@ -145,6 +291,376 @@ def _test_simple_pool(max_workers, max_tasks, cluster_renderer=None):
     return _test_pool(max_workers, tasks, cluster_renderer=cluster_renderer)
 
 
+_WRITE_RESULT_SCRIPT = """
+import json, os, sys
+d = dict(state="successful", error_message="", run_time_sec=0.5)
+p = os.path.join(os.path.dirname(sys.argv[1]), "task-result.json")
+# written atomically, as the runner does
+with open(p + ".tmp", "w") as f:
+    f.write(json.dumps(d))
+os.rename(p + ".tmp", p)
+"""
+
+
+class _SuccessfulTaskSupervisor(TaskSupervisor):
+    # the manifest path is appended to the cmd
+    RUNNER_CMD = (sys.executable, "-c", _WRITE_RESULT_SCRIPT)
+
+
+class _FailedTaskSupervisor(TaskSupervisor):
+    RUNNER_CMD = (sys.executable, "-c", "import sys; sys.stderr.write('Task Error'); sys.exit(7)")
+
+
+class _ArrayTaskSupervisor(TaskSupervisor):
+    # run-array --output-dir <dir> <manifest> ...
+    RUNNER_CMD = _SuccessfulTaskSupervisor.RUNNER_CMD
+    ARRAY_RUNNER_CMD = (sys.executable, "-c", "import subprocess, sys; [subprocess.check_call([sys.executable, '-c', sys.argv[1], p]) for p in sys.argv[4:]]", _WRITE_RESULT_SCRIPT)
+
+
+class _ChainTaskSupervisor(_ArrayTaskSupervisor):
+    # run-chain --output-dir <dir> <manifest> ...
+    CHAIN_RUNNER_CMD = _ArrayTaskSupervisor.ARRAY_RUNNER_CMD
+
+
+class _SleepTaskSupervisor(TaskSupervisor):
+    RUNNER_CMD = (sys.executable, "-c", "import time; time.sleep(60)")
+
+
+def _to_manifest():
+    output_dir = tempfile.mkdtemp()
+    path = os.path.join(output_dir, "runnable-task.json")
+    with open(path, 'w') as f:
+        f.write("{}")
+    return path
+
+
+class TestTaskSupervisor(unittest.TestCase):
+
+    def _run_tasks(self, klass, ntasks):
+        q_out = Queue.Queue()
+        s = klass(q_out, wakeup_interval=1)
+        s.start()
+        try:
+            tasks = [s.submit("uuid-{i}".format(i=i), "task-{i}".format(i=i), _to_manifest()) for i in xrange(ntasks)]
+            results = [q_out.get(timeout=30) for _ in tasks]
+        finally:
+            s.shutdown()
+        return tasks, results
+
+    def test_successful_tasks(self):
+        tasks, results = self._run_tasks(_SuccessfulTaskSupervisor, 5)
+        self.assertEqual(sorted(r.task_id for r in results), sorted(t.task_id for t in tasks))
+        self.assertTrue(all(r.state == TaskStates.SUCCESSFUL for r in results))
+        self.assertTrue(all(r.run_time_sec == 0.5 for r in results))
+        self.assertFalse(any(t.is_alive() for t in tasks))
+
+    def test_failed_task(self):
+        tasks, results = self._run_tasks(_FailedTaskSupervisor, 1)
+        self.assertEqual(results[0].state, TaskStates.FAILED)
+        self.assertEqual(tasks[0].exitcode, 7)
+        self.assertIn("Task Error", results[0].error_message)
+
+    def test_array_tasks(self):
+        q_out = Queue.Queue()
+        s = _ArrayTaskSupervisor(q_out, wakeup_interval=1)
+        s.start()
+        try:
+            items = [("uuid-{i}".format(i=i), "task-{i}".format(i=i), _to_manifest(), "worker-{i}".format(i=i)) for i in xrange(4)]
+            # missing manifest
+            items.append(("uuid-4", "task-4", "/path/to/does-not-exist/runnable-task.json", "worker-4"))
+            tasks = s.submit_array(items, tempfile.mkdtemp())
+            results = [q_out.get(timeout=30) for _ in tasks]
+        finally:
+            s.shutdown()
+
+        self.assertEqual([t.task_id for t in tasks], [x[1] for x in items])
+        # all the array tasks share the same process
+        self.assertEqual(len({t.pid for t in tasks[:4]}), 1)
+        states = {r.task_id: r.state for r in results}
+        self.assertEqual(states.pop("task-4"), TaskStates.FAILED)
+        self.assertTrue(all(x == TaskStates.SUCCESSFUL for x in states.values()))
+
+    def test_chain_tasks(self):
+        q_out = Queue.Queue()
+        s = _ChainTaskSupervisor(q_out, wakeup_interval=1)
+        s.start()
+        try:
+            items = [("uuid-{i}".format(i=i), "task-{i}".format(i=i), _to_manifest(), "worker-{i}".format(i=i)) for i in xrange(3)]
+            tasks = s.submit_chain(items, tempfile.mkdtemp())
+            results = [q_out.get(timeout=30) for _ in tasks]
+        finally:
+            s.shutdown()
+
+        # the fused tasks share the same process and are completed in order
+        self.assertEqual(len({t.pid for t in tasks}), 1)
+        self.assertEqual([r.task_id for r in results], [x[1] for x in items])
+        self.assertTrue(all(r.state == TaskStates.SUCCESSFUL for r in results))
+
+    def test_chain_tasks_missing_manifest(self):
+        q_out = Queue.Queue()
+        s = _ChainTaskSupervisor(q_out)
+        items = [("uuid-0", "task-0", _to_manifest(), "worker-0"),
+                 ("uuid-1", "task-1", "/path/to/does-not-exist/runnable-task.json", "worker-1")]
+        tasks = s.submit_chain(items, tempfile.mkdtemp())
+        self.assertFalse(any(t.is_alive() for t in tasks))
+        self.assertEqual([q_out.get(timeout=1).state for _ in tasks], [TaskStates.FAILED] * 2)
+
+    def test_missing_manifest(self):
+        q_out = Queue.Queue()
+        s = _SuccessfulTaskSupervisor(q_out)
+        t = s.submit("uuid-0", "task-0", "/path/to/does-not-exist/runnable-task.json")
+        self.assertFalse(t.is_alive())
+        self.assertEqual(q_out.get(timeout=1).state, TaskStates.FAILED)
+
+    def test_terminate_task(self):
+        q_out = Queue.Queue()
+        s = _SleepTaskSupervisor(q_out, wakeup_interval=1)
+        s.start()
+        try:
+            t = s.submit("uuid-0", "task-0", _to_manifest())
+            self.assertTrue(t.is_alive())
+            t.terminate()
+            # terminated tasks don't post a result
+            self.assertRaises(Queue.Empty, q_out.get, True, 2)
+            self.assertFalse(t.is_alive())
+        finally:
+            s.shutdown()
+
+
+def _to_fake_cluster_renderer():
+    """Cluster templates of the (local) fake scheduler"""
+    exe = "bash " + get_data_file("fake-scheduler.sh")
+    d = {ClusterConstants.START: exe + ' submit ${JOB_ID} "${STDOUT_FILE}" "${STDERR_FILE}" "${CMD}"',
+         ClusterConstants.STOP: exe + " delete ${JOB_ID}",
+         ClusterConstants.SUBMIT: exe + ' submit ${JOB_ID} "${STDOUT_FILE}" "${STDERR_FILE}" "${CMD}"',
+         ClusterConstants.STATUS: exe + " status"}
+    return ClusterTemplateRender([ClusterTemplate(k, v) for k, v in d.iteritems()])
+
+
+class TestTaskSupervisorCluster(unittest.TestCase):
+
+    def setUp(self):
+        self.env = os.environ.copy()
+        os.environ['FAKE_SCHEDULER_DIR'] = tempfile.mkdtemp()
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.env)
+
+    def _run_tasks(self, klass, ntasks, lost_job_timeout=0):
+        q_out = Queue.Queue()
+        s = klass(q_out, wakeup_interval=0.2, cluster_renderer=_to_fake_cluster_renderer(),
+                  cluster_status_interval=0.2, lost_job_timeout=lost_job_timeout)
+        self.assertTrue(s.supports_async_cluster)
+        s.start()
+        try:
+            tasks = [s.submit("uuid-{i}".format(i=i), "task-{i}".format(i=i), _to_manifest(), is_distributed=True) for i in xrange(ntasks)]
+            results = [q_out.get(timeout=30) for _ in tasks]
+        finally:
+            s.shutdown()
+        return tasks, results
+
+    def test_successful_cluster_tasks(self):
+        tasks, results = self._run_tasks(_SuccessfulTaskSupervisor, 5)
+        self.assertEqual(sorted(r.task_id for r in results), sorted(t.task_id for t in tasks))
+        self.assertTrue(all(r.state == TaskStates.SUCCESSFUL for r in results))
+        self.assertTrue(all(t.cluster_job_id is not None for t in tasks))
+        self.assertFalse(any(t.is_alive() for t in tasks))
+
+    def test_lost_cluster_task(self):
+        # the job completes without writing a task result
+        tasks, results = self._run_tasks(_FailedTaskSupervisor, 2)
+        self.assertTrue(all(r.state == TaskStates.FAILED for r in results))
+        self.assertIn("no longer active", results[0].error_message)
+
+    def test_terminate_cluster_task(self):
+        q_out = Queue.Queue()
+        s = _SleepTaskSupervisor(q_out, wakeup_interval=0.2, cluster_renderer=_to_fake_cluster_renderer(),
+                                 cluster_status_interval=0.2, lost_job_timeout=0)
+        s.start()
+        try:
+            t = s.submit("uuid-0", "task-0", _to_manifest(), is_distributed=True)
+            while t.cluster_job_id is None:
+                time.sleep(0.1)
+            self.assertTrue(t.is_alive())
+            t.terminate()
+            # terminated tasks don't post a result
+            self.assertRaises(Queue.Empty, q_out.get, True, 2)
+        finally:
+            s.shutdown()
+
+
+# <runner-script> <queue-dir> --worker-id <id> --idle-timeout <sec>
+_PILOT_SCRIPT = """
+import sys
+from pbsmrtpipe.engine import run_pilot
+run_pilot(sys.argv[2], sys.argv[4], idle_timeout=float(sys.argv[6]), poll_interval=0.1, runner_cmd=(sys.executable, "-c", sys.argv[1]))
+"""
+
+
+class _SuccessfulPilotPool(PilotPool):
+    PILOT_CMD = (sys.executable, "-c", _PILOT_SCRIPT, _WRITE_RESULT_SCRIPT)
+
+
+class _SleepPilotPool(PilotPool):
+    PILOT_CMD = (sys.executable, "-c", _PILOT_SCRIPT, "import time; time.sleep(10)")
+
+
+class TestPilotQueue(unittest.TestCase):
+
+    def test_claim_and_cancel(self):
+        q = PilotQueue(os.path.join(tempfile.mkdtemp(), "pilot-queue")).create()
+        for i in xrange(3):
+            q.put("uuid-{i}".format(i=i), "task-{i}".format(i=i), "/path/to/{i}/runnable-task.json".format(i=i))
+
+        self.assertEqual(q.claim("pilot-1"), ("uuid-0", "task-0", "/path/to/0/runnable-task.json"))
+        q.cancel("uuid-1")
+        self.assertTrue(q.is_cancelled("uuid-1"))
+        self.assertEqual(q.claim("pilot-2")[0], "uuid-2")
+        self.assertIsNone(q.claim("pilot-2"))
+        self.assertEqual(q.get_claimed(), {"uuid-0": "pilot-1", "uuid-2": "pilot-2"})
+
+        self.assertIsNone(q.get_heartbeat("pilot-1"))
+        q.heartbeat("pilot-1")
+        self.assertIsNotNone(q.get_heartbeat("pilot-1"))
+
+
+def _write_pid_task_result(manifest_path):
+    output_dir = os.path.dirname(manifest_path)
+    write_task_result(os.path.join(output_dir, "task-result.json"), TaskStates.SUCCESSFUL, str(os.getpid()), 0.1)
+    return 0
+
+
+def _exit_task(manifest_path):
+    os._exit(5)
+
+
+class TestInProcessPilot(unittest.TestCase):
+
+    def test_run_pilot_in_process(self):
+        q = PilotQueue(os.path.join(tempfile.mkdtemp(), "pilot-queue")).create()
+        manifests = [_to_manifest() for _ in xrange(3)]
+        for i, manifest_path in enumerate(manifests):
+            q.put("uuid-{i}".format(i=i), "task-{i}".format(i=i), manifest_path)
+
+        ntasks = run_pilot(q.queue_dir, "pilot-1", idle_timeout=0.2, poll_interval=0.1, task_func=_write_pid_task_result)
+        self.assertEqual(ntasks, 3)
+        pids = set()
+        for manifest_path in manifests:
+            state, msg, _ = load_task_result(os.path.join(os.path.dirname(manifest_path), "task-result.json"))
+            self.assertEqual(state, TaskStates.SUCCESSFUL)
+            pids.add(msg)
+        # each task is run in a new forked process
+        self.assertEqual(len(pids), 3)
+        self.assertNotIn(str(os.getpid()), pids)
+
+    def test_run_pilot_in_process_crash(self):
+        q = PilotQueue(os.path.join(tempfile.mkdtemp(), "pilot-queue")).create()
+        manifest_path = _to_manifest()
+        q.put("uuid-1", "task-1", manifest_path)
+        self.assertEqual(run_pilot(q.queue_dir, "pilot-1", idle_timeout=0.2, poll_interval=0.1, task_func=_exit_task), 1)
+        state, msg, _ = load_task_result(os.path.join(os.path.dirname(manifest_path), "task-result.json"))
+        self.assertEqual(state, TaskStates.FAILED)
+        self.assertIn("exited with code 5", msg)
+
+
+def _inline_task(manifest_path):
+    return TaskStates.SUCCESSFUL, threading.current_thread().name, 0.1
+
+
+def _inline_task_crash(manifest_path):
+    raise ValueError("Inline task error")
+
+
+class TestTaskSupervisorInline(unittest.TestCase):
+
+    def _run_tasks(self, task_func, ntasks):
+        q_out = Queue.Queue()
+        s = TaskSupervisor(q_out, wakeup_interval=1, max_ninline_workers=2)
+        s.start()
+        try:
+            tasks = [s.submit_inline("uuid-{i}".format(i=i), "task-{i}".format(i=i), _to_manifest(), task_func) for i in xrange(ntasks)]
+            results = [q_out.get(timeout=30) for _ in tasks]
+        finally:
+            s.shutdown()
+        self.assertEqual(sorted(r.task_id for r in results), sorted(t.task_id for t in tasks))
+        self.assertFalse(any(t.is_alive() for t in tasks))
+        return tasks, results
+
+    def test_successful_inline_tasks(self):
+        tasks, results = self._run_tasks(_inline_task, 4)
+        self.assertTrue(all(r.state == TaskStates.SUCCESSFUL for r in results))
+        # run in (at most 2) threads of the driver process
+        self.assertLessEqual(len({r.error_message for r in results}), 2)
+        self.assertNotIn(threading.current_thread().name, {r.error_message for r in results})
+        state, _, _ = load_task_result(tasks[0].task_result_json)
+        self.assertEqual(state, TaskStates.SUCCESSFUL)
+
+    def test_failed_inline_task(self):
+        _, results = self._run_tasks(_inline_task_crash, 1)
+        self.assertEqual(results[0].state, TaskStates.FAILED)
+        self.assertIn("Inline task error", results[0].error_message)
+
+
+class TestTaskSupervisorPilot(unittest.TestCase):
+
+    def _to_supervisor(self, pool_klass, q_out, max_npilots=2, lost_job_timeout=120):
+        pool = pool_klass(os.path.join(tempfile.mkdtemp(), "pilot-queue"), max_npilots, idle_timeout=5, poll_interval=0.1)
+        return TaskSupervisor(q_out, wakeup_interval=1, lost_job_timeout=lost_job_timeout, pilot_pool=pool)
+
+    def _wait_for_claim(self, task):
+        started_at = time.time()
+        while task.worker_id is None and time.time() - started_at < 30:
+            time.sleep(0.1)
+        self.assertIsNotNone(task.worker_id)
+
+    def test_successful_pilot_tasks(self):
+        q_out = Queue.Queue()
+        s = self._to_supervisor(_SuccessfulPilotPool, q_out)
+        s.start()
+        try:
+            tasks = [s.submit_to_pilot("uuid-{i}".format(i=i), "task-{i}".format(i=i), _to_manifest()) for i in xrange(6)]
+            results = [q_out.get(timeout=30) for _ in tasks]
+        finally:
+            s.shutdown()
+
+        self.assertEqual(sorted(r.task_id for r in results), sorted(t.task_id for t in tasks))
+        self.assertTrue(all(r.state == TaskStates.SUCCESSFUL for r in results))
+        self.assertFalse(any(t.is_alive() for t in tasks))
+        # the tasks are run back-to-back by at most max_npilots pilots
+        self.assertLessEqual(len({t.worker_id for t in tasks}), 2)
+
+    def test_lost_pilot(self):
+        q_out = Queue.Queue()
+        s = self._to_supervisor(_SleepPilotPool, q_out, max_npilots=1, lost_job_timeout=0.5)
+        s.start()
+        try:
+            t = s.submit_to_pilot("uuid-0", "task-0", _to_manifest())
+            self._wait_for_claim(t)
+            os.kill(s.pilot_pool._pilots[t.worker_id].pid, signal.SIGKILL)
+            r = q_out.get(timeout=30)
+        finally:
+            s.shutdown()
+
+        self.assertEqual(r.state, TaskStates.FAILED)
+        self.assertIn("no longer active", r.error_message)
+
+    def test_terminate_pilot_task(self):
+        q_out = Queue.Queue()
+        s = self._to_supervisor(_SleepPilotPool, q_out, max_npilots=1)
+        s.start()
+        try:
+            t = s.submit_to_pilot("uuid-0", "task-0", _to_manifest())
+            self._wait_for_claim(t)
+            t.terminate()
+            self.assertFalse(t.is_alive())
+            # terminated tasks don't post a result
+            self.assertRaises(Queue.Empty, q_out.get, True, 2)
+            self.assertFalse(os.path.exists(t.task_result_json))
+        finally:
+            s.shutdown()
+
+
 @unittest.skip
 class TestWorker(unittest.TestCase):
 
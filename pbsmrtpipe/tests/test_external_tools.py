@@ -2,6 +2,7 @@ import os
 import logging
 import unittest
 import tempfile
+import threading
 
 import pbsmrtpipe.external_tools
 
@@ -34,3 +35,17 @@ class TestExternalTools(unittest.TestCase):
         output_svg = _to_tempfile("_dot.svg")
         status = pbsmrtpipe.external_tools.dot_file_to_png(self.file_name, output_svg)
         self.assertTrue(status)
+
+    def test_dot_to_image_or_cancel(self):
+        output_svg = _to_tempfile("_dot.svg")
+        status = pbsmrtpipe.external_tools.dot_to_image_or_cancel("svg", self.file_name, output_svg, threading.Event())
+        self.assertTrue(status)
+
+    def test_dot_to_image_cancelled(self):
+        output_svg = _to_tempfile("_dot.svg")
+        os.remove(output_svg)
+        cancel_event = threading.Event()
+        cancel_event.set()
+        status = pbsmrtpipe.external_tools.dot_to_image_or_cancel("svg", self.file_name, output_svg, cancel_event)
+        self.assertFalse(status)
+        self.assertFalse(os.path.exists(output_svg))
@@ -0,0 +1,34 @@
+import logging
+import unittest
+
+from base import get_temp_dir
+
+import pbsmrtpipe.loader as L
+import pbsmrtpipe.tools.benchmark_bgraph as BB
+
+log = logging.getLogger(__name__)
+
+RTASKS = L.load_all_tool_contracts()
+
+
+class TestBenchmarkBindingGraph(unittest.TestCase):
+
+    def test_run_benchmark(self):
+        nchunks = 10
+        d = BB.run_benchmark(RTASKS, nchunks, get_temp_dir("bgraph-benchmark-"))
+        log.info(d)
+        self.assertEqual(d['nchunks'], nchunks)
+        self.assertTrue(d['was_successful'])
+        # All the runnable tasks are submitted in each iteration. One call
+        # for the chunked tasks, the gather task, the downstream task and
+        # the final empty call of each run.
+        for name in (BB.Constants.GET_RUNNABLE_TASKS_FIFO,
+                     BB.Constants.GET_RUNNABLE_TASKS_CRITICAL_PATH,
+                     BB.Constants.WORKFLOW_STATE_CHECKS):
+            self.assertEqual(d['operations'][name]['ncalls'], 5)
+        for name in (BB.Constants.BINDING_STRS_TO_BINDING_GRAPH,
+                     BB.Constants.APPLY_CHUNK_OPERATOR,
+                     BB.Constants.ADD_GATHER_TO_COMPLETED_TASK_CHUNKS,
+                     BB.Constants.TO_BINDING_GRAPH_SUMMARY):
+            self.assertIn('run_time_sec', d['operations'][name])
+            self.assertIn('peak_rss_mb', d['operations'][name])
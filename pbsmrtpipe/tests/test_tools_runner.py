@@ -1,6 +1,8 @@
 import json
 import logging
 import os
+import subprocess
+import sys
 import unittest
 import uuid
 
@@ -65,3 +67,47 @@ class TestHelloRunnableTask(TestRunnableTask):
     INPUT_FILE_NAMES = ['file1.txt', 'file2.txt']
     OUTPUT_FILE_NAMES = ['out1.txt', 'out2.txt', 'out3.txt']
     RESOURCES = []
+
+
+class TestPythonRtcCmd(unittest.TestCase):
+
+    def test_to_python_rtc_cmd(self):
+        cmd = "python -m pbsmrtpipe.pb_tasks.dev  run-rtc /path/to/resolved-tool-contract.json"
+        self.assertEqual(R.to_python_rtc_cmd(cmd), ("pbsmrtpipe.pb_tasks.dev", "/path/to/resolved-tool-contract.json"))
+        cmd = "/usr/bin/python2.7 -m pbcoretools.tasks.converters run-rtc rtc.json"
+        self.assertEqual(R.to_python_rtc_cmd(cmd)[0], "pbcoretools.tasks.converters")
+
+    def test_to_python_rtc_cmd_not_python(self):
+        self.assertIsNone(R.to_python_rtc_cmd("blasr --rtc rtc.json"))
+        self.assertIsNone(R.to_python_rtc_cmd("python -m my.module run-rtc rtc.json && rm -rf tmp"))
+
+
+class TestRunnerImportTime(unittest.TestCase):
+
+    """The runner is started for every task, the import of the module must
+    only load what's needed to run a task manifest (See
+    pbsmrtpipe.tools.benchmark_bgraph for the import time)"""
+    # loaded lazily by the runner
+    LAZY_MODULES = ('pbsmrtpipe.pb_io', 'pbsmrtpipe.graph', 'pbcommand.cli',
+                    'pbcommand.models.report', 'pbcommand.resolver',
+                    'pbcommand.validators', 'avro', 'jsonschema', 'jinja2',
+                    'xmlbuilder', 'networkx')
+
+    def _import_runner(self):
+        # the modules loaded by pbcommand.models are required by the runner
+        code = ("import json, sys; import pbcommand.models; "
+                "required = set(k for k, v in sys.modules.items() if v is not None); "
+                "import pbsmrtpipe.tools.runner; "
+                "print json.dumps([k for k, v in sys.modules.items() if v is not None and k not in required])")
+        return json.loads(subprocess.check_output([sys.executable, "-c", code]))
+
+    def test_import_runner(self):
+        modules = set(self._import_runner())
+        for name in self.LAZY_MODULES:
+            self.assertNotIn(name, modules)
+
+    def test_driver_subcommands(self):
+        p = R.get_driver_parser()
+        args = p.parse_args(["pilot", "/path/to/queue", "--worker-id", "worker-1", "--debug"])
+        self.assertEqual(args.func, R._args_run_pilot)
+        self.assertTrue(args.debug)
@@ -3,7 +3,7 @@ import unittest
 import logging
 
 from pbcommand.utils import which
-from pbsmrtpipe.utils import HTML_TEMPLATE_ENV
+from pbsmrtpipe.utils import HTML_TEMPLATE_ENV, is_log_level_emitted
 from base import TEST_DATA_DIR, SIV_TEST_DATA_DIR
 
 
@@ -40,3 +40,33 @@ class TestLoadJinjaTemplate(unittest.TestCase):
         d = dict(value=1)
         html = t.render(**d) #pylint: disable=no-member
         self.assertIsInstance(html, basestring)
+
+
+class TestIsLogLevelEmitted(unittest.TestCase):
+
+    def setUp(self):
+        self.logger = logging.getLogger("pbsmrtpipe.tests.is_log_level_emitted")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.DEBUG)
+        self.handler = logging.NullHandler()
+        self.handler.setLevel(logging.INFO)
+        self.logger.addHandler(self.handler)
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+
+    def test_handler_level(self):
+        self.assertTrue(is_log_level_emitted(self.logger, logging.INFO))
+        self.assertFalse(is_log_level_emitted(self.logger, logging.DEBUG))
+        self.handler.setLevel(logging.DEBUG)
+        self.assertTrue(is_log_level_emitted(self.logger, logging.DEBUG))
+
+    def test_logger_level(self):
+        self.handler.setLevel(logging.DEBUG)
+        self.logger.setLevel(logging.WARN)
+        self.assertFalse(is_log_level_emitted(self.logger, logging.INFO))
+
+    def test_child_logger(self):
+        child = logging.getLogger(self.logger.name + ".child")
+        self.assertTrue(is_log_level_emitted(child, logging.INFO))
+        self.assertFalse(is_log_level_emitted(child, logging.DEBUG))
@@ -0,0 +1,285 @@
+"""Scalability benchmarks of the Binding Graph operations
+
+Generates a synthetic chunked pipeline using the dev tool contracts
+
+entry:e_01 -> dev_filter_fasta -> dev_py_filter_fasta
+
+The dev_filter_fasta task is chunked (dev_scatter_fasta) into N chunks and
+gathered (dev_gather_fasta). For each N, the time and peak memory (RSS) of
+the core Binding Graph operations are reported as JSON.
+
+Each N is run in a new process, so the peak memory is not shared across runs.
+
+The import time of the task runner (pbtools-runner), which is started for
+every task, is also reported.
+
+python -m pbsmrtpipe.tools.benchmark_bgraph --nchunks 10,100,1000 -o benchmark.json
+"""
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import namedtuple, OrderedDict
+
+from pbcommand.cli import pacbio_args_runner, get_default_argparser_with_base_opts
+from pbcommand.models import PipelineChunk
+from pbcommand.pb_io.common import write_pipeline_chunks
+from pbcommand.utils import setup_log
+
+import pbsmrtpipe.graph.bgraph as B
+import pbsmrtpipe.graph.bgraph_utils as BU
+import pbsmrtpipe.loader as L
+from pbsmrtpipe.models import (TaskStates, ChunkOperator, Scatter,
+                               ScatterChunk, Gather, GatherChunk,
+                               validate_operator)
+
+log = logging.getLogger(__name__)
+
+__version__ = "0.1.0"
+
+
+class Constants(object):
+    NCHUNKS = (10, 100, 1000, 10000, 50000)
+
+    TASK_ID = "pbsmrtpipe.tasks.dev_filter_fasta"
+    DOWNSTREAM_TASK_ID = "pbsmrtpipe.tasks.dev_py_filter_fasta"
+    SCATTER_TASK_ID = "pbcommand.tasks.dev_scatter_fasta"
+    GATHER_TASK_ID = "pbcommand.tasks.dev_gather_fasta"
+    OPERATOR_ID = "pbsmrtpipe.operators.benchmark_chunk_dev_filter_fasta"
+
+    CHUNK_KEY = "$chunk.fasta_id"
+    GATHER_CHUNK_KEY = "$chunk.filtered_fasta_id"
+
+    RUNNER_MODULE = "pbsmrtpipe.tools.runner"
+
+    BINDINGS = (("$entry:e_01", TASK_ID + ":0"),
+                (TASK_ID + ":0", DOWNSTREAM_TASK_ID + ":0"))
+
+    # Operations that are reported
+    BINDING_STRS_TO_BINDING_GRAPH = "binding_strs_to_binding_graph"
+    APPLY_CHUNK_OPERATOR = "apply_chunk_operator"
+    # get_runnable_tasks of each scheduler (see driver._to_get_runnable_tasks_func)
+    GET_RUNNABLE_TASKS_FIFO = "get_runnable_tasks_fifo"
+    GET_RUNNABLE_TASKS_CRITICAL_PATH = "get_runnable_tasks_critical_path"
+    # state checks called by the driver on every iteration
+    WORKFLOW_STATE_CHECKS = "workflow_state_checks"
+    ADD_GATHER_TO_COMPLETED_TASK_CHUNKS = "add_gather_to_completed_task_chunks"
+    TO_BINDING_GRAPH_SUMMARY = "to_binding_graph_summary"
+
+
+# Minimal Task model used by the graph (bg.node[tnode]['task'])
+_BenchmarkTask = namedtuple("_BenchmarkTask", "task_id output_files")
+
+
+def _get_peak_rss_mb():
+    # ru_maxrss is in KB on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def to_benchmark_chunk_operator(registered_tasks_d):
+    """Chunk operator for the dev_filter_fasta task using the dev scatter
+    and gather tool contracts
+
+    :rtype: ChunkOperator
+    """
+    scatter = Scatter(Constants.TASK_ID, Constants.SCATTER_TASK_ID,
+                      [ScatterChunk(Constants.CHUNK_KEY, Constants.TASK_ID + ":0")])
+    gather = Gather([GatherChunk(Constants.GATHER_TASK_ID, Constants.GATHER_CHUNK_KEY, Constants.TASK_ID + ":0")])
+    op = ChunkOperator(Constants.OPERATOR_ID, scatter, gather)
+    validate_operator(op, registered_tasks_d)
+    return op
+
+
+def _write_chunks(output_dir, nchunks):
+    pipeline_chunks = []
+    for i in xrange(nchunks):
+        _d = {Constants.CHUNK_KEY: os.path.join(output_dir, "chunk_{i}.fasta".format(i=i))}
+        pipeline_chunks.append(PipelineChunk("chunk-{i}".format(i=i), **_d))
+
+    path = os.path.join(output_dir, "benchmark.chunks.json")
+    write_pipeline_chunks(pipeline_chunks, path, "Benchmark chunks")
+    return path
+
+
+def _complete_task(bg, tnode, output_dir):
+    """Mark the task as successful and resolve the output files"""
+    output_files = [os.path.join(output_dir, "{i}-{n}.{x}".format(i=tnode.ix, n=i, x=fnode.file_klass.ext))
+                    for i, fnode in enumerate(bg.successors(tnode))]
+    bg.node[tnode]['task'] = _BenchmarkTask(tnode.meta_task.task_id, output_files)
+    B.update_task_state_to_success(bg, tnode, 1.0)
+    for fnode, path in zip(bg.successors(tnode), output_files):
+        B.update_file_state_to_resolved(bg, fnode, path)
+    return output_files
+
+
+class _Timer(object):
+
+    def __init__(self):
+        self.results = OrderedDict()
+
+    def run(self, name, func, *args, **kwargs):
+        started_at = time.time()
+        value = func(*args, **kwargs)
+        self.add(name, time.time() - started_at)
+        return value
+
+    def add(self, name, run_time, ncalls=1):
+        d = self.results.setdefault(name, OrderedDict([("run_time_sec", 0.0), ("ncalls", 0)]))
+        d['run_time_sec'] += run_time
+        d['ncalls'] += ncalls
+        d['peak_rss_mb'] = _get_peak_rss_mb()
+
+
+def _run_workflow_state_checks(bg):
+    B.is_workflow_stalled(bg)
+    B.was_workflow_successful(bg)
+    return B.has_task_in_states(bg, TaskStates.RUNNABLE_STATES())
+
+
+def run_benchmark(registered_tasks_d, nchunks, output_dir):
+    """
+    Run the Binding Graph operations for a pipeline chunked into
+    nchunks, the results are returned as a dict.
+
+    :rtype: dict
+    """
+    chunk_operator = to_benchmark_chunk_operator(registered_tasks_d)
+    chunk_operators_d = {chunk_operator.idx: chunk_operator}
+    timer = _Timer()
+    initial_rss_mb = _get_peak_rss_mb()
+    started_at = time.time()
+
+    bg = timer.run(Constants.BINDING_STRS_TO_BINDING_GRAPH, B.binding_strs_to_binding_graph,
+                   registered_tasks_d, list(Constants.BINDINGS))
+
+    B.resolve_entry_points(bg, {"e_01": os.path.join(output_dir, "entry.fasta")})
+    B.label_chunkable_tasks(bg, chunk_operators_d)
+    B.apply_scatterable(bg, chunk_operators_d, registered_tasks_d)
+
+    # Run the scatter task to generate the chunk.json
+    scatter_tnode = bg.scattered_task_nodes()[0]
+    chunk_json = _write_chunks(output_dir, nchunks)
+    bg.node[scatter_tnode]['task'] = _BenchmarkTask(scatter_tnode.meta_task.task_id, [chunk_json])
+    B.update_task_state_to_success(bg, scatter_tnode, 1.0)
+    B.update_file_state_to_resolved(bg, bg.successors(scatter_tnode)[0], chunk_json)
+
+    timer.run(Constants.APPLY_CHUNK_OPERATOR, B.apply_chunk_operator,
+              bg, chunk_operators_d, registered_tasks_d, nchunks)
+
+    prioritizer = B.CriticalPathPrioritizer()
+
+    def _run_tasks():
+        # Submit all the runnable tasks in each iteration, as the driver
+        # does. The tasks are submitted in the FIFO scheduler order.
+        while True:
+            timer.run(Constants.WORKFLOW_STATE_CHECKS, _run_workflow_state_checks, bg)
+            tnodes = timer.run(Constants.GET_RUNNABLE_TASKS_FIFO, B.get_runnable_tasks, bg)
+            timer.run(Constants.GET_RUNNABLE_TASKS_CRITICAL_PATH, prioritizer.get_runnable_tasks, bg)
+            if not tnodes:
+                break
+            for tnode in tnodes:
+                B.update_task_state(bg, tnode, TaskStates.SUBMITTED)
+            for tnode in tnodes:
+                _complete_task(bg, tnode, output_dir)
+            B.resolve_successor_binding_file_path(bg)
+
+    _run_tasks()
+
+    timer.run(Constants.ADD_GATHER_TO_COMPLETED_TASK_CHUNKS, B.add_gather_to_completed_task_chunks,
+              bg, chunk_operators_d, registered_tasks_d, output_dir)
+
+    # Run the gather and downstream tasks
+    _run_tasks()
+
+    timer.run(Constants.TO_BINDING_GRAPH_SUMMARY, BU.to_binding_graph_summary, bg)
+
+    return OrderedDict([("nchunks", nchunks),
+                        ("nnodes", len(bg)),
+                        ("nedges", bg.number_of_edges()),
+                        ("ntasks", bg.ntask_nodes()),
+                        ("was_successful", B.was_workflow_successful(bg)),
+                        ("run_time_sec", time.time() - started_at),
+                        ("initial_rss_mb", initial_rss_mb),
+                        ("peak_rss_mb", _get_peak_rss_mb()),
+                        ("operations", timer.results)])
+
+
+def _run_benchmark_in_tmp_dir(nchunks):
+    registered_tasks_d = L.load_all_tool_contracts()
+    output_dir = tempfile.mkdtemp(suffix="-bgraph-benchmark")
+    try:
+        return run_benchmark(registered_tasks_d, nchunks, output_dir)
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def get_import_time(module_name):
+    """Import time (sec) of the module in a new interpreter"""
+    code = "import time; t = time.time(); import {m}; print time.time() - t".format(m=module_name)
+    return float(subprocess.check_output([sys.executable, "-c", code]))
+
+
+def run_benchmarks(nchunks_list):
+    """Run each benchmark in a new process
+
+    :rtype: dict
+    """
+    results = []
+    for nchunks in nchunks_list:
+        log.info("Running benchmark with {n} chunks".format(n=nchunks))
+        pool = multiprocessing.Pool(processes=1, maxtasksperchild=1)
+        try:
+            result = pool.apply(_run_benchmark_in_tmp_dir, (nchunks, ))
+        finally:
+            pool.close()
+            pool.join()
+        log.info("Completed benchmark with {n} chunks in {s:.2f} sec".format(n=nchunks, s=result['run_time_sec']))
+        results.append(result)
+
+    return OrderedDict([("version", __version__),
+                        ("created_at", datetime.datetime.now().isoformat()),
+                        ("runner_import_time_sec", get_import_time(Constants.RUNNER_MODULE)),
+                        ("results", results)])
+
+
+def _to_nchunks(s):
+    return [int(x) for x in s.split(",")]
+
+
+def run_args(args):
+    d = run_benchmarks(args.nchunks)
+    s = json.dumps(d, indent=4)
+    if args.output_json is None:
+        print s
+    else:
+        with open(args.output_json, 'w') as f:
+            f.write(s)
+        log.info("wrote benchmark results to {o}".format(o=args.output_json))
+    return 0
+
+
+def get_parser():
+    desc = "Benchmark the scalability of the Binding Graph operations with chunked pipelines"
+    p = get_default_argparser_with_base_opts(__version__, desc)
+
+    f = p.add_argument
+    f('-n', '--nchunks', type=_to_nchunks, default=list(Constants.NCHUNKS),
+      help="Comma separated list of the number of chunks")
+    f('-o', '--output-json', default=None, help="Path to the output JSON results. Defaults to stdout")
+    return p
+
+
+def main(argv=sys.argv):
+    parser = get_parser()
+    return pacbio_args_runner(argv[1:], parser, run_args, log, setup_log)
+
+
+if __name__ == "__main__":
+    sys.exit(main(argv=sys.argv))
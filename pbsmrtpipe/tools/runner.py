@@ -1,3 +1,11 @@
+"""Runner of the task manifests
+
+This is run for every task, hence only the modules required to run a task
+manifest are imported at start up. The pbcommand CLI, reporting and pb_io
+modules are imported when they are used, and the subcommands used by the
+workflow driver (see DRIVER_SUBCOMMANDS) are parsed without the pbcommand CLI.
+"""
+import argparse
 import os
 import shutil
 import stat
@@ -8,23 +16,19 @@ import logging
 import time
 import datetime
 import functools
+import importlib
 import platform
 import re
 
-import pbcommand.cli.utils as U
 from pbcommand.models import ResourceTypes, TaskTypes
-from pbcommand.common_options import add_log_debug_option
-from pbcommand.cli import get_default_argparser
-from pbcommand.models.report import Attribute, Report
 from pbcommand.utils import which, nfs_exists_check
-from pbcommand.validators import validate_file
-from pbcommand.cli.utils import main_runner_default
 
 from pbsmrtpipe.cluster import ClusterTemplateRender, ClusterTemplate
 from pbsmrtpipe.cluster import Constants as ClusterConstants
-from pbsmrtpipe.engine import run_command, backticks
+from pbsmrtpipe.engine import (run_command, backticks, write_task_result, run_pilot,
+                               OutputCapture, extract_last_nlines, run_function)
 from pbsmrtpipe.models import RunnableTask, TaskStates
-import pbsmrtpipe.pb_io as IO
+import pbsmrtpipe.constants as GlobalConstants
 
 
 log = logging.getLogger(__name__)
@@ -32,6 +36,9 @@ slog = logging.getLogger('status.' + __name__)
 
 __version__ = '1.0.1'
 
+# Python tool contract task cmd (e.g., python -m pbsmrtpipe.pb_tasks.dev run-rtc /path/to/resolved-tool-contract.json)
+RX_PYTHON_RTC_CMD = re.compile(r'^\s*(?:\S*/)?python[\d.]*\s+-m\s+([\w.]+)\s+run-rtc\s+(\S+)\s*$')
+
 
 def _resolve_exe(exe):
     """
@@ -41,8 +48,13 @@ def _resolve_exe(exe):
     return exe if x is None else os.path.abspath(x)
 
 
+def _validate_file(path):
+    from pbcommand.validators import validate_file
+    return validate_file(path)
+
+
 def validate_file_and_load_manifest(path):
-    rt = RunnableTask.from_manifest_json(validate_file(path))
+    rt = RunnableTask.from_manifest_json(_validate_file(path))
     # if we got here everything is valid
     return path
 
@@ -65,8 +77,19 @@ def _add_stdout_file(p):
     return p
 
 
+def _add_debug_option(p):
+    p.add_argument('--debug', action='store_true', default=False,
+                   help="Emit debug level logging")
+    return p
+
+
+def _add_output_dir_option(p):
+    p.add_argument('-o', '--output-dir', default=None, help="Output directory")
+    return p
+
+
 def _add_base_options(p):
-    return _add_manifest_json_option(add_log_debug_option(p))
+    return _add_manifest_json_option(_add_debug_option(p))
 
 
 def _add_run_on_cluster_option(p):
@@ -77,6 +100,7 @@ def _add_run_on_cluster_option(p):
 
 def to_task_report(host, task_id, run_time_sec, exit_code, error_message, warning_message):
     # Move this somewhere that makes sense
+    from pbcommand.models.report import Attribute, Report
 
     def to_a(idx, value):
         return Attribute(idx, value)
@@ -190,7 +214,55 @@ def cleanup_resources(runnable_task):
     return True
 
 
-def run_task(runnable_task, output_dir, task_stdout, task_stderr, debug_mode):
+def _is_task_env_json_enabled():
+    """The task env is written to .env.json unless disabled by the workflow
+    driver"""
+    return os.environ.get(GlobalConstants.ENV_WRITE_TASK_ENV_JSON, "1") != "0"
+
+
+def _write_env_json(path):
+    import pbsmrtpipe.pb_io as IO
+    return IO.write_env_to_json(path)
+
+
+def _get_max_task_log_bytes():
+    """Max size of the task stdout/stderr files (0 disables the rotation)
+    set by the workflow driver"""
+    try:
+        return int(os.environ.get(GlobalConstants.ENV_MAX_TASK_LOG_SIZE, GlobalConstants.MAX_TASK_LOG_SIZE)) * 1024 * 1024
+    except ValueError:
+        log.warn("Invalid {e} value. Disabling task log rotation".format(e=GlobalConstants.ENV_MAX_TASK_LOG_SIZE))
+        return 0
+
+
+def to_python_rtc_cmd(cmd):
+    """
+    Returns the (module name, resolved tool contract path) of a Python tool
+    contract (pbcommand registry) task cmd or None
+    """
+    m = RX_PYTHON_RTC_CMD.match(cmd)
+    return None if m is None else m.groups()
+
+
+def run_rtc_in_process(cmd, stdout_fh, stderr_fh):
+    """
+    Run a Python tool contract task cmd by calling the registry runner of the
+    module in a process forked from the current process (see run_function).
+    Only the first call imports the module. If the module doesn't define a
+    pbcommand registry, the cmd is run as a subprocess.
+
+    :return: (exit code, stdout, stderr, run_time_sec)
+    """
+    from pbcommand.cli import registry_runner
+    module_name, rtc_path = to_python_rtc_cmd(cmd)
+    registry = getattr(importlib.import_module(module_name), 'registry', None)
+    if registry is None:
+        log.warn("No registry defined in {m}. Running cmd in a subprocess".format(m=module_name))
+        return run_command(cmd, stdout_fh, stderr_fh, time_out=None)
+    return run_function(registry_runner, (registry, ["run-rtc", rtc_path]), stdout_fh, stderr_fh)
+
+
+def run_task(runnable_task, output_dir, task_stdout, task_stderr, debug_mode, in_process=False, chdir=True):
     """
     Run a runnable task locally.
 
@@ -209,6 +281,14 @@ def run_task(runnable_task, output_dir, task_stdout, task_stderr, debug_mode):
     :param task_stdout: Absolute path to task stdout file
     :type task_stdout: str
 
+    :param in_process: Run the Python tool contract task cmds in a process
+    forked from the runner (see run_rtc_in_process)
+    :type in_process: bool
+
+    :param chdir: Change the current dir of the process to the output dir.
+    Disabled when the task is run in a thread of the workflow driver.
+    :type chdir: bool
+
     :return: (exit code, error message, run_time)
     :rtype: (int, str, int)
     """
@@ -227,14 +307,18 @@ def run_task(runnable_task, output_dir, task_stdout, task_stderr, debug_mode):
     ncmds = len(runnable_task.task.cmds)
 
     # so core dumps are written to the job dir
-    os.chdir(output_dir)
+    if chdir:
+        os.chdir(output_dir)
 
-    env_json = os.path.join(output_dir, '.env.json')
+    if _is_task_env_json_enabled():
+        _write_env_json(os.path.join(output_dir, '.env.json'))
 
-    IO.write_env_to_json(env_json)
+    # The output of the task commands is streamed to the files, only the
+    # last lines of stderr are kept for the error message
+    max_log_bytes = _get_max_task_log_bytes()
 
-    with open(task_stdout, 'w') as stdout_fh:
-        with open(task_stderr, 'w') as stderr_fh:
+    with OutputCapture(task_stdout, max_bytes=max_log_bytes) as stdout_fh:
+        with OutputCapture(task_stderr, max_bytes=max_log_bytes) as stderr_fh:
             stdout_fh.write(repr(runnable_task) + "\n")
             stdout_fh.write("Created at {x} on {h}\n".format(x=datetime.datetime.now(), h=host))
             stdout_fh.write("Running task in {o}\n".format(o=output_dir))
@@ -261,14 +345,17 @@ def run_task(runnable_task, output_dir, task_stdout, task_stderr, debug_mode):
                 log.info("Running command \n" + cmd)
 
                 # see run_command API for future fixes
-                rcode, _, _, run_time = run_command(cmd, stdout_fh, stderr_fh, time_out=None)
+                if in_process and to_python_rtc_cmd(cmd) is not None:
+                    rcode, _, _, run_time = run_rtc_in_process(cmd, stdout_fh, stderr_fh)
+                else:
+                    rcode, _, _, run_time = run_command(cmd, stdout_fh, stderr_fh, time_out=None, cwd=output_dir)
 
                 if rcode != 0:
                     err_msg_ = "Failed task {i} exit code {r} in {s:.2f} sec (See file '{f}'.)".format(i=runnable_task.task.task_id, r=rcode, s=run_time, f=task_stderr)
                     stderr_fh.write(err_msg + "\n")
                     stderr_fh.flush()
 
-                    t_error_msg = _extract_last_nlines(task_stderr)
+                    t_error_msg = stderr_fh.get_tail()
                     err_msg = "\n".join([err_msg_, "Extracted from stderr", t_error_msg])
 
                     log.error(err_msg)
@@ -298,7 +385,7 @@ def run_task(runnable_task, output_dir, task_stdout, task_stderr, debug_mode):
 
             # Write the task summary to a pbcommand Report object
             r = to_task_report(host, runnable_task.task.task_id, get_run_time(), rcode, err_msg, warn_msg)
-            task_report_path = os.path.join(output_dir, 'task-report.json')
+            task_report_path = os.path.join(output_dir, GlobalConstants.TASK_REPORT_JSON)
 
             msg = "Writing task id {i} task report to {r}".format(r=task_report_path, i=runnable_task.task.task_id)
             log.info(msg)
@@ -335,11 +422,8 @@ def _extract_last_nlines(path, nlines=25):
     an empty string is returned.
     """
     try:
-        n = nlines + 1
         nfs_exists_check(path)
-        with open(path, 'r') as f:
-            s = f.readlines()
-            return "".join(s[-n:])
+        return extract_last_nlines(path, nlines + 1)
     except Exception as e:
         log.warn("Unable to extract stderr from {p}. {e}".format(p=path, e=e))
         return ""
@@ -349,6 +433,27 @@ def chmod_x(path_):
     os.chmod(path_, os.stat(path_).st_mode | stat.S_IEXEC)
 
 
+def _to_cluster_template_render(cluster):
+    # sloppy API
+    if isinstance(cluster, ClusterTemplateRender):
+        return cluster
+    ctmpls = [ClusterTemplate(name, tmpl) for name, tmpl in cluster.iteritems()]
+    return ClusterTemplateRender(ctmpls)
+
+
+def _write_cluster_shell(qshell, cluster_cmd):
+    with open(qshell, 'w') as f:
+        f.write("#!/bin/bash\n")
+        f.write("set -o errexit\n")
+        f.write("set -o pipefail\n")
+        f.write("set -o nounset\n")
+        f.write(cluster_cmd.rstrip("\n") + " ${1+\"$@\"}\n")
+        f.write("exit $?")
+
+    chmod_x(qshell)
+    return qshell
+
+
 def run_task_on_cluster(runnable_task, task_manifest_path, output_dir, debug_mode):
     """
 
@@ -373,15 +478,10 @@ def run_task_on_cluster(runnable_task, task_manifest_path, output_dir, debug_mod
         return run_task(runnable_task, output_dir, stdout_, stderr_, debug_mode)
 
     os.chdir(runnable_task.task.output_dir)
-    env_json = os.path.join(output_dir, '.cluster-env.json')
-    IO.write_env_to_json(env_json)
+    if _is_task_env_json_enabled():
+        _write_env_json(os.path.join(output_dir, '.cluster-env.json'))
 
-    # sloppy API
-    if isinstance(runnable_task.cluster, ClusterTemplateRender):
-        render = runnable_task.cluster
-    else:
-        ctmpls = [ClusterTemplate(name, tmpl) for name, tmpl in runnable_task.cluster.iteritems()]
-        render = ClusterTemplateRender(ctmpls)
+    render = _to_cluster_template_render(runnable_task.cluster)
 
     job_id = to_random_job_id(runnable_task.task.task_id)
     log.debug("Using job id {i}".format(i=job_id))
@@ -423,15 +523,7 @@ def run_task_on_cluster(runnable_task, task_manifest_path, output_dir, debug_mod
     cluster_cmd = render.render(ClusterConstants.START, rcmd_shell, job_id, qstdout, qstderr, runnable_task.task.nproc)
     log.info("Job submission command: " + cluster_cmd)
 
-    with open(qshell, 'w') as f:
-        f.write("#!/bin/bash\n")
-        f.write("set -o errexit\n")
-        f.write("set -o pipefail\n")
-        f.write("set -o nounset\n")
-        f.write(cluster_cmd.rstrip("\n") + " ${1+\"$@\"}\n")
-        f.write("exit $?")
-
-    chmod_x(qshell)
+    _write_cluster_shell(qshell, cluster_cmd)
 
     host = platform.node()
 
@@ -484,7 +576,7 @@ def run_task_on_cluster(runnable_task, task_manifest_path, output_dir, debug_mod
                 f.write(msg_ + "\n")
 
     r = to_task_report(host, runnable_task.task.task_id, run_time, rcode, err_msg, warn_msg)
-    task_report_path = os.path.join(output_dir, 'task-report.json')
+    task_report_path = os.path.join(output_dir, GlobalConstants.TASK_REPORT_JSON)
     msg = "Writing task id {i} task report to {r}".format(r=task_report_path, i=runnable_task.task.task_id)
     log.info(msg)
     r.write_json(task_report_path)
@@ -492,7 +584,188 @@ def run_task_on_cluster(runnable_task, task_manifest_path, output_dir, debug_mod
     return rcode, err_msg, run_time
 
 
-def run_task_manifest(path):
+def run_task_manifests_array_on_cluster(task_manifest_paths, output_dir):
+    """
+    Submit the task manifests as a single (blocking) cluster array job.
+
+    Each array element runs a task manifest on the execution host and writes
+    the task result (task-result.json) to the task directory, hence each
+    task has a result independent of the array job exit code.
+
+    :param task_manifest_paths: Task manifests of the chunked tasks
+    :param output_dir: Directory of the array job files
+
+    :return: (exit code, error message, run_time) of the array job
+    """
+    def _to_p(x_):
+        return os.path.join(output_dir, x_)
+
+    rts = [RunnableTask.from_manifest_json(p) for p in task_manifest_paths]
+
+    if rts[0].cluster is None:
+        raise ValueError("No cluster provided. Unable to submit array job.")
+
+    render = _to_cluster_template_render(rts[0].cluster)
+    nproc = max(rt.task.nproc for rt in rts)
+    job_id = to_random_job_id(rts[0].task.task_id)
+    log.debug("Using job id {i} for {n} array tasks".format(i=job_id, n=len(rts)))
+
+    qstdout = _to_p('cluster.stdout')
+    qstderr = _to_p('cluster.stderr')
+    qshell = _to_p('cluster.sh')
+    array_tasks = _to_p('array-tasks.txt')
+    array_shell = _to_p('array-task.sh')
+
+    exe = _resolve_exe("pbtools-runner")
+
+    # Write the run.sh of each task and the list of run.sh by array index
+    with open(array_tasks, 'w') as af:
+        for task_manifest_path in task_manifest_paths:
+            task_dir = os.path.dirname(task_manifest_path)
+            rcmd_shell = os.path.join(task_dir, 'run.sh')
+            runner_log = os.path.join(task_dir, GlobalConstants.TASK_RUNNER_LOG)
+            # the quoting here is explicitly to handle spaces in paths
+            cmd = "{x} run-manifest \"{t}\" > \"{l}\" 2>&1".format(x=exe, t=task_manifest_path, l=runner_log)
+            with open(rcmd_shell, 'w+') as x:
+                x.write(cmd + "\n")
+            chmod_x(rcmd_shell)
+            af.write(rcmd_shell + "\n")
+
+    # The array element index is exported by the scheduler
+    with open(array_shell, 'w') as f:
+        f.write("#!/bin/bash\n")
+        f.write("ix=${SGE_TASK_ID:-${SLURM_ARRAY_TASK_ID:-${LSB_JOBINDEX:-${PBS_ARRAYID:-${PBS_ARRAY_INDEX}}}}}\n")
+        f.write("exec bash \"$(sed -n \"${{ix}}p\" \"{a}\")\"\n".format(a=array_tasks))
+    chmod_x(array_shell)
+
+    with open(qstdout, 'w+') as f:
+        f.write("Creating cluster stdout for array Job {i} with {n} tasks\n".format(i=job_id, n=len(rts)))
+
+    cluster_cmd = render.render_array(array_shell, job_id, len(rts), qstdout, qstderr, nproc)
+    log.info("Array job submission command: " + cluster_cmd)
+    _write_cluster_shell(qshell, cluster_cmd)
+
+    os.chdir(output_dir)
+
+    # Blocking call
+    rcode, cstdout, cstderr, run_time = backticks("bash {q}".format(q=qshell))
+
+    msg_ = "{n} Completed running array job {i} of {x} tasks in {t:.2f} sec. Exit code {r}".format(r=rcode, t=run_time, i=job_id, x=len(rts), n=datetime.datetime.now())
+    log.info(msg_)
+
+    with open(qstdout, 'a') as qf:
+        if cstdout:
+            qf.write("\n".join(cstdout) + "\n")
+        qf.write(msg_ + "\n")
+
+    err_msg = ""
+    if rcode != 0:
+        err_msg = "\n".join([msg_, str(cstderr), _extract_last_nlines(qstderr)])
+        with open(qstderr, 'a') as f:
+            f.write(err_msg + "\n")
+
+    return rcode, err_msg, run_time
+
+
+def run_task_manifests_chain(task_manifest_paths):
+    """
+    Run the task manifests of a chain of fused tasks in sequence and write
+    the task result (task-result.json) of each task. The tasks after a
+    failed task are not run, and are failed.
+
+    :return: list of the task states
+    """
+    states = []
+    failed_task_dir = None
+    for task_manifest_path in task_manifest_paths:
+        task_dir = os.path.dirname(task_manifest_path)
+        if failed_task_dir is None:
+            try:
+                state, err_msg, run_time = run_task_manifest(task_manifest_path)
+            except Exception as e:
+                err_msg = "Unable to run task manifest {p}. {e}".format(p=task_manifest_path, e=e)
+                log.exception(err_msg)
+                state, run_time = TaskStates.FAILED, 0.0
+            if state != TaskStates.SUCCESSFUL:
+                failed_task_dir = task_dir
+        else:
+            state, run_time = TaskStates.FAILED, 0.0
+            err_msg = "Task was not run. Upstream fused task {d} failed".format(d=failed_task_dir)
+
+        write_task_result(os.path.join(task_dir, GlobalConstants.TASK_RESULT_JSON), state, err_msg, run_time)
+        log.info("Completed {p} with state {s}".format(p=task_manifest_path, s=state))
+        states.append(state)
+
+    return states
+
+
+def run_task_manifests_chain_on_cluster(task_manifest_paths, output_dir):
+    """
+    Submit the task manifests of a chain of fused tasks as a single
+    (blocking) cluster job that runs the tasks in sequence on the
+    execution host.
+
+    :param task_manifest_paths: Task manifests in the order they are run
+    :param output_dir: Directory of the cluster job files
+
+    :return: (exit code, error message, run_time) of the cluster job
+    """
+    def _to_p(x_):
+        return os.path.join(output_dir, x_)
+
+    rts = [RunnableTask.from_manifest_json(p) for p in task_manifest_paths]
+
+    if rts[0].cluster is None:
+        raise ValueError("No cluster provided. Unable to submit fused tasks.")
+
+    render = _to_cluster_template_render(rts[0].cluster)
+    nproc = max(rt.task.nproc for rt in rts)
+    job_id = to_random_job_id(rts[0].task.task_id)
+    log.debug("Using job id {i} for {n} fused tasks".format(i=job_id, n=len(rts)))
+
+    qstdout = _to_p('cluster.stdout')
+    qstderr = _to_p('cluster.stderr')
+    qshell = _to_p('cluster.sh')
+    rcmd_shell = _to_p('run.sh')
+
+    exe = _resolve_exe("pbtools-runner")
+    manifests = " ".join("\"{t}\"".format(t=p) for p in task_manifest_paths)
+    # the quoting here is explicitly to handle spaces in paths
+    cmd = "{x} run-chain {m} > \"{l}\" 2>&1".format(x=exe, m=manifests, l=_to_p("run-chain.log"))
+    with open(rcmd_shell, 'w+') as x:
+        x.write(cmd + "\n")
+    chmod_x(rcmd_shell)
+
+    with open(qstdout, 'w+') as f:
+        f.write("Creating cluster stdout for Job {i} of {n} fused tasks\n".format(i=job_id, n=len(rts)))
+
+    cluster_cmd = render.render(ClusterConstants.START, rcmd_shell, job_id, qstdout, qstderr, nproc)
+    log.info("Fused tasks job submission command: " + cluster_cmd)
+    _write_cluster_shell(qshell, cluster_cmd)
+
+    os.chdir(output_dir)
+
+    # Blocking call
+    rcode, cstdout, cstderr, run_time = backticks("bash {q}".format(q=qshell))
+
+    msg_ = "{n} Completed running cluster job {i} of {x} fused tasks in {t:.2f} sec. Exit code {r}".format(r=rcode, t=run_time, i=job_id, x=len(rts), n=datetime.datetime.now())
+    log.info(msg_)
+
+    with open(qstdout, 'a') as qf:
+        if cstdout:
+            qf.write("\n".join(cstdout) + "\n")
+        qf.write(msg_ + "\n")
+
+    err_msg = ""
+    if rcode != 0:
+        err_msg = "\n".join([msg_, str(cstderr), _extract_last_nlines(qstderr)])
+        with open(qstderr, 'a') as f:
+            f.write(err_msg + "\n")
+
+    return rcode, err_msg, run_time
+
+
+def run_task_manifest(path, in_process=False):
     output_dir = os.path.dirname(path)
     os.chdir(output_dir)
     stderr = os.path.join(output_dir, 'stderr')
@@ -506,13 +779,25 @@ def run_task_manifest(path):
         raise
 
     # blocking call
-    rcode, err_msg, run_time = run_task(rt, output_dir, stdout, stderr, True)
+    rcode, err_msg, run_time = run_task(rt, output_dir, stdout, stderr, True, in_process=in_process)
 
     state = TaskStates.from_int(rcode)
 
     return state, err_msg, run_time
 
 
+def run_task_manifest_inline(path):
+    """Run the task manifest in the calling thread (the inline workers of
+    the workflow driver). The current dir of the process is not changed."""
+    output_dir = os.path.dirname(path)
+    rt = RunnableTask.from_manifest_json(path)
+
+    rcode, err_msg, run_time = run_task(rt, output_dir, os.path.join(output_dir, 'stdout'),
+                                        os.path.join(output_dir, 'stderr'), True, chdir=False)
+
+    return TaskStates.from_int(rcode), err_msg, run_time
+
+
 def run_task_manifest_on_cluster(path):
     """
     Run the Task on the queue (of possible)
@@ -546,9 +831,104 @@ def _args_run_task_manifest(args):
     return rcode
 
 
+def run_task_manifest_and_write_result(task_manifest_path, run_func=run_task_manifest):
+    """Run the task manifest in the manifest dir and write the task result
+    for the TaskSupervisor"""
+    output_dir = os.path.dirname(task_manifest_path)
+
+    state, err_msg, run_time = run_func(task_manifest_path)
+
+    task_result_json = os.path.join(output_dir, GlobalConstants.TASK_RESULT_JSON)
+    write_task_result(task_result_json, state, err_msg, run_time)
+    log.info("wrote task result ({s}) to {p}".format(s=state, p=task_result_json))
+
+    return 0 if state == TaskStates.SUCCESSFUL else 1
+
+
+def run_task_manifest_in_process_and_write_result(task_manifest_path):
+    """Task func of the in-process pilots"""
+    return run_task_manifest_and_write_result(task_manifest_path, functools.partial(run_task_manifest, in_process=True))
+
+
+def _args_run_task_manifest_and_write_result(args):
+    run_func = run_task_manifest_on_cluster if args.cluster else run_task_manifest
+    return run_task_manifest_and_write_result(os.path.abspath(args.task_manifest), run_func)
+
+
+def _add_run_manifest_options(p):
+    return _add_run_on_cluster_option(_add_base_options(p))
+
+
+def _args_run_task_manifests_array(args):
+    output_dir = os.getcwd() if args.output_dir is None else os.path.abspath(args.output_dir)
+    task_manifest_paths = [os.path.abspath(p) for p in args.task_manifests]
+
+    rcode, err_msg, _ = run_task_manifests_array_on_cluster(task_manifest_paths, output_dir)
+    if rcode != 0:
+        log.error(err_msg)
+
+    return rcode
+
+
+def _args_run_task_manifests_chain(args):
+    task_manifest_paths = [os.path.abspath(p) for p in args.task_manifests]
+
+    if args.cluster:
+        output_dir = os.getcwd() if args.output_dir is None else os.path.abspath(args.output_dir)
+        rcode, err_msg, _ = run_task_manifests_chain_on_cluster(task_manifest_paths, output_dir)
+        if rcode != 0:
+            log.error(err_msg)
+        return rcode
+
+    states = run_task_manifests_chain(task_manifest_paths)
+    return 0 if all(s == TaskStates.SUCCESSFUL for s in states) else 1
+
+
+def _add_run_chain_options(p):
+    return _add_run_on_cluster_option(_add_run_array_options(p))
+
+
+def _add_run_array_options(p):
+    _add_debug_option(p)
+    _add_output_dir_option(p)
+    p.add_argument('task_manifests', nargs='+', type=_validate_file, help="Path(s) to task-manifest.json")
+    return p
+
+
+def _args_run_pilot(args):
+    task_func = None
+    if args.in_process:
+        # Pre-warm the pilot. The forked tasks inherit the loaded modules
+        for module_name in ["pbcommand.cli"] + args.preload:
+            log.info("Preloading {m}".format(m=module_name))
+            importlib.import_module(module_name)
+        task_func = run_task_manifest_in_process_and_write_result
+
+    ntasks = run_pilot(os.path.abspath(args.queue_dir), args.worker_id, idle_timeout=args.idle_timeout, task_func=task_func)
+    log.info("Pilot {w} ran {n} tasks".format(w=args.worker_id, n=ntasks))
+    return 0
+
+
+def _to_module_names(s):
+    return [x.strip() for x in s.split(",") if x.strip()]
+
+
+def _add_run_pilot_options(p):
+    _add_debug_option(p)
+    p.add_argument('queue_dir', help="Path to the pilot queue directory")
+    p.add_argument('--worker-id', required=True, help="Unique id of the pilot worker")
+    p.add_argument('--idle-timeout', type=float, default=GlobalConstants.PILOT_IDLE_TIMEOUT,
+                   help="Exit if no task is claimed within the timeout (sec)")
+    p.add_argument('--in-process', action='store_true', default=False,
+                   help="Run the Python tool contract tasks in processes forked from the pilot")
+    p.add_argument('--preload', type=_to_module_names, default=[],
+                   help="Comma separated list of the modules imported at start up (with --in-process)")
+    return p
+
+
 def _add_run_options(p):
     _add_base_options(p)
-    U.add_output_dir_option(p)
+    _add_output_dir_option(p)
     _add_stdout_file(p)
     _add_stderr_file(p)
     return p
@@ -577,11 +957,26 @@ def _args_pprint_task_manifest(args):
     return pprint_task_manifest(RunnableTask.from_manifest_json(args.task_manifest))
 
 
+# Subcommands used by the workflow driver (sid, help, options func, exe func)
+DRIVER_SUBCOMMANDS = (
+    ('run-manifest', "Run a task manifest in the manifest directory and write the task result (used by the workflow driver)",
+     _add_run_manifest_options, _args_run_task_manifest_and_write_result),
+    ('run-array', "Submit task manifests as a single cluster array job (used by the workflow driver)",
+     _add_run_array_options, _args_run_task_manifests_array),
+    ('pilot', "Run the task manifests of a pilot queue back-to-back (used by the workflow driver)",
+     _add_run_pilot_options, _args_run_pilot),
+    ('run-chain', "Run the task manifests of fused tasks in sequence and write the task results (used by the workflow driver)",
+     _add_run_chain_options, _args_run_task_manifests_chain))
+
+
 def get_main_parser():
     """
     Returns an argparse Parser with all the commandline utils as
     subparsers
     """
+    import pbcommand.cli.utils as U
+    from pbcommand.cli import get_default_argparser
+
     desc = "General tool used by run task-manifests.json files."
     p = get_default_argparser(__version__, desc)
 
@@ -593,6 +988,9 @@ def get_main_parser():
     # Run command
     builder('run', "Convert a Pacbio Input.xml file to Movie FOFN", _add_run_options, _args_run_task_manifest)
 
+    for sid, help_, opt_func, exe_func in DRIVER_SUBCOMMANDS:
+        builder(sid, help_, opt_func, exe_func)
+
     builder("to-cmds", "Extract the cmds from manifest.json", _add_manifest_json_option, _args_to_cmd)
 
     builder("inspect", "Pretty-Print a summary of the task-manifestExtract the cmds from manifest.json",
@@ -601,9 +999,43 @@ def get_main_parser():
     return p
 
 
+def get_driver_parser():
+    """
+    Returns the (slim) argparse Parser of the DRIVER_SUBCOMMANDS
+    """
+    p = argparse.ArgumentParser(prog="pbtools-runner", description="Run task manifests (used by the workflow driver)")
+    sp = p.add_subparsers(help='Subparser Commands')
+    for sid, help_, opt_func, exe_func in DRIVER_SUBCOMMANDS:
+        opt_func(sp.add_parser(sid, help=help_)).set_defaults(func=exe_func)
+    return p
+
+
+def _run_driver_subcommand(argv):
+    args = get_driver_parser().parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.INFO,
+                        format="[%(levelname)s] %(asctime)-15s [%(name)s %(funcName)s %(lineno)d] %(message)s")
+    started_at = time.time()
+    try:
+        rcode = args.func(args)
+    except Exception as e:
+        log.exception("Failed to run {c}. {e}".format(c=argv[0], e=e))
+        rcode = 1
+    log.info("exiting {c} with return code {r} in {s:.2f} sec.".format(c=argv[0], r=rcode, s=time.time() - started_at))
+    return rcode
+
+
 def main(argv=None):
 
     argv_ = sys.argv if argv is None else argv
+
+    if len(argv_) > 1 and argv_[1] in {x[0] for x in DRIVER_SUBCOMMANDS}:
+        return _run_driver_subcommand(argv_[1:])
+
+    from pbcommand.cli.utils import main_runner_default
     parser = get_main_parser()
 
     return main_runner_default(argv_[1:], parser, log)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -137,6 +137,27 @@ def get_default_logging_config_dict(master_log, master_level, pb_log, stdout_lev
     return d
 
 
+def is_log_level_emitted(logger, level):
+    """
+    Returns True if a message of the level would be emitted by at least one
+    handler of the logger (or the handlers of the parent loggers).
+
+    The root logger is always at DEBUG (see get_default_logging_config_dict),
+    so logger.isEnabledFor is not sufficient to skip the generation of
+    expensive messages.
+    """
+    if not logger.isEnabledFor(level):
+        return False
+    c = logger
+    while c is not None:
+        if any(level >= h.level for h in c.handlers):
+            return True
+        if not c.propagate:
+            break
+        c = c.parent
+    return False
+
+
 def setup_internal_logs(master_log, master_level, pb_log, stdout_level):
     d = get_default_logging_config_dict(master_log, master_level, pb_log, stdout_level)
     logging.config.dictConfig(d)